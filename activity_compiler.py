@@ -0,0 +1,603 @@
+import os
+import json
+import uuid
+from functools import partial
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Iterator, Optional
+from src.services.distractor_index import DistractorIndex, TEXT_HEADING
+from src.services.xlsx_writer import write_xlsx
+from src.services.metrics import STAGE_SECONDS, ACTIVITIES_TOTAL
+
+# Version of the generated activities; bump it whenever the generated
+# activities change so that activities reused from earlier runs are rebuilt
+ACTIVITY_VERSION = "4"
+
+# Maximum number of multiple choice questions taken from headings (Kahoot
+# quizzes keep 10 questions in total, multiple choice questions first)
+MAX_CHOICE_QUESTIONS = 10
+
+# Kahoot limits the length of questions and answers
+KAHOOT_QUESTION_MAX_LENGTH = 120
+KAHOOT_ANSWER_MAX_LENGTH = 75
+
+# Layout of the Kahoot spreadsheet import template: column headers on row 8,
+# one question per row below, numbered in column A
+KAHOOT_SHEET_HEADER_ROW = 8
+KAHOOT_SHEET_HEADERS = [
+    "Question - max 120 characters",
+    "Answer 1 - max 75 characters",
+    "Answer 2 - max 75 characters",
+    "Answer 3 - max 75 characters",
+    "Answer 4 - max 75 characters",
+    "Time limit (sec) – 5, 10, 20, 30, 60, 90, 120, or 240 secs",
+    "Correct answer(s) - choose at least one"
+]
+
+# Correct answer of a heading whose section has no text to take it from
+GENERIC_CORRECT_ANSWER = "الإجابة الصحيحة"  # "Correct answer" in Arabic
+
+# Placeholder wrong answers, used when the document has too few texts
+PLACEHOLDER_DISTRACTORS = [
+    "إجابة خاطئة 1",  # "Wrong answer 1" in Arabic
+    "إجابة خاطئة 2",  # "Wrong answer 2" in Arabic
+    "إجابة خاطئة 3"   # "Wrong answer 3" in Arabic
+]
+
+# Encoder of the written activity files: compact separators, UTF-8 text
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _shorten(text: str, max_length: int) -> str:
+    """
+    Shorten a text to a maximum length, cutting at a word boundary
+
+    Args:
+        text: Text to shorten
+        max_length: Maximum number of characters
+
+    Returns:
+        Text of at most max_length characters
+    """
+    if len(text) <= max_length:
+        return text
+    return text[:max_length - 3].rsplit(" ", 1)[0] + "..."
+
+
+def _section_answer(distractor_index: DistractorIndex, section: int, headings: List[Dict[str, Any]],
+                    section_bullets: Dict[int, str]) -> str:
+    """
+    Get the correct answer of a heading's question
+
+    Args:
+        distractor_index: Index of the lesson texts
+        section: Section of the heading (heading index)
+        headings: Headings of the lesson
+        section_bullets: First bullet point of each section
+
+    Returns:
+        First sentence of the section, else its first bullet point, else
+        the heading right below it when that one is a child heading, else
+        GENERIC_CORRECT_ANSWER
+    """
+    section_sentences = distractor_index.section_texts(section)
+    if section_sentences:
+        return distractor_index.texts[section_sentences[0]]
+
+    if section in section_bullets:
+        return section_bullets[section]
+
+    if section + 1 < len(headings):
+        heading, child = headings[section], headings[section + 1]
+        if child.get("level", 1) > heading.get("level", 1):
+            return child["text"]
+
+    return GENERIC_CORRECT_ANSWER
+
+
+def iter_choice_questions(structure: Dict[str, Any],
+                          distractor_index: Optional[DistractorIndex] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Generate the multiple choice questions of a lesson, one per heading
+
+    Answers come from the document: the first sentence of the heading's
+    section (or its first bullet point or child heading) is the correct
+    answer, and the sentences of other sections closest to it are the wrong
+    answers. Questions are built one at a time as they are consumed.
+
+    Args:
+        structure: Structure dictionary of the extracted content
+        distractor_index: Index of the lesson texts, if already built
+
+    Yields:
+        Questions with their "prompt", "choices" and index of the "correct"
+        choice
+    """
+    headings = structure.get("headings", [])
+    if not headings:
+        return
+
+    if distractor_index is None:
+        with STAGE_SECONDS.time(stage="distractor_index"):
+            distractor_index = DistractorIndex.from_structure(structure)
+
+    # First bullet point of each section, for sections without sentences
+    section_bullets = {}
+    for bullet_list, section in zip(structure.get("bullet_points", []),
+                                    structure.get("bullet_point_sections", [])):
+        if bullet_list and section is not None:
+            section_bullets.setdefault(section, bullet_list[0])
+
+    count = 0
+
+    for section, heading in enumerate(headings):
+        # Skip very short headings
+        if len(heading["text"]) < 10:
+            continue
+
+        section = heading.get("section_id", section)
+        correct_answer = _section_answer(distractor_index, section, headings, section_bullets)
+        distractors = [
+            distractor_index.texts[index]
+            for index in distractor_index.nearest(
+                heading["text"] if correct_answer == GENERIC_CORRECT_ANSWER else correct_answer,
+                3, exclude_section=section, exclude_texts=[correct_answer]
+            )
+        ]
+
+        # Fall back to other headings, then to placeholders
+        if len(distractors) < 3:
+            distractors += [
+                distractor_index.texts[index]
+                for index in distractor_index.nearest(
+                    heading["text"], 3 - len(distractors), kind=TEXT_HEADING,
+                    exclude_section=section, exclude_texts=[correct_answer] + distractors
+                )
+            ]
+        distractors += PLACEHOLDER_DISTRACTORS[len(distractors):]
+
+        # Rotate the correct answer through the four positions
+        correct = count % 4
+        count += 1
+        yield {
+            "prompt": heading["text"],
+            "choices": distractors[:correct] + [correct_answer] + distractors[correct:],
+            "correct": correct
+        }
+
+
+def build_activity_ir(content: Dict[str, Any],
+                      max_choice_questions: Optional[int] = MAX_CHOICE_QUESTIONS) -> Dict[str, Any]:
+    """
+    Build the platform-neutral representation of a lesson's activities
+
+    The structure is walked once: every heading, paragraph and bullet list
+    is looked at a single time, whatever the number of target platforms.
+    Only the first multiple choice questions are built; question banks
+    generate the others while they are written (see "choice_question_bank").
+
+    Args:
+        content: Dictionary containing extracted content
+        max_choice_questions: Maximum number of multiple choice questions
+            kept in "choice_questions" (None for a question per heading)
+
+    Returns:
+        Dictionary with the lesson "title" (None if unknown), lists of
+        "choice_questions" (prompt, choices, index of the correct choice),
+        "statements" (true statements of suitable length), "concepts"
+        (heading texts), "passages" (paragraphs), "lists" (bullet lists of
+        two items or more) and "terms" (every bullet point), and
+        "choice_question_bank", a callable returning a new generator of
+        every multiple choice question (see iter_choice_questions)
+    """
+    structure = content.get("structure", {})
+    ir = {
+        "title": content.get("title"),
+        "choice_questions": [],
+        "statements": [],
+        "concepts": [],
+        "passages": [],
+        "lists": [],
+        "terms": []
+    }
+
+    headings = structure.get("headings", [])
+    distractor_index = None
+    if headings:
+        with STAGE_SECONDS.time(stage="distractor_index"):
+            distractor_index = DistractorIndex.from_structure(structure)
+
+    ir["choice_question_bank"] = partial(iter_choice_questions, structure, distractor_index)
+    ir["choice_questions"] = list(islice(ir["choice_question_bank"](), max_choice_questions))
+
+    for heading in headings:
+        ir["concepts"].append(heading["text"])
+
+    for paragraph in structure.get("paragraphs", []):
+        ir["passages"].append(paragraph)
+
+        # Statements of a length suited to true/false questions
+        if 20 <= len(paragraph) <= 200:
+            ir["statements"].append(paragraph)
+
+    for bullet_list in structure.get("bullet_points", []):
+        ir["terms"].extend(bullet_list)
+        if len(bullet_list) >= 2:
+            ir["lists"].append(bullet_list)
+
+    return ir
+
+
+def kahoot_target(ir: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build a Kahoot quiz
+
+    Args:
+        ir: Activity representation from build_activity_ir
+
+    Returns:
+        Kahoot activity
+    """
+    questions = []
+
+    # Multiple choice questions from headings
+    for choice_question in ir["choice_questions"][:MAX_CHOICE_QUESTIONS]:
+        questions.append({
+            "type": "quiz",
+            "question": f"ما هو المفهوم الصحيح لـ {choice_question['prompt']}؟",  # "What is the correct concept for {heading}?" in Arabic
+            "time": 20000,  # 20 seconds
+            "points": 1000,
+            "answers": [
+                {"text": _shorten(choice, KAHOOT_ANSWER_MAX_LENGTH), "correct": index == choice_question["correct"]}
+                for index, choice in enumerate(choice_question["choices"])
+            ]
+        })
+
+    # True/false questions from paragraphs
+    for statement in ir["statements"]:
+        questions.append({
+            "type": "true_false",
+            "question": statement[:100] + "...",  # Use first 100 characters of paragraph
+            "time": 10000,  # 10 seconds
+            "points": 500,
+            "answers": [
+                {"text": "صحيح", "correct": True},  # "True" in Arabic
+                {"text": "خطأ", "correct": False}   # "False" in Arabic
+            ]
+        })
+
+    # Matching questions from bullet points (limited to 4 pairs)
+    for bullet_list in ir["lists"]:
+        questions.append({
+            "type": "matching",
+            "question": "طابق بين العناصر التالية:",  # "Match the following items:" in Arabic
+            "time": 30000,  # 30 seconds
+            "points": 1000,
+            "pairs": [
+                {"left": item, "right": f"التعريف {i+1}"}  # "Definition {i+1}" in Arabic
+                for i, item in enumerate(bullet_list[:4])
+            ]
+        })
+
+    return {
+        "title": ir["title"] if ir["title"] is not None else "Untitled Activity",
+        "description": "Interactive quiz generated from lesson content",
+        # Limit to 10 questions
+        "questions": questions[:10]
+    }
+
+
+def nearpod_target(ir: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build a set of Nearpod activities
+
+    Args:
+        ir: Activity representation from build_activity_ir
+
+    Returns:
+        Nearpod activities
+    """
+    activities = [
+        {
+            "type": "classification_board",
+            "title": "تصنيف المفاهيم",  # "Concept Classification" in Arabic
+            "description": "اسحب المفاهيم إلى الفئات المناسبة",  # "Drag concepts to appropriate categories" in Arabic
+            "categories": ["الفئة 1", "الفئة 2", "الفئة 3"],  # "Category 1, 2, 3" in Arabic
+            "items": [
+                {"text": term, "category": "الفئة 1"}  # Default category
+                for term in ir["terms"]
+            ]
+        },
+        {
+            "type": "drawing",
+            "title": "رسم توضيحي",  # "Illustrative Drawing" in Arabic
+            "description": "ارسم شكلاً توضيحياً للمفهوم",  # "Draw an illustrative diagram for the concept" in Arabic
+            "background_image": None
+        },
+        {
+            "type": "matching_pairs",
+            "title": "مطابقة المفاهيم",  # "Matching Concepts" in Arabic
+            "description": "اربط كل مفهوم بتعريفه المناسب",  # "Connect each concept with its appropriate definition" in Arabic
+            "pairs": [
+                {"left": concept, "right": f"تعريف {concept}"}  # "Definition of {heading}" in Arabic
+                for concept in ir["concepts"][:5]  # Limit to 5 pairs
+            ]
+        },
+        {
+            "type": "quiz",
+            "title": "اختبار قصير",  # "Short Quiz" in Arabic
+            "description": "أجب عن الأسئلة التالية",  # "Answer the following questions" in Arabic
+            "questions": [
+                {
+                    "question": f"ما هي الفكرة الرئيسية في النص التالي: {passage[:50]}...؟",  # "What is the main idea in the following text: {paragraph}...?" in Arabic
+                    "options": [
+                        "الخيار 1",  # "Option 1" in Arabic
+                        "الخيار 2",  # "Option 2" in Arabic
+                        "الخيار 3",  # "Option 3" in Arabic
+                        "الخيار 4"   # "Option 4" in Arabic
+                    ],
+                    "correct_answer": 0  # Index of correct answer
+                }
+                for passage in ir["passages"][:3]  # Limit to 3 questions
+            ]
+        },
+        {
+            "type": "collaborative_board",
+            "title": "لوحة تعاونية",  # "Collaborative Board" in Arabic
+            "description": "شارك أفكارك حول الموضوع",  # "Share your thoughts about the topic" in Arabic
+            "prompt": ir["title"] if ir["title"] is not None else "شارك أفكارك"  # "Share your thoughts" in Arabic
+        }
+    ]
+
+    return {
+        "title": ir["title"] if ir["title"] is not None else "Untitled Activity",
+        "description": "Interactive activities generated from lesson content",
+        "activities": activities
+    }
+
+
+def qti_target(ir: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build a generic QTI-like assessment (JSON rendering of QTI choice items)
+
+    Args:
+        ir: Activity representation from build_activity_ir
+
+    Returns:
+        Assessment with one choice item per question
+    """
+    items = []
+
+    for choice_question in ir["choice_questions"][:MAX_CHOICE_QUESTIONS]:
+        identifiers = [chr(ord("A") + index) for index in range(len(choice_question["choices"]))]
+        items.append({
+            "identifier": f"item-{len(items) + 1}",
+            "interaction": "choice",
+            "prompt": f"ما هو المفهوم الصحيح لـ {choice_question['prompt']}؟",  # "What is the correct concept for {heading}?" in Arabic
+            "choices": [
+                {"identifier": identifier, "text": choice}
+                for identifier, choice in zip(identifiers, choice_question["choices"])
+            ],
+            "correct_response": [identifiers[choice_question["correct"]]]
+        })
+
+    for statement in ir["statements"]:
+        items.append({
+            "identifier": f"item-{len(items) + 1}",
+            "interaction": "choice",
+            "prompt": statement,
+            "choices": [
+                {"identifier": "true", "text": "صحيح"},  # "True" in Arabic
+                {"identifier": "false", "text": "خطأ"}   # "False" in Arabic
+            ],
+            "correct_response": ["true"]
+        })
+
+    return {
+        "format": "qti-json",
+        "version": "1.0",
+        "title": ir["title"] if ir["title"] is not None else "Untitled Activity",
+        "items": items
+    }
+
+
+def kahoot_spreadsheet_rows(ir: Dict[str, Any]) -> Iterator[List[Any]]:
+    """
+    Generate the rows of a Kahoot spreadsheet import (question bank)
+
+    Every multiple choice and true/false question of the representation is
+    included; matching questions have no spreadsheet layout and are left
+    out. Multiple choice questions are generated from the question bank
+    while their rows are consumed, so only one of them is held at a time.
+
+    Args:
+        ir: Activity representation from build_activity_ir
+
+    Yields:
+        Rows of cell values, from the first row of the sheet
+    """
+    yield []
+    yield [None, ir["title"] if ir["title"] is not None else "Untitled Activity"]
+    for _ in range(KAHOOT_SHEET_HEADER_ROW - 3):
+        yield []
+    yield [None] + KAHOOT_SHEET_HEADERS
+
+    number = 0
+
+    for choice_question in ir["choice_question_bank"]():
+        number += 1
+        yield [
+            number,
+            _shorten(f"ما هو المفهوم الصحيح لـ {choice_question['prompt']}؟", KAHOOT_QUESTION_MAX_LENGTH),  # "What is the correct concept for {heading}?" in Arabic
+            *(_shorten(choice, KAHOOT_ANSWER_MAX_LENGTH) for choice in choice_question["choices"]),
+            20,  # 20 seconds
+            choice_question["correct"] + 1
+        ]
+
+    for statement in ir["statements"]:
+        number += 1
+        yield [
+            number,
+            _shorten(statement, KAHOOT_QUESTION_MAX_LENGTH),
+            "صحيح",  # "True" in Arabic
+            "خطأ",  # "False" in Arabic
+            None,
+            None,
+            10,  # 10 seconds
+            1
+        ]
+
+
+def export_kahoot_xlsx(ir: Dict[str, Any], output_path: str):
+    """
+    Write a Kahoot spreadsheet import
+
+    Args:
+        ir: Activity representation from build_activity_ir
+        output_path: Path of the written workbook
+    """
+    write_xlsx(
+        output_path,
+        kahoot_spreadsheet_rows(ir),
+        sheet_name="Kahoot",
+        column_widths=[5, 60, 40, 40, 40, 40, 15, 15]
+    )
+
+
+# Builders of the supported activity formats, by target name
+ACTIVITY_TARGETS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "kahoot": kahoot_target,
+    "nearpod": nearpod_target,
+    "qti": qti_target
+}
+
+
+def register_activity_target(name: str, builder: Callable[[Dict[str, Any]], Dict[str, Any]]):
+    """
+    Add or replace an activity format
+
+    Args:
+        name: Target name
+        builder: Callable building the activity document from the activity
+            representation (see build_activity_ir)
+    """
+    ACTIVITY_TARGETS[name] = builder
+
+
+# Activity formats streamed to files of their own format rather than built
+# as JSON documents, by target name: file extension and writer receiving the
+# activity representation and the output path
+ACTIVITY_EXPORTERS: Dict[str, Dict[str, Any]] = {
+    "kahoot_xlsx": {"extension": "xlsx", "export": export_kahoot_xlsx}
+}
+
+
+def register_activity_exporter(name: str, extension: str, export: Callable[[Dict[str, Any], str], None]):
+    """
+    Add or replace an activity format written by its own exporter
+
+    Args:
+        name: Target name
+        extension: Extension of the written files
+        export: Callable writing the activity file from the activity
+            representation (see build_activity_ir) to a path
+    """
+    ACTIVITY_EXPORTERS[name] = {"extension": extension, "export": export}
+
+
+def activity_extension(target: str) -> str:
+    """
+    Get the file extension of an activity format
+
+    Args:
+        target: Target name
+
+    Returns:
+        Extension of the target's files
+    """
+    exporter = ACTIVITY_EXPORTERS.get(target)
+    return exporter["extension"] if exporter is not None else "json"
+
+
+def write_compact_json(document: Any, output_path: str):
+    """
+    Stream a document into a compact JSON file
+
+    The document is encoded chunk by chunk, so the whole JSON text is never
+    held in memory.
+
+    Args:
+        document: JSON-serializable document
+        output_path: Path of the written file
+    """
+    # Write to a private file first so readers never see a partial file
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for chunk in _ENCODER.iterencode(document):
+            f.write(chunk)
+    os.replace(tmp_path, output_path)
+
+
+class ActivityCompiler:
+    """
+    Compiler of lesson activities for several platforms at once
+
+    The content is turned into one platform-neutral representation (see
+    build_activity_ir), from which every requested target is built and
+    written concurrently.
+    """
+
+    def __init__(self, output_folder: str, max_workers: int = 4):
+        """
+        Initialize the activity compiler
+
+        Args:
+            output_folder: Path to the folder where activity files are written
+            max_workers: Maximum number of targets built concurrently
+        """
+        self.output_folder = output_folder
+        self.max_workers = max_workers
+
+        # Ensure output folder exists
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+
+    def compile(self, content: Dict[str, Any], outputs: Dict[str, str],
+                ir: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """
+        Build and write the activity files of several targets
+
+        Args:
+            content: Dictionary containing extracted content
+            outputs: Activity file name (without extension) by target name
+            ir: Activity representation, if already built
+
+        Returns:
+            Path of the written file by target name
+        """
+        if ir is None:
+            with STAGE_SECONDS.time(stage="activity_ir"):
+                ir = build_activity_ir(content)
+
+        def emit(target: str) -> str:
+            exporter = ACTIVITY_EXPORTERS.get(target)
+
+            if exporter is not None:
+                output_path = os.path.join(self.output_folder, f"{outputs[target]}.{activity_extension(target)}")
+                with STAGE_SECONDS.time(stage="activity_dump"):
+                    exporter["export"](ir, output_path)
+            else:
+                output_path = os.path.join(self.output_folder, f"{outputs[target]}.json")
+                document = ACTIVITY_TARGETS[target](ir)
+                with STAGE_SECONDS.time(stage="activity_dump"):
+                    write_compact_json(document, output_path)
+
+            ACTIVITIES_TOTAL.inc(type=target)
+            return output_path
+
+        targets = list(outputs)
+        if self.max_workers > 1 and len(targets) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(targets))) as executor:
+                return dict(zip(targets, executor.map(emit, targets)))
+
+        return {target: emit(target) for target in targets}
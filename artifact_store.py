@@ -0,0 +1,180 @@
+import os
+import time
+import uuid
+import shutil
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+"""
+
+
+class ArtifactStore:
+    """
+    Content-addressed store of generated files (presentations, activities)
+
+    Artifacts are named after a key capturing every input they were
+    generated from (content, template, color scheme, generator version), so
+    identical requests share one file and different requests never
+    overwrite each other's files. A SQLite index shared by all worker
+    processes tracks artifact sizes and last access times for LRU eviction.
+    """
+
+    def __init__(self, artifacts_folder: str, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Initialize the artifact store
+
+        Args:
+            artifacts_folder: Path to the folder where artifacts are stored
+            max_bytes: Maximum total size of the artifacts
+        """
+        self.artifacts_folder = artifacts_folder
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(artifacts_folder, "index.sqlite3")
+
+        # Ensure artifacts folder exists
+        if not os.path.exists(artifacts_folder):
+            os.makedirs(artifacts_folder)
+
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """
+        Open a short-lived connection to the artifact index
+
+        Yields:
+            SQLite connection
+        """
+        connection = sqlite3.connect(self.index_path, timeout=30)
+
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def path(self, name: str) -> Optional[str]:
+        """
+        Get the file path of an artifact
+
+        Args:
+            name: Artifact name
+
+        Returns:
+            Path of the artifact file, or None for an invalid name
+        """
+        if not name or os.path.basename(name) != name or name.startswith(".") or name.startswith("index."):
+            return None
+        return os.path.join(self.artifacts_folder, name)
+
+    def get(self, name: str) -> Optional[str]:
+        """
+        Get a stored artifact, marking it as recently used
+
+        Args:
+            name: Artifact name
+
+        Returns:
+            Path of the artifact file, or None if it is not stored
+        """
+        artifact_path = self.path(name)
+        if artifact_path is None:
+            return None
+
+        with self._connect() as connection:
+            row = connection.execute("SELECT name FROM artifacts WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+
+            if not os.path.exists(artifact_path):
+                # Removed behind the index's back
+                connection.execute("DELETE FROM artifacts WHERE name = ?", (name,))
+                return None
+
+            connection.execute("UPDATE artifacts SET last_access = ? WHERE name = ?", (time.time(), name))
+
+        return artifact_path
+
+    def put(self, name: str, source_path: str) -> str:
+        """
+        Move a generated file into the store
+
+        Args:
+            name: Artifact name
+            source_path: Path of the generated file (moved, not copied)
+
+        Returns:
+            Path of the artifact file
+        """
+        artifact_path = self.path(name)
+        if artifact_path is None:
+            raise ValueError(f"Invalid artifact name: {name}")
+
+        # Move to a private file first so readers never see a partial artifact
+        tmp_path = os.path.join(self.artifacts_folder, f".{name}.{uuid.uuid4().hex}.tmp")
+        shutil.move(source_path, tmp_path)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, artifact_path)
+
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO artifacts (name, size, last_access) VALUES (?, ?, ?)",
+                (name, size, time.time())
+            )
+
+        self._evict(keep=name)
+        return artifact_path
+
+    def _evict(self, keep: str = None):
+        """
+        Remove least recently used artifacts until the store fits in max_bytes
+
+        Args:
+            keep: Name of an artifact never evicted (the one just stored)
+        """
+        with self._connect() as connection:
+            total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+            if total_size <= self.max_bytes:
+                return
+
+            rows = connection.execute("SELECT name, size FROM artifacts ORDER BY last_access").fetchall()
+
+            for name, size in rows:
+                if total_size <= self.max_bytes:
+                    break
+                if name == keep:
+                    continue
+
+                connection.execute("DELETE FROM artifacts WHERE name = ?", (name,))
+                try:
+                    os.remove(os.path.join(self.artifacts_folder, name))
+                except OSError:
+                    pass
+                total_size -= size
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get store statistics
+
+        Returns:
+            Dictionary with the artifact count and total size
+        """
+        with self._connect() as connection:
+            artifacts, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts"
+            ).fetchone()
+
+        return {
+            "artifacts": artifacts,
+            "size_bytes": size
+        }
@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional, Callable
+from src.services.file_processor import FileProcessor
+from src.services.pptx_generator import PPTXGenerator
+from src.services.activity_generator import ActivityGenerator
+from src.services.extraction_cache import ExtractionCache
+from src.services.ocr_engine import OCREngine
+
+ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
+
+# Files written into the batch output folder
+STATE_FILENAME = "batch_state.jsonl"
+SUMMARY_FILENAME = "batch_summary.json"
+
+
+def _generate_lesson_files(source_path: str, output_folder: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert one source file inside a worker process
+
+    Args:
+        source_path: Path to the PDF or image file
+        output_folder: Folder receiving the presentation and activities
+        options: Batch options (see BatchGenerator)
+
+    Returns:
+        Dictionary describing the generated files and stage timings
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    cache = None
+    if options.get("cache_folder"):
+        cache = ExtractionCache(options["cache_folder"], max_bytes=options["cache_max_bytes"])
+
+    # Each worker is one process already, so OCR runs inline. Images go
+    # straight from extraction to the slides in memory, unless the cache
+    # needs them stored for later runs.
+    file_processor = FileProcessor(
+        options["upload_folder"],
+        cache=cache,
+        ocr_engine=OCREngine(max_workers=0, **options.get("ocr_options", {})),
+        persist_images=cache is not None
+    )
+
+    stage_started = time.perf_counter()
+    content = file_processor.process_file(source_path)
+    timings["extract"] = time.perf_counter() - stage_started
+
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    os.makedirs(output_folder, exist_ok=True)
+
+    stage_started = time.perf_counter()
+    pptx_generator = PPTXGenerator(options["templates_folder"], output_folder)
+    pptx_path = pptx_generator.generate_presentation(
+        content,
+        template_name=options["template_name"],
+        color_scheme=options["color_scheme"],
+        output_filename=name
+    )
+    timings["presentation"] = time.perf_counter() - stage_started
+
+    outputs = {"pptx": pptx_path}
+    activity_generator = ActivityGenerator(output_folder)
+
+    # The requested activities are compiled together in a single pass
+    activity_names = {
+        activity_type: f"{activity_type}_{name}"
+        for activity_type in ("kahoot", "nearpod")
+        if options.get(f"generate_{activity_type}", True)
+    }
+    if activity_names:
+        stage_started = time.perf_counter()
+        outputs.update(activity_generator.generate_activities(content, activity_names))
+        timings["activities"] = time.perf_counter() - stage_started
+
+    timings["total"] = time.perf_counter() - started
+
+    return {
+        "pages": len(content.get("pages", [])),
+        "outputs": outputs,
+        "timings": timings
+    }
+
+
+class BatchGenerator:
+    """
+    Service for converting whole folders of lesson files in one run
+
+    Files are converted across a process pool. Every finished file is
+    appended to a state file in the output folder, so a run that crashed or
+    was interrupted resumes where it stopped.
+    """
+
+    def __init__(self, output_folder: str, templates_folder: str, max_workers: int = None,
+                 template_name: str = "default", color_scheme: str = "default",
+                 generate_kahoot: bool = True, generate_nearpod: bool = True,
+                 cache_folder: str = None, cache_max_bytes: int = 512 * 1024 * 1024,
+                 ocr_options: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the batch generator
+
+        Args:
+            output_folder: Folder receiving the generated files, state and summary
+            templates_folder: Path to the folder containing presentation templates
+            max_workers: Number of worker processes (defaults to the CPU count)
+            template_name: Name of the template to use
+            color_scheme: Name of the color scheme to use
+            generate_kahoot: Whether to generate Kahoot activities
+            generate_nearpod: Whether to generate Nearpod activities
+            cache_folder: Optional extraction cache folder
+            cache_max_bytes: Maximum size of the extraction cache
+            ocr_options: Settings of the OCR engine
+        """
+        self.output_folder = output_folder
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.state_path = os.path.join(output_folder, STATE_FILENAME)
+        self.summary_path = os.path.join(output_folder, SUMMARY_FILENAME)
+
+        self.options = {
+            "upload_folder": os.path.join(output_folder, "_extracted"),
+            "templates_folder": templates_folder,
+            "template_name": template_name,
+            "color_scheme": color_scheme,
+            "generate_kahoot": generate_kahoot,
+            "generate_nearpod": generate_nearpod,
+            "cache_folder": cache_folder,
+            "cache_max_bytes": cache_max_bytes,
+            "ocr_options": ocr_options or {}
+        }
+
+        # Ensure output folder exists
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+
+    def collect_sources(self, source: str) -> List[str]:
+        """
+        Collect the files to convert
+
+        Args:
+            source: Directory (searched recursively) or manifest file; a
+                manifest is a JSON list of paths or a text file with one path
+                per line, relative paths being resolved against the manifest
+
+        Returns:
+            Sorted list of absolute file paths
+        """
+        if os.path.isdir(source):
+            sources = [
+                os.path.join(root, filename)
+                for root, _, filenames in os.walk(source)
+                for filename in filenames
+            ]
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                if source.lower().endswith('.json'):
+                    entries = json.load(f)
+                else:
+                    entries = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+            manifest_folder = os.path.dirname(os.path.abspath(source))
+            sources = [os.path.join(manifest_folder, entry) for entry in entries]
+
+        return sorted(
+            os.path.abspath(path) for path in sources
+            if '.' in path and path.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+        )
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Load the records of files finished by earlier runs
+
+        Returns:
+            Dictionary mapping source path to its latest record
+        """
+        state = {}
+
+        if not os.path.exists(self.state_path):
+            return state
+
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Partial line written during a crash
+                    continue
+                state[record["source"]] = record
+
+        return state
+
+    def _is_done(self, record: Optional[Dict[str, Any]]) -> bool:
+        """
+        Check whether a file was converted successfully by an earlier run
+
+        Args:
+            record: Latest state record of the file
+
+        Returns:
+            True if the file can be skipped
+        """
+        if not record or record["status"] != "ok":
+            return False
+
+        return all(os.path.exists(path) for path in record["outputs"].values())
+
+    def _output_folder_for(self, source_path: str, base_folder: str) -> str:
+        """
+        Get the output folder of a source file, mirroring the source layout
+
+        The folder is named after the whole file name, extension included,
+        so "lesson.pdf" and "lesson.docx" of one folder never share outputs.
+
+        Args:
+            source_path: Path to the source file
+            base_folder: Common folder of all source files
+
+        Returns:
+            Output folder of the file
+        """
+        relative_path = os.path.relpath(source_path, base_folder)
+        return os.path.join(self.output_folder, relative_path)
+
+    def run(self, sources: List[str], progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """
+        Convert the source files and write the summary report
+
+        Args:
+            sources: Paths to the files to convert
+            progress_callback: Optional callable receiving (files done, total files)
+
+        Returns:
+            Summary report
+        """
+        started = time.perf_counter()
+        state = self._load_state()
+        base_folder = os.path.commonpath([os.path.dirname(path) for path in sources]) if sources else ""
+
+        pending = [path for path in sources if not self._is_done(state.get(path))]
+        done = len(sources) - len(pending)
+
+        if progress_callback:
+            progress_callback(done, len(sources))
+
+        with open(self.state_path, 'a', encoding='utf-8') as state_file, \
+                ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(
+                    _generate_lesson_files, path, self._output_folder_for(path, base_folder), self.options
+                ): path
+                for path in pending
+            }
+
+            for future in as_completed(futures):
+                path = futures[future]
+
+                try:
+                    record = {"source": path, "status": "ok"}
+                    record.update(future.result())
+                except Exception as e:
+                    record = {"source": path, "status": "failed", "error": str(e)}
+
+                # Persist each result immediately so a crash loses nothing
+                state_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                state_file.flush()
+                os.fsync(state_file.fileno())
+                state[path] = record
+
+                done += 1
+                if progress_callback:
+                    progress_callback(done, len(sources))
+
+        files = [state[path] for path in sources if path in state]
+        summary = {
+            "total": len(sources),
+            "succeeded": sum(1 for record in files if record["status"] == "ok"),
+            "failed": sum(1 for record in files if record["status"] == "failed"),
+            "resumed": len(sources) - len(pending),
+            "elapsed": time.perf_counter() - started,
+            "files": files
+        }
+
+        with open(self.summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        return summary
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Command-line entry point for batch lesson generation
+
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+
+    Returns:
+        Process exit code
+    """
+    parser = argparse.ArgumentParser(description="Convert a folder or manifest of lesson files in one run")
+    parser.add_argument("source", help="Directory of PDF/image files, or a manifest (.json list or one path per line)")
+    parser.add_argument("-o", "--output", required=True, help="Output folder (re-run with the same folder to resume)")
+    parser.add_argument("--templates", default=os.path.join("static", "templates"), help="Templates folder")
+    parser.add_argument("--template", default="default", help="Template name")
+    parser.add_argument("--color-scheme", default="default", help="Color scheme name")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--cache", default=None, help="Extraction cache folder")
+    parser.add_argument("--no-kahoot", action="store_true", help="Skip Kahoot activities")
+    parser.add_argument("--no-nearpod", action="store_true", help="Skip Nearpod activities")
+    args = parser.parse_args(argv)
+
+    batch_generator = BatchGenerator(
+        args.output,
+        args.templates,
+        max_workers=args.workers,
+        template_name=args.template,
+        color_scheme=args.color_scheme,
+        generate_kahoot=not args.no_kahoot,
+        generate_nearpod=not args.no_nearpod,
+        cache_folder=args.cache
+    )
+
+    sources = batch_generator.collect_sources(args.source)
+    summary = batch_generator.run(
+        sources,
+        progress_callback=lambda done, total: print(f"{done}/{total} files", file=sys.stderr)
+    )
+
+    print(f"{summary['succeeded']} succeeded, {summary['failed']} failed, "
+          f"{summary['resumed']} resumed in {summary['elapsed']:.1f}s - see {batch_generator.summary_path}")
+
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
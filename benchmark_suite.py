@@ -0,0 +1,422 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import argparse
+import tempfile
+import multiprocessing
+from typing import Dict, List, Any, Callable
+import fitz  # PyMuPDF
+from PIL import Image
+
+# Repository fixture benchmarked alongside the synthetic documents
+REPO_FIXTURE = "test_content.pdf"
+
+# Allowed slowdown of the p50 latency against the baseline before a stage is
+# reported as a regression
+DEFAULT_TOLERANCE = 0.2
+
+ENGLISH_LINES = [
+    "INTRODUCTION",
+    "Plants make their own food through photosynthesis.",
+    "They use sunlight, water and carbon dioxide.",
+    "- Leaves capture light",
+    "- Roots absorb water",
+    "Key terms:",
+    "Chlorophyll is the green pigment found in chloroplasts.",
+]
+
+ARABIC_LINES = [
+    "الوحدة الأولى: مقدمة",
+    "تصنع النباتات غذاءها بعملية البناء الضوئي.",
+    "تستخدم ضوء الشمس والماء وثاني أكسيد الكربون.",
+    "• تلتقط الأوراق الضوء",
+    "• تمتص الجذور الماء",
+    "المفاهيم الرئيسية:",
+    "اليخضور هو الصبغة الخضراء الموجودة في البلاستيدات.",
+]
+
+
+def _write_text_page(page, page_num: int, lines: List[str], fontfile: str = None):
+    """
+    Write a numbered heading and body lines on a synthetic page
+
+    Args:
+        page: PDF page object
+        page_num: Page number
+        lines: Body lines
+        fontfile: Optional font file with the glyphs of the lines; without
+            one, non-Latin lines are laid out as HTML (which falls back to
+            PyMuPDF's bundled fonts) when the installed version supports it
+
+    Raises:
+        ValueError: If non-Latin lines cannot be written (no font file and no
+            HTML layout in the installed PyMuPDF)
+    """
+    page.insert_text((72, 60), f"{page_num + 1}. Lesson {page_num + 1}", fontsize=18)
+
+    if not fontfile and not all(line.isascii() for line in lines):
+        if not hasattr(page, "insert_htmlbox"):
+            # The built-in Helvetica has no glyphs for them
+            raise ValueError("Non-Latin text needs a font file or PyMuPDF with insert_htmlbox")
+        body = "".join(f"<p>{line}</p>" for line in lines * 4)
+        page.insert_htmlbox(fitz.Rect(72, 80, page.rect.width - 72, page.rect.height - 72), body)
+        return
+
+    y = 100
+    for repeat in range(4):
+        for line in lines:
+            if fontfile:
+                page.insert_text((72, y), line, fontsize=11, fontname="F0", fontfile=fontfile)
+            else:
+                page.insert_text((72, y), line, fontsize=11)
+            y += 16
+        y += 16
+
+
+def _png_bytes(size: int, color) -> bytes:
+    """
+    Encode a solid-color PNG image
+
+    Args:
+        size: Width and height in pixels
+        color: RGB color tuple
+
+    Returns:
+        Encoded PNG
+    """
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def build_fixtures(folder: str, large_pages: int = 2000, arabic_font: str = None) -> Dict[str, str]:
+    """
+    Build the synthetic PDF fixtures
+
+    Args:
+        folder: Folder receiving the fixtures
+        large_pages: Page count of the large text-only document
+        arabic_font: Optional TTF font with Arabic glyphs (the Arabic fixture
+            is skipped without one when PyMuPDF cannot lay out Arabic text)
+
+    Returns:
+        Dictionary mapping fixture name to PDF path
+    """
+    os.makedirs(folder, exist_ok=True)
+    fixtures = {}
+
+    # Text-only
+    for name, page_count in (("text", 200), ("large", large_pages)):
+        doc = fitz.open()
+        for page_num in range(page_count):
+            _write_text_page(doc.new_page(), page_num, ENGLISH_LINES)
+        fixtures[name] = os.path.join(folder, f"{name}.pdf")
+        doc.save(fixtures[name])
+        doc.close()
+
+    # Image-heavy: a logo repeated on every page plus unique figures
+    doc = fitz.open()
+    logo = _png_bytes(128, (106, 17, 203))
+    for page_num in range(60):
+        page = doc.new_page()
+        _write_text_page(page, page_num, ENGLISH_LINES[:3])
+        page.insert_image(fitz.Rect(480, 20, 560, 100), stream=logo)
+        for figure in range(3):
+            color = ((page_num * 7) % 256, (figure * 80) % 256, 120)
+            top = 320 + figure * 150
+            page.insert_image(fitz.Rect(72, top, 272, top + 140), stream=_png_bytes(400, color))
+    fixtures["images"] = os.path.join(folder, "images.pdf")
+    doc.save(fixtures["images"])
+    doc.close()
+
+    # Arabic (only with real Arabic text, otherwise it would not measure
+    # Arabic extraction)
+    if arabic_font or hasattr(fitz.Page, "insert_htmlbox"):
+        doc = fitz.open()
+        for page_num in range(100):
+            _write_text_page(doc.new_page(), page_num, ARABIC_LINES, fontfile=arabic_font)
+        fixtures["arabic"] = os.path.join(folder, "arabic.pdf")
+        doc.save(fixtures["arabic"])
+        doc.close()
+    else:
+        print("Skipping the arabic fixture: pass --arabic-font (this PyMuPDF cannot lay out Arabic text)",
+              file=sys.stderr)
+
+    # Looked up next to this module and in the working directory
+    for search_dir in (os.path.dirname(os.path.abspath(__file__)), os.getcwd()):
+        if os.path.exists(os.path.join(search_dir, REPO_FIXTURE)):
+            fixtures["test_content"] = os.path.join(search_dir, REPO_FIXTURE)
+            break
+
+    return fixtures
+
+
+def synthetic_content(headings: int, paragraphs_per_section: int = 2, arabic: bool = True) -> Dict[str, Any]:
+    """
+    Build a synthetic extracted-content dictionary
+
+    Args:
+        headings: Number of headings
+        paragraphs_per_section: Paragraphs under each heading
+        arabic: Whether to use Arabic text
+
+    Returns:
+        Content dictionary shaped like FileProcessor output
+    """
+    lines = ARABIC_LINES if arabic else ENGLISH_LINES
+    structure = {
+        "title": lines[0],
+        "headings": [],
+        "paragraphs": [],
+        "bullet_points": [],
+        "paragraph_sections": [],
+        "bullet_point_sections": []
+    }
+
+    for section_id in range(headings):
+        structure["headings"].append({
+            "text": f"{section_id + 1}. {lines[0]} {section_id}",
+            "level": 2,
+            "section_id": section_id
+        })
+        for paragraph in range(paragraphs_per_section):
+            structure["paragraphs"].append(f"{lines[1]} {lines[2]} {section_id}-{paragraph}")
+            structure["paragraph_sections"].append(section_id)
+        if section_id % 5 == 0:
+            structure["bullet_points"].append([lines[3], lines[4]])
+            structure["bullet_point_sections"].append(section_id)
+
+    return {"title": "synthetic.pdf", "pages": [], "images": [], "structure": structure}
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """
+    Compute a percentile with linear interpolation
+
+    Args:
+        values: Measured values
+        percent: Percentile between 0 and 100
+
+    Returns:
+        Percentile value
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _prepare_stage(stage: str, fixture: str, work_folder: str) -> Callable[[], int]:
+    """
+    Build the callable measured for one stage and fixture
+
+    Args:
+        stage: Stage name
+        fixture: PDF path, or "synthetic:<headings>" for synthetic content
+        work_folder: Scratch folder
+
+    Returns:
+        Callable running the stage once and returning the number of units
+        processed (pages, slides or questions)
+    """
+    from src.services.file_processor import FileProcessor
+    from src.services.pptx_generator import PPTXGenerator
+    from src.services.activity_compiler import build_activity_ir, kahoot_target
+
+    file_processor = FileProcessor(os.path.join(work_folder, "uploads"))
+
+    if fixture.startswith("synthetic:"):
+        content = synthetic_content(int(fixture.split(":", 1)[1]))
+    elif stage != "extract":
+        content = file_processor.process_file(fixture)
+
+    if stage == "extract":
+        return lambda: len(file_processor.process_file(fixture)["pages"])
+
+    if stage == "structure":
+        def structure():
+            file_processor._extract_structure(content["pages"])
+            return len(content["pages"])
+
+        return structure
+
+    if stage == "presentation":
+        pptx_generator = PPTXGenerator(os.path.join(work_folder, "templates"), os.path.join(work_folder, "output"))
+        slide_count = len(pptx_generator.build_slide_plan(content))
+
+        def generate():
+            pptx_generator.generate_presentation(content, output_filename="benchmark")
+            return slide_count
+
+        return generate
+
+    if stage == "kahoot":
+        return lambda: len(kahoot_target(build_activity_ir(content))["questions"])
+
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def _run_stage(stage: str, fixture: str, iterations: int, warmup: int) -> Dict[str, Any]:
+    """
+    Measure one stage in a fresh process
+
+    Args:
+        stage: Stage name
+        fixture: Fixture path or synthetic spec
+        iterations: Number of measured runs
+        warmup: Number of unmeasured runs
+
+    Returns:
+        Dictionary with latency percentiles, throughput and peak RSS
+    """
+    work_folder = tempfile.mkdtemp(prefix="lesson-bench-")
+
+    try:
+        run = _prepare_stage(stage, fixture, work_folder)
+
+        for _ in range(warmup):
+            run()
+
+        latencies = []
+        units = 0
+        for _ in range(iterations):
+            started = time.perf_counter()
+            units += run()
+            latencies.append(time.perf_counter() - started)
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+
+    return {
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "throughput": units / sum(latencies) if sum(latencies) else 0.0,
+        "peak_rss_mb": peak_rss / (1024 * 1024),
+        "iterations": iterations
+    }
+
+
+def run_benchmarks(fixtures: Dict[str, str], stages: List[str], iterations: int = 5, warmup: int = 1,
+                   synthetic_sizes: List[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Run every stage on every fixture, each measurement in its own process
+
+    Args:
+        fixtures: Dictionary mapping fixture name to PDF path
+        stages: Stages to run ("extract", "structure", "presentation", "kahoot")
+        iterations: Number of measured runs per benchmark
+        warmup: Number of unmeasured runs per benchmark
+        synthetic_sizes: Heading counts of the synthetic structure fixtures
+
+    Returns:
+        Dictionary mapping "<stage>/<fixture>" to its results
+    """
+    cases = []
+    for stage in stages:
+        for name, path in fixtures.items():
+            cases.append((stage, name, path))
+        if stage in ("presentation", "kahoot"):
+            for size in synthetic_sizes or [200, 2000]:
+                cases.append((stage, f"synthetic-{size}", f"synthetic:{size}"))
+
+    # A fresh interpreter per case keeps peak RSS figures independent
+    context = multiprocessing.get_context("spawn")
+    results = {}
+
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for stage, name, path in cases:
+            results[f"{stage}/{name}"] = pool.apply(_run_stage, (stage, path, iterations, warmup))
+
+    return results
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                        tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Find benchmarks that got slower than the baseline
+
+    Args:
+        results: Current results
+        baseline: Stored baseline results
+        tolerance: Allowed relative p50 slowdown
+
+    Returns:
+        List of regression descriptions
+    """
+    regressions = []
+
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+
+        previous = baseline[key]["p50"]
+        if previous and result["p50"] > previous * (1 + tolerance):
+            regressions.append(f"{key}: p50 {previous * 1000:.1f}ms -> {result['p50'] * 1000:.1f}ms")
+
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Command-line entry point of the benchmark suite
+
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+
+    Returns:
+        Process exit code (1 when a regression against the baseline is found)
+    """
+    parser = argparse.ArgumentParser(description="Benchmark extraction, structuring and generation")
+    parser.add_argument("--stages", default="extract,structure,presentation,kahoot", help="Comma-separated stages")
+    parser.add_argument("--fixtures", default=None, help="Comma-separated fixture names (default: all)")
+    parser.add_argument("--fixtures-folder", default=None, help="Folder for generated fixtures (default: temporary)")
+    parser.add_argument("--large-pages", type=int, default=2000, help="Page count of the large fixture")
+    parser.add_argument("--arabic-font", default=None, help="TTF font with Arabic glyphs for the Arabic fixture")
+    parser.add_argument("-n", "--iterations", type=int, default=5, help="Measured runs per benchmark")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured runs per benchmark")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", default=None, help="Write the results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed p50 slowdown (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    fixtures_folder = args.fixtures_folder or tempfile.mkdtemp(prefix="lesson-fixtures-")
+    fixtures = build_fixtures(fixtures_folder, large_pages=args.large_pages, arabic_font=args.arabic_font)
+    if args.fixtures:
+        selected = args.fixtures.split(",")
+        fixtures = {name: path for name, path in fixtures.items() if name in selected}
+
+    results = run_benchmarks(fixtures, args.stages.split(","), iterations=args.iterations, warmup=args.warmup)
+
+    print(f"{'benchmark':<32} {'p50 ms':>10} {'p95 ms':>10} {'units/s':>10} {'peak MB':>9}")
+    for key, result in results.items():
+        print(f"{key:<32} {result['p50'] * 1000:>10.1f} {result['p95'] * 1000:>10.1f} "
+              f"{result['throughput']:>10.1f} {result['peak_rss_mb']:>9.1f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
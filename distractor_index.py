@@ -0,0 +1,202 @@
+import re
+import numpy as np
+from typing import Dict, List, Any, Optional
+
+# Words: runs of letters and digits; Arabic diacritics and the tatweel are
+# removed first so that vocalized and plain spellings share one term
+WORD_PATTERN = re.compile(r"\w+")
+ARABIC_MARKS_PATTERN = re.compile(r"[\u0640\u064B-\u065F\u0670]")
+SENTENCE_PATTERN = re.compile(r"[^.!?؟\n]+[.!?؟]?")
+
+# Kinds of indexed texts
+TEXT_HEADING = "heading"
+TEXT_SENTENCE = "sentence"
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into normalized terms
+
+    Args:
+        text: Text to split
+
+    Returns:
+        List of terms (lowercase, without Arabic diacritics, at least two
+        characters long)
+    """
+    return [word for word in WORD_PATTERN.findall(ARABIC_MARKS_PATTERN.sub("", text).lower()) if len(word) > 1]
+
+
+def split_sentences(paragraph: str, min_length: int = 15) -> List[str]:
+    """
+    Split a paragraph into sentences
+
+    Args:
+        paragraph: Paragraph text
+        min_length: Minimum number of characters of a kept sentence
+
+    Returns:
+        List of stripped sentences
+    """
+    sentences = (match.group().strip() for match in SENTENCE_PATTERN.finditer(paragraph))
+    return [sentence for sentence in sentences if len(sentence) >= min_length]
+
+
+class DistractorIndex:
+    """
+    TF-IDF index of the headings and sentences of a lesson
+
+    Texts are stored as the rows of a sparse matrix in CSR form (row
+    pointers, term indices and L2-normalized TF-IDF weights in flat NumPy
+    arrays), so a similarity query against every indexed text is a single
+    gather, multiply and bincount over the non-zero weights. Each text keeps
+    the section (heading index) it belongs to, which lets callers pick
+    plausible wrong answers from other sections.
+    """
+
+    def __init__(self, texts: List[str], kinds: List[str], sections: List[Optional[int]]):
+        """
+        Build the index
+
+        Args:
+            texts: Indexed texts
+            kinds: Kind of each text (TEXT_HEADING or TEXT_SENTENCE)
+            sections: Section of each text (None outside any section)
+        """
+        self.texts = texts
+        self.kinds = np.array(kinds, dtype=str)
+        self.sections = np.array([-1 if section is None else section for section in sections], dtype=np.int64)
+
+        # Term IDs of every token, with the row each token belongs to
+        vocabulary = {}
+        token_terms = []
+        token_counts = []
+        for text in texts:
+            tokens = tokenize(text)
+            token_terms.extend(vocabulary.setdefault(term, len(vocabulary)) for term in tokens)
+            token_counts.append(len(tokens))
+
+        self.vocabulary = vocabulary
+        token_rows = np.repeat(np.arange(len(texts), dtype=np.int64), token_counts)
+
+        # Count (row, term) pairs at once; the sorted pairs are the CSR order
+        pairs, counts = np.unique(
+            token_rows * max(len(vocabulary), 1) + np.array(token_terms, dtype=np.int64),
+            return_counts=True
+        )
+        self.rows, self.indices = np.divmod(pairs, max(len(vocabulary), 1))
+        self.indptr = np.searchsorted(self.rows, np.arange(len(texts) + 1))
+
+        # Smoothed inverse document frequency and sublinear term frequency
+        document_frequency = np.bincount(self.indices, minlength=len(vocabulary))
+        self.idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+        weights = (1 + np.log(counts)) * self.idf[self.indices]
+
+        norms = np.sqrt(np.bincount(self.rows, weights=weights ** 2, minlength=len(texts)))
+        self.data = weights / np.where(norms > 0, norms, 1)[self.rows]
+
+    @classmethod
+    def from_structure(cls, structure: Dict[str, Any]) -> "DistractorIndex":
+        """
+        Index the headings and paragraph sentences of an extracted structure
+
+        Args:
+            structure: Structure dictionary of the extracted content
+
+        Returns:
+            Distractor index
+        """
+        texts, kinds, sections = [], [], []
+
+        for index, heading in enumerate(structure.get("headings", [])):
+            texts.append(heading["text"])
+            kinds.append(TEXT_HEADING)
+            sections.append(heading.get("section_id", index))
+
+        paragraphs = structure.get("paragraphs", [])
+        paragraph_sections = structure.get("paragraph_sections") or [None] * len(paragraphs)
+
+        for paragraph, section in zip(paragraphs, paragraph_sections):
+            for sentence in split_sentences(paragraph):
+                texts.append(sentence)
+                kinds.append(TEXT_SENTENCE)
+                sections.append(section)
+
+        return cls(texts, kinds, sections)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def section_texts(self, section: int, kind: str = TEXT_SENTENCE) -> List[int]:
+        """
+        Get the texts of a section
+
+        Args:
+            section: Section (heading index)
+            kind: Kind of the texts
+
+        Returns:
+            Indices of the texts, in document order
+        """
+        return np.flatnonzero((self.sections == section) & (self.kinds == kind)).tolist()
+
+    def similarities(self, query: str) -> np.ndarray:
+        """
+        Compute the cosine similarity of a text with every indexed text
+
+        Args:
+            query: Query text
+
+        Returns:
+            Array of similarities, one per indexed text
+        """
+        query_vector = np.zeros(len(self.vocabulary))
+        terms = [self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary]
+        if terms:
+            terms, counts = np.unique(terms, return_counts=True)
+            query_vector[terms] = (1 + np.log(counts)) * self.idf[terms]
+            query_vector /= np.linalg.norm(query_vector)
+
+        return np.bincount(self.rows, weights=self.data * query_vector[self.indices], minlength=len(self.texts))
+
+    def nearest(self, query: str, count: int, kind: str = TEXT_SENTENCE, exclude_section: Optional[int] = None,
+                exclude_texts: List[str] = (), max_similarity: float = 0.9) -> List[int]:
+        """
+        Find the texts most similar to a query outside one section
+
+        Near-duplicates of the query (similarity above max_similarity) are
+        skipped, as are texts equal to one of exclude_texts; among equally
+        similar texts, earlier ones come first.
+
+        Args:
+            query: Query text
+            count: Maximum number of texts returned
+            kind: Kind of the texts returned
+            exclude_section: Section whose texts are never returned
+            exclude_texts: Texts never returned
+            max_similarity: Maximum similarity of a returned text
+
+        Returns:
+            Indices of the texts, most similar first
+        """
+        scores = self.similarities(query)
+
+        candidates = (self.kinds == kind) & (scores <= max_similarity)
+        if exclude_section is not None:
+            candidates &= self.sections != exclude_section
+
+        candidate_indices = np.flatnonzero(candidates)
+        order = candidate_indices[np.argsort(-scores[candidate_indices], kind="stable")]
+
+        excluded = set(exclude_texts)
+        nearest = []
+        for index in order.tolist():
+            text = self.texts[index]
+            if text in excluded:
+                continue
+            excluded.add(text)
+            nearest.append(index)
+            if len(nearest) == count:
+                break
+
+        return nearest
@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import zlib
+import hashlib
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# Size of the chunks read when hashing uploaded files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Entry file holding the zlib-compressed JSON pages of content whose pages
+# were streamed into a session instead of being kept in the content
+PAGES_FILE = "pages.json.z"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def hash_file(file_path: str) -> str:
+    """
+    Compute the SHA-256 hash of a file
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of extracted file content
+
+    Entries are keyed by the hash of the uploaded bytes plus the extractor
+    version and hold the extracted content dictionary and its image blobs.
+    A SQLite index shared by all worker processes tracks entry sizes, last
+    access times (for LRU eviction) and hit/miss counters.
+    """
+
+    def __init__(self, cache_folder: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Initialize the extraction cache
+
+        Args:
+            cache_folder: Path to the folder where cache entries are stored
+            max_bytes: Maximum total size of the cache entries
+        """
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_folder, "index.sqlite3")
+
+        # Ensure cache folder exists
+        if not os.path.exists(cache_folder):
+            os.makedirs(cache_folder)
+
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """
+        Open a short-lived connection to the cache index
+
+        Yields:
+            SQLite connection
+        """
+        connection = sqlite3.connect(self.index_path, timeout=30)
+
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _increment(self, connection: sqlite3.Connection, counter: str):
+        """
+        Increment a hit/miss counter
+
+        Args:
+            connection: Open index connection
+            counter: Name of the counter
+        """
+        connection.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (counter,)
+        )
+
+    def make_key(self, file_path: str, extractor_version: str, content_hash: str = None) -> str:
+        """
+        Build the cache key of a file
+
+        Args:
+            file_path: Path to the file
+            extractor_version: Version of the extractor producing the content
+            content_hash: SHA-256 hash of the file, if already known
+
+        Returns:
+            Cache key
+        """
+        if content_hash is None:
+            content_hash = hash_file(file_path)
+
+        return f"{content_hash}-v{extractor_version}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get cached content
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached content dictionary, or None on a miss
+        """
+        content_path = os.path.join(self.cache_folder, key, "content.json")
+
+        with self._connect() as connection:
+            row = connection.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+
+            if row is None or not os.path.exists(content_path):
+                self._increment(connection, "misses")
+                return None
+
+            connection.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._increment(connection, "hits")
+
+        with open(content_path, 'r', encoding='utf-8') as f:
+            content = json.load(f)
+
+        pages_path = os.path.join(self.cache_folder, key, PAGES_FILE)
+        if os.path.exists(pages_path):
+            with open(pages_path, 'rb') as f:
+                content["pages"] = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+
+        return content
+
+    def put(self, key: str, content: Dict[str, Any], pages_path: str = None):
+        """
+        Store extracted content and its image blobs
+
+        Args:
+            key: Cache key
+            content: Extracted content dictionary
+            pages_path: Optional file holding the zlib-compressed JSON pages
+                (a finished session PageSectionWriter), stored instead of
+                content["pages"]
+        """
+        entry_folder = os.path.join(self.cache_folder, key)
+        if os.path.exists(entry_folder):
+            return
+
+        # Build the entry in a private folder, then move it into place
+        tmp_folder = os.path.join(self.cache_folder, f".{key}-{uuid.uuid4().hex}")
+        images_folder = os.path.join(tmp_folder, "images")
+        os.makedirs(images_folder)
+
+        cached_content = dict(content)
+        cached_content["images"] = []
+
+        for image in content.get("images", []):
+            cached_image = dict(image)
+            if "path" in image and os.path.exists(image["path"]):
+                image_name = os.path.basename(image["path"])
+                shutil.copyfile(image["path"], os.path.join(images_folder, image_name))
+                cached_image["path"] = os.path.join(entry_folder, "images", image_name)
+            cached_content["images"].append(cached_image)
+
+        if pages_path is not None:
+            cached_content.pop("pages", None)
+            shutil.copyfile(pages_path, os.path.join(tmp_folder, PAGES_FILE))
+
+        with open(os.path.join(tmp_folder, "content.json"), 'w', encoding='utf-8') as f:
+            json.dump(cached_content, f, ensure_ascii=False)
+
+        size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(tmp_folder)
+            for name in names
+        )
+
+        try:
+            os.rename(tmp_folder, entry_folder)
+        except OSError:
+            # Another worker stored the same entry first
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            return
+
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+                (key, size, time.time())
+            )
+
+        self._evict()
+
+    def _evict(self):
+        """
+        Remove least recently used entries until the cache fits in max_bytes
+        """
+        with self._connect() as connection:
+            total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+            if total_size <= self.max_bytes:
+                return
+
+            rows = connection.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+
+            for key, size in rows:
+                if total_size <= self.max_bytes:
+                    break
+
+                connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                shutil.rmtree(os.path.join(self.cache_folder, key), ignore_errors=True)
+                total_size -= size
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with hit/miss counters, entry count and total size
+        """
+        with self._connect() as connection:
+            counters = dict(connection.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "entries": entries,
+            "size_bytes": size
+        }
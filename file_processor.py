@@ -1,141 +1,542 @@
 import os
+import mmap
+import time
 import fitz  # PyMuPDF
-from PIL import Image
-import pytesseract
-import re
 import json
-from typing import Dict, List, Any, Tuple, Optional
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Any, Tuple, Optional, Callable, Iterator, Iterable
+from src.services.extraction_cache import ExtractionCache, hash_file
+from src.services.ocr_engine import OCREngine
+from src.services.image_store import ImageStore, DocumentImages
+from src.services.line_classifier import LineClassifier, LINE_HEADING, LINE_BULLET, LINE_TEXT
+from src.services.layout_analyzer import LayoutAnalyzer, extract_line_features
+from src.services.metrics import REGISTRY, STAGE_SECONDS, PAGES_TOTAL, IMAGES_TOTAL, CACHE_REQUESTS_TOTAL
+from src.services.session_store import PageSectionWriter
+
+# Version of the extraction output; bump it whenever the content produced by
+# FileProcessor changes so that stale cache entries are not reused
+EXTRACTOR_VERSION = "4"
+
+# Memory mappings of the documents opened by _open_pdf, by document id
+_PDF_MAPPINGS = {}
+
+@lru_cache(maxsize=None)
+def _memoryview_streams_supported() -> bool:
+    """
+    Check once whether PyMuPDF opens documents from memoryview streams
+    
+    Older releases (such as 1.21) only accept bytes, bytearray and BytesIO
+    streams and reject anything else with TypeError.
+    
+    Returns:
+        True if memory-mapped files can be opened as streams
+    """
+    empty_document = fitz.open()
+    empty_document.new_page()
+    data = empty_document.tobytes()
+    empty_document.close()
+    
+    try:
+        fitz.open(stream=memoryview(data), filetype="pdf").close()
+    except TypeError:
+        return False
+    return True
+
+def _open_pdf(pdf_path: str):
+    """
+    Open a PDF file from a read-only memory mapping
+    
+    PyMuPDF reads the mapped pages directly, so the document is neither
+    copied into memory nor read through file calls; the operating system
+    pages it in on demand and shares it between processes opening the same
+    file. With PyMuPDF releases that do not accept memoryview streams (and
+    for empty files, which cannot be mapped) the document is opened from its
+    path instead. Close the document with _close_pdf to release the mapping.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        Open fitz document
+    """
+    if not _memoryview_streams_supported():
+        return fitz.open(pdf_path)
+    
+    with open(pdf_path, "rb") as f:
+        try:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped; let PyMuPDF report the error
+            return fitz.open(pdf_path)
+    
+    stream = memoryview(mapping)
+    try:
+        pdf_document = fitz.open(stream=stream, filetype="pdf")
+    except Exception:
+        stream.release()
+        mapping.close()
+        raise
+    
+    _PDF_MAPPINGS[id(pdf_document)] = (stream, mapping)
+    return pdf_document
+
+def _close_pdf(pdf_document):
+    """
+    Close a PDF document opened by _open_pdf and release its memory mapping,
+    if it has one
+    
+    Args:
+        pdf_document: Open fitz document
+    """
+    mapped = _PDF_MAPPINGS.pop(id(pdf_document), None)
+    pdf_document.close()
+    
+    if mapped is not None:
+        stream, mapping = mapped
+        stream.release()
+        mapping.close()
+
+def _extract_page_range(upload_folder: str, image_store_folder: str, pdf_path: str, start: int, stop: int,
+                        ocr_options: Dict[str, Any], layout_analysis: bool = False,
+                        collect_metrics: bool = False, persist_images: bool = True) -> Tuple[List[Tuple[Dict[str, Any], List[Dict[str, Any]]]], Optional[Dict[str, Any]]]:
+    """
+    Extract a contiguous range of PDF pages inside a worker process
+    
+    Each worker opens its own fitz document, since documents cannot be shared
+    between processes, and runs OCR for scanned pages inline.
+    
+    Args:
+        upload_folder: Path to the folder where uploaded files are stored
+        image_store_folder: Path to the folder where extracted images are stored
+        pdf_path: Path to the PDF file
+        start: Index of the first page of the range
+        stop: Index after the last page of the range
+        ocr_options: Settings of the OCR engine
+        layout_analysis: Whether to collect the layout features of the pages
+        collect_metrics: Whether to record metrics for the parent process
+        persist_images: Whether extracted images are written to the store
+        
+    Returns:
+        Tuple of the list of (page record, image list) tuples in page order
+        and the metrics snapshot of the range (None without metrics)
+    """
+    # Metrics inherited from the forking process are not part of this range
+    REGISTRY.enable(collect_metrics)
+    REGISTRY.reset()
+    
+    processor = FileProcessor(
+        upload_folder,
+        ocr_engine=OCREngine(max_workers=0, **ocr_options),
+        image_store=ImageStore(image_store_folder, persist=persist_images),
+        layout_analysis=layout_analysis
+    )
+    pdf_document = _open_pdf(pdf_path)
+    pages = list(processor._iter_pages(pdf_document, stop - start, start=start))
+    
+    return pages, REGISTRY.snapshot() if collect_metrics else None
 
 class FileProcessor:
     """
     Service for processing uploaded files (PDF, images) and extracting content
     """
     
-    def __init__(self, upload_folder: str):
+    def __init__(self, upload_folder: str, parallel_workers: int = 0, parallel_min_pages: int = 50,
+                 cache: Optional[ExtractionCache] = None, ocr_engine: Optional[OCREngine] = None,
+                 image_store: Optional[ImageStore] = None, language: str = "default",
+                 layout_analysis: bool = False, persist_images: bool = True):
         """
         Initialize the file processor
         
         Args:
             upload_folder: Path to the folder where uploaded files are stored
+            parallel_workers: Number of processes used to extract PDF pages
+                (0 or 1 extracts sequentially)
+            parallel_min_pages: Minimum page count for parallel extraction
+            cache: Optional extraction cache consulted before processing a file
+            ocr_engine: OCR engine used for images and scanned PDF pages
+                (defaults to an engine with its standard settings)
+            image_store: Store receiving extracted images (defaults to the
+                "images" folder inside the upload folder)
+            language: Language of the line classification rules used to
+                detect headings and bullet points (see LINE_RULES)
+            layout_analysis: Whether PDF headings are also detected from font
+                sizes, bold text and position (see LayoutAnalyzer)
+            persist_images: Whether extracted images are written to the
+                default image store; without it, image records carry their
+                bytes in memory and the extraction cache is not used
         """
         self.upload_folder = upload_folder
+        self.parallel_workers = parallel_workers
+        self.parallel_min_pages = parallel_min_pages
+        self.cache = cache
+        self.ocr_engine = ocr_engine if ocr_engine is not None else OCREngine()
+        self.image_store = image_store if image_store is not None else ImageStore(
+            os.path.join(upload_folder, "images"), persist=persist_images
+        )
+        self.language = language
+        self.line_classifier = LineClassifier.for_language(language)
+        self.layout_analysis = layout_analysis
         
         # Ensure upload folder exists
         if not os.path.exists(upload_folder):
             os.makedirs(upload_folder)
     
-    def process_file(self, file_path: str) -> Dict[str, Any]:
+    def process_file(self, file_path: str,
+                     progress_callback: Optional[Callable[[int, int], None]] = None,
+                     content_hash: str = None,
+                     page_writer: Optional[PageSectionWriter] = None) -> Dict[str, Any]:
         """
         Process a file and extract its content
         
         Args:
             file_path: Path to the file to process
+            progress_callback: Optional callable receiving (pages done, total pages)
+            content_hash: SHA-256 hash of the file, if already known (saves
+                reading the file once more for the cache lookup)
+            page_writer: Optional session page writer (see
+                SessionStore.page_writer) receiving the pages as they are
+                read; the returned content then has no "pages"
             
         Returns:
             Dictionary containing extracted content
         """
         file_extension = os.path.splitext(file_path)[1].lower()
         
+        if file_extension not in ['.pdf', '.jpg', '.jpeg', '.png', '.bmp']:
+            raise ValueError(f"Unsupported file type: {file_extension}")
+        
+        # Return cached content for files that were already processed
+        # (cached content refers to images stored on disk)
+        cache_key = None
+        if self.cache is not None and self.image_store.persist:
+            extractor_version = EXTRACTOR_VERSION
+            if self.language != "default":
+                extractor_version += f"-{self.language}"
+            if self.layout_analysis:
+                extractor_version += "-layout"
+            cache_key = self.cache.make_key(file_path, extractor_version, content_hash)
+            content = self.cache.get(cache_key)
+            CACHE_REQUESTS_TOTAL.inc(result="miss" if content is None else "hit")
+            
+            if content is not None:
+                # Cache entries may be evicted while sessions still use
+                # their images, so the images are stored with the uploads
+                for image in content.get("images", []):
+                    if image.get("path") and os.path.exists(image["path"]):
+                        image_hash = image.get("hash") or hash_file(image["path"])
+                        image["path"] = self.image_store.put_file(image["path"], image["image_id"], image_hash)
+                content["title"] = os.path.basename(file_path)
+                if page_writer is not None:
+                    for page in content.pop("pages", []):
+                        page_writer.add(page)
+                if progress_callback:
+                    progress_callback(1, 1)
+                return content
+        
         if file_extension in ['.pdf']:
-            return self._process_pdf(file_path)
-        elif file_extension in ['.jpg', '.jpeg', '.png', '.bmp']:
-            return self._process_image(file_path)
+            content = self._process_pdf(file_path, progress_callback, page_writer)
         else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
+            content = self._process_image(file_path, content_hash)
+            if page_writer is not None:
+                for page in content.pop("pages"):
+                    page_writer.add(page)
+            if progress_callback:
+                progress_callback(1, 1)
+        
+        if cache_key is not None:
+            if page_writer is not None:
+                page_writer.close()
+                self.cache.put(cache_key, content, pages_path=page_writer.path)
+            else:
+                self.cache.put(cache_key, content)
+        
+        return content
     
-    def _process_pdf(self, pdf_path: str) -> Dict[str, Any]:
+    def _process_pdf(self, pdf_path: str,
+                     progress_callback: Optional[Callable[[int, int], None]] = None,
+                     page_writer: Optional[PageSectionWriter] = None) -> Dict[str, Any]:
         """
         Process a PDF file and extract text and images
         
         Args:
             pdf_path: Path to the PDF file
+            progress_callback: Optional callable receiving (pages done, total pages)
+            page_writer: Optional session page writer receiving the pages
+                instead of the result
             
         Returns:
             Dictionary containing extracted text and images
         """
         result = {
             "title": os.path.basename(pdf_path),
-            "pages": [],
             "images": []
         }
+        if page_writer is None:
+            result["pages"] = []
         
         # Open the PDF
-        pdf_document = fitz.open(pdf_path)
+        with STAGE_SECONDS.time(stage="pdf_open"):
+            pdf_document = _open_pdf(pdf_path)
+        page_count = len(pdf_document)
+        
+        if self.parallel_workers > 1 and page_count >= self.parallel_min_pages:
+            # Hand the pages over to the worker processes
+            _close_pdf(pdf_document)
+            page_results = self._iter_pages_parallel(pdf_path, page_count, progress_callback)
+        else:
+            page_results = self._iter_pages(pdf_document, page_count, progress_callback)
         
-        # Process each page
-        for page_num, page in enumerate(pdf_document):
-            # Extract text
-            text = page.get_text()
+        if self.layout_analysis:
+            # Layout hints are relative to the whole document (body font
+            # size, heading size ranks), so all pages are read first
+            layout_analyzer = LayoutAnalyzer()
+            pages = list(self._collect_pages(page_results, result, page_writer, layout_analyzer))
             
-            # Extract images
-            image_list = self._extract_images_from_pdf_page(page, page_num)
+            with STAGE_SECONDS.time(stage="layout"):
+                heading_hints = layout_analyzer.heading_hints()
             
-            # Add page content to result
-            result["pages"].append({
-                "page_number": page_num + 1,
-                "text": text,
-                "images": [img["image_id"] for img in image_list]
-            })
+            result["structure"] = self._extract_structure(pages, heading_hints)
+        else:
+            # Extract structure (headings, paragraphs, etc.) while the pages are
+            # being read, handing pages and images on along the way
+            result["structure"] = self._extract_structure(self._collect_pages(page_results, result, page_writer))
+        
+        return result
+    
+    def _collect_pages(self, page_results: Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+                       result: Dict[str, Any], page_writer: Optional[PageSectionWriter] = None,
+                       layout_analyzer: Optional[LayoutAnalyzer] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Add streamed pages and images to the result and pass the pages on
+        
+        Each unique image is added once, at its first occurrence; pages refer
+        to images by ID. With a page writer, pages are written to the session
+        as they arrive rather than kept in the result.
+        
+        Args:
+            page_results: Iterator of (page record, image list) tuples in page order
+            result: Result dictionary receiving the images (and the pages
+                without a page writer)
+            page_writer: Optional session page writer receiving the pages
+            layout_analyzer: Optional layout analyzer receiving the layout
+                of each page, which is removed from the page record
             
-            # Add images to result
-            result["images"].extend(image_list)
+        Yields:
+            Page records
+        """
+        seen_images = set()
         
-        # Close the PDF
-        pdf_document.close()
+        for page_record, image_list in page_results:
+            if layout_analyzer is not None:
+                layout_analyzer.add_page(page_record["page_number"], page_record.pop("layout"))
+            
+            if page_writer is not None:
+                page_writer.add(page_record)
+            else:
+                result["pages"].append(page_record)
+            PAGES_TOTAL.inc(source="ocr" if page_record.get("ocr") else "text")
+            
+            for image in image_list:
+                if image["image_id"] not in seen_images:
+                    seen_images.add(image["image_id"])
+                    result["images"].append(image)
+                    IMAGES_TOTAL.inc()
+            
+            yield page_record
+    
+    def _iter_pages(self, pdf_document, page_count: int,
+                    progress_callback: Optional[Callable[[int, int], None]] = None,
+                    start: int = 0) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Read the pages of an open PDF document one at a time
         
-        # Extract structure (headings, paragraphs, etc.)
-        result["structure"] = self._extract_structure(result["pages"])
+        Pages without a text layer (scanned pages) are rendered and sent to the
+        OCR engine. A bounded window of pages is kept in flight so that OCR of
+        consecutive scanned pages runs concurrently while pages are still
+        yielded in order. The document is closed once the last page is read.
         
-        return result
+        Args:
+            pdf_document: Open fitz document
+            page_count: Number of pages to read
+            progress_callback: Optional callable receiving (pages done, total pages)
+            start: Index of the first page to read
+            
+        Yields:
+            (page record, image list) tuples in page order
+        """
+        # Images already extracted from this document, by xref
+        document_images = self.image_store.open_document()
+        
+        # Pages waiting for their OCR result, in page order
+        pending = deque()
+        window = max(1, self.ocr_engine.max_workers * 2)
+        
+        try:
+            for page_num in range(start, start + page_count):
+                page_record, image_list = self._extract_page(pdf_document[page_num], page_num, document_images)
+                
+                ocr_future = None
+                if not page_record["text"].strip():
+                    ocr_future = self.ocr_engine.submit_page(pdf_document[page_num])
+                
+                pending.append((page_record, image_list, ocr_future))
+                
+                # Release pages whose text is ready, or wait once the window is full
+                while pending and (pending[0][2] is None or pending[0][2].done() or len(pending) > window):
+                    yield self._finish_page(*pending.popleft())
+                
+                if progress_callback:
+                    progress_callback(page_num - start + 1, page_count)
+            
+            while pending:
+                yield self._finish_page(*pending.popleft())
+        finally:
+            # Close the PDF
+            _close_pdf(pdf_document)
     
-    def _extract_images_from_pdf_page(self, page, page_num: int) -> List[Dict[str, Any]]:
+    def _finish_page(self, page_record: Dict[str, Any], image_list: List[Dict[str, Any]],
+                     ocr_future=None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Fill in the OCR text of a scanned page
+        
+        Args:
+            page_record: Page record
+            image_list: Images extracted from the page
+            ocr_future: Future holding the OCR text, or None for text pages
+            
+        Returns:
+            Tuple of the page record and the list of extracted images
+        """
+        if ocr_future is not None:
+            page_record["text"] = ocr_future.result()
+            page_record["ocr"] = True
+        
+        return page_record, image_list
+    
+    def _iter_pages_parallel(self, pdf_path: str, page_count: int,
+                             progress_callback: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Extract the pages of a PDF file across a process pool
+        
+        The page range is split into contiguous chunks (several per worker to
+        even out slow pages). Chunks are yielded back in page order as soon as
+        all earlier chunks are done, so the output is identical to sequential
+        extraction.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            page_count: Number of pages in the document
+            progress_callback: Optional callable receiving (pages done, total pages)
+            
+        Yields:
+            (page record, image list) tuples in page order
+        """
+        chunk_count = min(page_count, self.parallel_workers * 4)
+        chunk_size = -(-page_count // chunk_count)
+        ranges = [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+        
+        finished_chunks = {}
+        next_chunk = 0
+        pages_done = 0
+        
+        with ProcessPoolExecutor(max_workers=self.parallel_workers) as executor:
+            futures = {
+                executor.submit(_extract_page_range, self.upload_folder, self.image_store.store_folder,
+                                pdf_path, start, stop, self.ocr_engine.options(), self.layout_analysis,
+                                REGISTRY.enabled, self.image_store.persist): index
+                for index, (start, stop) in enumerate(ranges)
+            }
+            
+            for future in as_completed(futures):
+                index = futures[future]
+                finished_chunks[index], metrics_snapshot = future.result()
+                if metrics_snapshot is not None:
+                    REGISTRY.merge(metrics_snapshot)
+                
+                pages_done += len(finished_chunks[index])
+                if progress_callback:
+                    progress_callback(pages_done, page_count)
+                
+                # Release every chunk that is now next in page order
+                while next_chunk in finished_chunks:
+                    yield from finished_chunks.pop(next_chunk)
+                    next_chunk += 1
+    
+    def _extract_page(self, page, page_num: int,
+                      document_images: DocumentImages) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Extract text and images from a single PDF page
+        
+        Args:
+            page: PDF page object
+            page_num: Page number
+            document_images: Image view of the document the page belongs to
+            
+        Returns:
+            Tuple of the page record and the list of images on the page
+        """
+        # Extract text
+        with STAGE_SECONDS.time(stage="page_text"):
+            text = page.get_text()
+        
+        # Extract images
+        with STAGE_SECONDS.time(stage="page_images"):
+            image_list = self._extract_images_from_pdf_page(page, page_num, document_images)
+        
+        page_record = {
+            "page_number": page_num + 1,
+            "text": text,
+            "images": [img["image_id"] for img in image_list]
+        }
+        
+        # Layout features, consumed (and removed) by _process_pdf
+        if self.layout_analysis:
+            page_record["layout"] = extract_line_features(page)
+        
+        return page_record, image_list
+    
+    def _extract_images_from_pdf_page(self, page, page_num: int,
+                                      document_images: DocumentImages) -> List[Dict[str, Any]]:
         """
         Extract images from a PDF page
         
+        Images referenced on several pages are decoded and stored only once;
+        later pages get a reference to the same image record.
+        
         Args:
             page: PDF page object
             page_num: Page number
+            document_images: Image view of the document the page belongs to
             
         Returns:
             List of dictionaries containing image information
         """
         image_list = []
+        seen_ids = set()
         
         # Get images
         image_dict = page.get_images(full=True)
         
-        for img_index, img_info in enumerate(image_dict):
+        for img_info in image_dict:
             xref = img_info[0]
-            base_image = page.parent.extract_image(xref)
+            image_record = document_images.extract(page.parent, xref, page_num)
             
-            if base_image:
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                
-                # Generate a unique image ID
-                image_id = f"page_{page_num + 1}_img_{img_index + 1}.{image_ext}"
-                image_path = os.path.join(self.upload_folder, image_id)
-                
-                # Save the image
-                with open(image_path, "wb") as img_file:
-                    img_file.write(image_bytes)
-                
-                # Add image info to list
-                image_list.append({
-                    "image_id": image_id,
-                    "path": image_path,
-                    "page_number": page_num + 1,
-                    "format": image_ext
-                })
+            # Add image info to list (once per page)
+            if image_record and image_record["image_id"] not in seen_ids:
+                seen_ids.add(image_record["image_id"])
+                image_list.append(image_record)
         
         return image_list
     
-    def _process_image(self, image_path: str) -> Dict[str, Any]:
+    def _process_image(self, image_path: str, content_hash: str = None) -> Dict[str, Any]:
         """
         Process an image file and extract text using OCR
         
         Args:
             image_path: Path to the image file
+            content_hash: SHA-256 hash of the file, if already known
             
         Returns:
             Dictionary containing extracted text
@@ -146,22 +547,21 @@ class FileProcessor:
             "images": []
         }
         
-        # Open the image
-        image = Image.open(image_path)
-        
         # Extract text using OCR
-        text = pytesseract.image_to_string(image, lang='ara+eng')
+        text = self.ocr_engine.ocr_image_file(image_path)
         
         # Add image to result
         image_id = os.path.basename(image_path)
         result["images"].append({
             "image_id": image_id,
             "path": image_path,
+            "hash": content_hash or hash_file(image_path),
             "page_number": 1,
             "format": os.path.splitext(image_path)[1][1:]
         })
         
         # Add page content to result
+        PAGES_TOTAL.inc(source="image")
         result["pages"].append({
             "page_number": 1,
             "text": text,
@@ -173,12 +573,16 @@ class FileProcessor:
         
         return result
     
-    def _extract_structure(self, pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _extract_structure(self, pages: Iterable[Dict[str, Any]],
+                           heading_hints: Optional[Dict[int, Dict[str, int]]] = None) -> Dict[str, Any]:
         """
         Extract structure (headings, paragraphs, etc.) from text
         
         Args:
-            pages: List of pages with extracted text
+            pages: Iterable of pages with extracted text; it is consumed once,
+                so pages can be streamed while they are being read
+            heading_hints: Optional layout hints mapping page number to
+                heading line texts and their levels (see LayoutAnalyzer)
             
         Returns:
             Dictionary containing structured content
@@ -187,173 +591,134 @@ class FileProcessor:
             "title": "",
             "headings": [],
             "paragraphs": [],
-            "bullet_points": []
+            "bullet_points": [],
+            # Section (heading index) of each paragraph and bullet list, in
+            # document order; None for content before the first heading
+            "paragraph_sections": [],
+            "bullet_point_sections": []
         }
         
-        # Extract title (first line of first page)
-        if pages and "text" in pages[0]:
-            lines = pages[0]["text"].split('\n')
-            if lines:
-                structure["title"] = lines[0].strip()
+        current_section = None
+        
+        for event, value in self._iter_structure_events(pages, heading_hints):
+            if event == "title":
+                structure["title"] = value
+            elif event == "heading":
+                current_section = len(structure["headings"])
+                value["section_id"] = current_section
+                structure["headings"].append(value)
+            elif event == "paragraph":
+                structure["paragraphs"].append(value)
+                structure["paragraph_sections"].append(current_section)
+            elif event == "bullet_list":
+                structure["bullet_points"].append(value)
+                structure["bullet_point_sections"].append(current_section)
+        
+        return structure
+    
+    def _iter_structure_events(self, pages: Iterable[Dict[str, Any]],
+                               heading_hints: Optional[Dict[int, Dict[str, int]]] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Emit structure events for a stream of pages
+        
+        Only the lines of the current page are held in memory; paragraphs are
+        collected as line lists and joined once when they end. The events of
+        a page are yielded once the page is done, so the page_structure timer
+        does not include the time the consumer spends on them.
+        
+        Args:
+            pages: Iterable of pages with extracted text
+            heading_hints: Optional layout hints; plain text lines listed
+                for their page are turned into headings
+            
+        Yields:
+            (event, value) tuples where event is "title" (title text),
+            "heading" (heading dictionary), "paragraph" (paragraph text) or
+            "bullet_list" (list of bullet points)
+        """
+        first_page = True
+        classify = self.line_classifier.classify
         
-        # Process all pages
         for page in pages:
+            # Extract title (first line of first page)
+            if first_page:
+                first_page = False
+                if "text" in page:
+                    yield "title", page["text"].split('\n', 1)[0].strip()
+            
             if "text" not in page:
                 continue
-                
-            text = page["text"]
-            lines = text.split('\n')
             
-            current_paragraph = ""
-            in_bullet_list = False
+            # Events of this page, yielded after the timer is stopped
+            events = []
+            page_started = time.perf_counter()
+            paragraph_lines = []
             bullet_list = []
+            page_hints = heading_hints.get(page.get("page_number"), {}) if heading_hints else {}
             
-            for line in lines:
+            for line in page["text"].split('\n'):
                 line = line.strip()
                 if not line:
                     # End of paragraph
-                    if current_paragraph:
-                        structure["paragraphs"].append(current_paragraph)
-                        current_paragraph = ""
+                    if paragraph_lines:
+                        events.append(("paragraph", " ".join(paragraph_lines)))
+                        paragraph_lines = []
                     
                     # End of bullet list
-                    if in_bullet_list and bullet_list:
-                        structure["bullet_points"].append(bullet_list)
+                    if bullet_list:
+                        events.append(("bullet_list", bullet_list))
                         bullet_list = []
-                        in_bullet_list = False
                     
                     continue
                 
-                # Check if line is a heading
-                if self._is_heading(line):
+                kind, level = classify(line)
+                
+                if kind == LINE_TEXT and line in page_hints:
+                    kind, level = LINE_HEADING, page_hints[line]
+                
+                if kind == LINE_HEADING:
                     # End current paragraph if any
-                    if current_paragraph:
-                        structure["paragraphs"].append(current_paragraph)
-                        current_paragraph = ""
+                    if paragraph_lines:
+                        events.append(("paragraph", " ".join(paragraph_lines)))
+                        paragraph_lines = []
                     
                     # End bullet list if any
-                    if in_bullet_list and bullet_list:
-                        structure["bullet_points"].append(bullet_list)
+                    if bullet_list:
+                        events.append(("bullet_list", bullet_list))
                         bullet_list = []
-                        in_bullet_list = False
                     
                     # Add heading
-                    structure["headings"].append({
+                    events.append(("heading", {
                         "text": line,
-                        "level": self._get_heading_level(line)
-                    })
+                        "level": level
+                    }))
                     continue
                 
-                # Check if line is a bullet point
-                if self._is_bullet_point(line):
+                if kind == LINE_BULLET:
                     # End current paragraph if any
-                    if current_paragraph:
-                        structure["paragraphs"].append(current_paragraph)
-                        current_paragraph = ""
+                    if paragraph_lines:
+                        events.append(("paragraph", " ".join(paragraph_lines)))
+                        paragraph_lines = []
                     
                     # Start or continue bullet list
-                    in_bullet_list = True
                     bullet_list.append(line)
                     continue
                 
-                # Regular text - add to current paragraph
-                if in_bullet_list:
-                    # End bullet list
-                    if bullet_list:
-                        structure["bullet_points"].append(bullet_list)
+                # Regular text - end bullet list and add to current paragraph
+                if bullet_list:
+                    events.append(("bullet_list", bullet_list))
                     bullet_list = []
-                    in_bullet_list = False
                 
-                if current_paragraph:
-                    current_paragraph += " " + line
-                else:
-                    current_paragraph = line
+                paragraph_lines.append(line)
             
             # Add final paragraph if any
-            if current_paragraph:
-                structure["paragraphs"].append(current_paragraph)
+            if paragraph_lines:
+                events.append(("paragraph", " ".join(paragraph_lines)))
             
             # Add final bullet list if any
-            if in_bullet_list and bullet_list:
-                structure["bullet_points"].append(bullet_list)
-        
-        return structure
-    
-    def _is_heading(self, line: str) -> bool:
-        """
-        Check if a line is a heading
-        
-        Args:
-            line: Line of text
+            if bullet_list:
+                events.append(("bullet_list", bullet_list))
             
-        Returns:
-            True if the line is a heading, False otherwise
-        """
-        # Simple heuristic: headings are short, often end with a colon,
-        # and may contain numbers at the beginning
-        line = line.strip()
-        
-        # Check if line starts with a number followed by a dot or parenthesis
-        if re.match(r'^\d+[\.\)]', line):
-            return True
-        
-        # Check if line is short and ends with a colon
-        if len(line) < 100 and line.endswith(':'):
-            return True
-        
-        # Check if line is all uppercase and short
-        if line.isupper() and len(line) < 50:
-            return True
-        
-        return False
-    
-    def _get_heading_level(self, heading: str) -> int:
-        """
-        Get the level of a heading
-        
-        Args:
-            heading: Heading text
+            STAGE_SECONDS.observe(time.perf_counter() - page_started, stage="page_structure")
             
-        Returns:
-            Heading level (1, 2, 3, etc.)
-        """
-        # Simple heuristic: level based on indentation, presence of numbers, etc.
-        heading = heading.strip()
-        
-        # Check if heading starts with a number
-        match = re.match(r'^(\d+)[\.\)]', heading)
-        if match:
-            # Level based on the number of digits
-            num = match.group(1)
-            if int(num) < 10:
-                return 2
-            else:
-                return 3
-        
-        # Default to level 1 for short headings
-        if len(heading) < 30:
-            return 1
-        
-        return 2
-    
-    def _is_bullet_point(self, line: str) -> bool:
-        """
-        Check if a line is a bullet point
-        
-        Args:
-            line: Line of text
-            
-        Returns:
-            True if the line is a bullet point, False otherwise
-        """
-        line = line.strip()
-        
-        # Check if line starts with a bullet character
-        if line.startswith('•') or line.startswith('-') or line.startswith('*'):
-            return True
-        
-        # Check if line starts with a number or letter followed by a dot or parenthesis
-        if re.match(r'^[a-zA-Z0-9][\.\)]', line):
-            return True
-        
-        return False
+            yield from events
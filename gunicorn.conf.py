@@ -0,0 +1,74 @@
+import gc
+import os
+import glob
+import tempfile
+
+# Gunicorn configuration of the production server:
+#     gunicorn -c gunicorn.conf.py
+#
+# The app is loaded once in the master (PRELOAD_SERVICES=1 also imports the
+# PDF, OCR and presentation libraries and parses the templates) and shared
+# copy-on-write by the forked workers.
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+
+# Load and warm the app before forking the workers
+preload_app = True
+os.environ.setdefault("PRELOAD_SERVICES", "1")
+
+# Workers add up their metrics through this directory, so /metrics reports
+# the whole server rather than the worker answering the scrape
+METRICS_MULTIPROCESS_DIR = os.environ.setdefault(
+    "METRICS_MULTIPROCESS_DIR",
+    os.path.join(tempfile.gettempdir(), "lesson-metrics")
+)
+
+# Workload of the web workers: "io" (default) serves many slow clients
+# (uploads, downloads, progress polling) with threaded workers, "cpu" uses
+# one single-threaded worker per core. Extraction and generation run in
+# each worker's job processes either way (see JOB_WORKERS).
+WORKLOAD = os.environ.get("GUNICORN_WORKLOAD", "io")
+
+if WORKLOAD == "cpu":
+    worker_class = "sync"
+    workers = int(os.environ.get("GUNICORN_WORKERS", os.cpu_count() or 1))
+else:
+    worker_class = "gthread"
+    workers = int(os.environ.get("GUNICORN_WORKERS", max(2, (os.cpu_count() or 1) // 2)))
+    threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Recycle workers after a number of requests (with jitter, so they do not
+# all restart at once): PyMuPDF and Pillow do not give all memory back.
+# Job processes are recycled separately (see JOB_MAX_JOBS_PER_WORKER).
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# Uploads of large PDFs are streamed within a request
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+# Let running jobs of a recycled worker finish
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 120))
+keepalive = 5
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+# Garbage collection in a worker writes to the header of every object it
+# visits, copying the shared pages of the preloaded app. Collection is off
+# in the master while the app loads and back on once the server is ready;
+# objects created so far are frozen out of collection before each fork.
+gc.disable()
+
+
+def on_starting(server):
+    # Start counting from zero, without the workers of a previous server
+    for path in glob.glob(os.path.join(METRICS_MULTIPROCESS_DIR, "*.json")):
+        os.remove(path)
+
+
+def when_ready(server):
+    gc.enable()
+
+
+def pre_fork(server, worker):
+    gc.freeze()
@@ -0,0 +1,191 @@
+import os
+import uuid
+import shutil
+import hashlib
+from typing import Dict, Any, Optional
+
+
+def _touch(path: str) -> bool:
+    """
+    Mark a stored file as just used, so storage cleanup keeps it until the
+    session being extracted refers to it
+
+    Args:
+        path: Path of the file
+
+    Returns:
+        False if the file does not exist
+    """
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+class ImageStore:
+    """
+    Content-addressed store for images extracted from uploaded documents
+
+    Every image is written once, under a name derived from the hash of its
+    bytes, so identical images (the same logo in every chapter, the same
+    upload twice) share one file and concurrent uploads can never overwrite
+    each other's images with different content.
+
+    A store that does not persist images keeps them in memory instead: image
+    records carry the extracted bytes under "data" and have no path. This
+    suits runs that render the images right away (batch conversion) and
+    never read them back from disk.
+    """
+
+    def __init__(self, store_folder: str, persist: bool = True):
+        """
+        Initialize the image store
+
+        Args:
+            store_folder: Path to the folder where image blobs are stored
+            persist: Whether images are written to the store folder
+        """
+        self.store_folder = store_folder
+        self.persist = persist
+
+        # Ensure store folder exists
+        if persist and not os.path.exists(store_folder):
+            os.makedirs(store_folder)
+
+    def put(self, image_bytes: bytes, image_ext: str) -> Dict[str, Any]:
+        """
+        Store an image unless an identical one is already stored
+
+        Args:
+            image_bytes: Encoded image data
+            image_ext: Image file extension (without dot)
+
+        Returns:
+            Dictionary with the stable image ID, path and content hash; in
+            memory, the path is None and "data" holds the image bytes
+        """
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        image_id = f"img_{digest[:20]}.{image_ext}"
+
+        if not self.persist:
+            return {
+                "image_id": image_id,
+                "path": None,
+                "hash": digest,
+                "data": image_bytes
+            }
+
+        image_folder = os.path.join(self.store_folder, digest[:2])
+        image_path = os.path.join(image_folder, image_id)
+
+        if not _touch(image_path):
+            os.makedirs(image_folder, exist_ok=True)
+
+            # Write to a private file first so readers never see a partial image
+            tmp_path = f"{image_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as img_file:
+                img_file.write(image_bytes)
+            os.replace(tmp_path, image_path)
+
+        return {
+            "image_id": image_id,
+            "path": image_path,
+            "hash": digest
+        }
+
+    def put_file(self, source_path: str, image_id: str, content_hash: str) -> str:
+        """
+        Store a copy of an image file unless an identical one is already stored
+
+        The file is hard-linked into the store when possible (same file
+        system), copied otherwise, so the stored image outlives the source
+        file (e.g. an evicted extraction cache entry).
+
+        Args:
+            source_path: Path of the image file
+            image_id: Stable image ID (as returned by put)
+            content_hash: SHA-256 hash of the image
+
+        Returns:
+            Path of the stored image
+        """
+        image_folder = os.path.join(self.store_folder, content_hash[:2])
+        image_path = os.path.join(image_folder, image_id)
+
+        if not _touch(image_path):
+            os.makedirs(image_folder, exist_ok=True)
+
+            # Link or copy to a private file first so readers never see a partial image
+            tmp_path = f"{image_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                os.link(source_path, tmp_path)
+            except OSError:
+                shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, image_path)
+
+        return image_path
+
+    def open_document(self) -> "DocumentImages":
+        """
+        Start extracting the images of one document
+
+        Returns:
+            Per-document image view
+        """
+        return DocumentImages(self)
+
+
+class DocumentImages:
+    """
+    Per-document view of the image store
+
+    Remembers which xrefs of the document were already extracted, so an image
+    referenced on many pages is decoded and stored only once.
+    """
+
+    def __init__(self, store: ImageStore):
+        """
+        Initialize the document view
+
+        Args:
+            store: Image store receiving the image blobs
+        """
+        self.store = store
+        self._by_xref = {}
+
+    def extract(self, pdf_document, xref: int, page_num: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the image record of an xref, extracting it on first use
+
+        Args:
+            pdf_document: Open fitz document
+            xref: Cross-reference number of the image
+            page_num: Number of the page the image was first seen on
+
+        Returns:
+            Dictionary containing image information, or None if the xref
+            holds no extractable image
+        """
+        if xref in self._by_xref:
+            return self._by_xref[xref]
+
+        image_record = None
+        base_image = pdf_document.extract_image(xref)
+
+        if base_image:
+            image_ext = base_image["ext"]
+            stored = self.store.put(base_image["image"], image_ext)
+
+            image_record = {
+                "image_id": stored["image_id"],
+                "path": stored["path"],
+                "page_number": page_num + 1,
+                "format": image_ext,
+                "hash": stored["hash"]
+            }
+            if "data" in stored:
+                image_record["data"] = stored["data"]
+
+        self._by_xref[xref] = image_record
+        return image_record
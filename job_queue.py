@@ -0,0 +1,467 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import traceback
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Dict, Any, Optional, Callable
+from src.services.metrics import REGISTRY, SNAPSHOT_INTERVAL, process_alive, STAGE_SECONDS, JOBS_TOTAL, JOBS_IN_PROGRESS
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_FINISHED = "finished"
+JOB_FAILED = "failed"
+
+# Minimum delay between two progress writes for the same job (seconds)
+PROGRESS_WRITE_INTERVAL = 0.25
+
+# The web process owning queued and running jobs marks them as alive every
+# JOB_HEARTBEAT_INTERVAL seconds; jobs of a process that exited (e.g. a
+# recycled gunicorn worker) or that missed JOB_HEARTBEAT_TIMEOUT seconds of
+# heartbeats are marked as failed
+JOB_HEARTBEAT_INTERVAL = 10
+JOB_HEARTBEAT_TIMEOUT = 60
+JOB_ORPHANED_ERROR = "The server process running this job has stopped; please try again"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress_current INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner_pid INTEGER,
+    heartbeat_at REAL
+)
+"""
+
+# Columns added since the first version of the jobs table
+_ADDED_COLUMNS = {
+    "owner_pid": "INTEGER",
+    "heartbeat_at": "REAL"
+}
+
+
+def _job_orphaned(row: sqlite3.Row, now: float) -> bool:
+    """
+    Check whether an unfinished job has lost the process owning it
+
+    Args:
+        row: Row of the job
+        now: Current time
+
+    Returns:
+        True if the owner process has exited or its heartbeats stopped
+    """
+    if (row["heartbeat_at"] or row["updated_at"]) < now - JOB_HEARTBEAT_TIMEOUT:
+        return True
+    return row["owner_pid"] is not None and not process_alive(row["owner_pid"])
+
+
+@contextmanager
+def _connect(db_path: str):
+    """
+    Open a short-lived connection to the jobs database
+
+    The connection commits on success and is always closed, so no SQLite
+    handle is ever inherited by a forked worker process.
+
+    Args:
+        db_path: Path to the SQLite database file
+
+    Yields:
+        SQLite connection
+    """
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.row_factory = sqlite3.Row
+
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+class JobContext:
+    """
+    Handle given to a running job so it can report its progress
+    """
+
+    def __init__(self, db_path: str, job_id: str):
+        """
+        Initialize the job context
+
+        Args:
+            db_path: Path to the SQLite database file
+            job_id: ID of the running job
+        """
+        self.db_path = db_path
+        self.job_id = job_id
+        self._last_write = 0.0
+
+    def report(self, stage: str, current: int, total: int):
+        """
+        Report the progress of the job
+
+        Writes are throttled so that per-page and per-slide reporting does not
+        turn into one database write per page.
+
+        Args:
+            stage: Name of the current stage (e.g. "extract", "slides")
+            current: Number of completed units in the stage
+            total: Total number of units in the stage
+        """
+        now = time.time()
+        if current < total and now - self._last_write < PROGRESS_WRITE_INTERVAL:
+            return
+
+        self._last_write = now
+        with _connect(self.db_path) as connection:
+            connection.execute(
+                "UPDATE jobs SET stage = ?, progress_current = ?, progress_total = ?, updated_at = ? WHERE id = ?",
+                (stage, current, total, now, self.job_id)
+            )
+
+    def progress_callback(self, stage: str) -> Callable[[int, int], None]:
+        """
+        Build a progress callback bound to a stage
+
+        Args:
+            stage: Name of the stage
+
+        Returns:
+            Callable taking (current, total)
+        """
+        return lambda current, total: self.report(stage, current, total)
+
+
+def _run_job(db_path: str, job_id: str, handler: Callable[[JobContext, Dict[str, Any]], Dict[str, Any]],
+             payload: Dict[str, Any], kind: str = None,
+             collect_metrics: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Run a job inside a worker process and record its outcome
+
+    Args:
+        db_path: Path to the SQLite database file
+        job_id: ID of the job
+        handler: Module-level function implementing the job
+        payload: Job arguments
+        kind: Kind of the job, used as a metrics label
+        collect_metrics: Whether to record metrics for the submitting process
+
+    Returns:
+        Metrics snapshot of the job (None without metrics)
+    """
+    # Metrics inherited from the forking process are not part of this job
+    REGISTRY.enable(collect_metrics)
+    REGISTRY.reset()
+
+    with _connect(db_path) as connection:
+        connection.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+            (JOB_RUNNING, time.time(), job_id)
+        )
+
+    context = JobContext(db_path, job_id)
+
+    try:
+        with STAGE_SECONDS.time(stage=f"job_{kind}"):
+            result = handler(context, payload)
+    except Exception as e:
+        with _connect(db_path) as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (JOB_FAILED, str(e) or traceback.format_exc(), time.time(), job_id)
+            )
+        JOBS_TOTAL.inc(kind=kind, status=JOB_FAILED)
+        return REGISTRY.snapshot() if collect_metrics else None
+
+    with _connect(db_path) as connection:
+        connection.execute(
+            "UPDATE jobs SET status = ?, result = ?, updated_at = ? WHERE id = ?",
+            (JOB_FINISHED, json.dumps(result, ensure_ascii=False), time.time(), job_id)
+        )
+    JOBS_TOTAL.inc(kind=kind, status=JOB_FINISHED)
+
+    return REGISTRY.snapshot() if collect_metrics else None
+
+
+class JobQueue:
+    """
+    Service for running extraction and generation jobs outside the request
+
+    Job state lives in a SQLite database so every web worker can answer status
+    requests, while the work itself runs in a local process pool. Jobs
+    record the web process that owns that pool; jobs left queued or running
+    by a process that has exited are marked as failed when the queue is
+    opened and when their status is requested.
+    """
+
+    def __init__(self, db_path: str, max_workers: int = 2, max_jobs_per_worker: int = 0):
+        """
+        Initialize the job queue
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_workers: Number of worker processes
+            max_jobs_per_worker: Number of jobs per worker process after
+                which the pool is replaced by a fresh one, releasing memory
+                that PyMuPDF and Pillow do not give back (0 keeps workers
+                for good)
+        """
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._executor = None
+        self._executor_jobs_left = 0
+        self._lock = threading.Lock()
+
+        # Unfinished jobs submitted by this process, kept alive by the
+        # heartbeat thread
+        self._active_jobs = set()
+        self._heartbeat_pid = None
+
+        # Ensure database folder exists
+        db_folder = os.path.dirname(db_path)
+        if db_folder and not os.path.exists(db_folder):
+            os.makedirs(db_folder)
+
+        with _connect(db_path) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+            for name, column_type in _ADDED_COLUMNS.items():
+                if name not in columns:
+                    connection.execute(f"ALTER TABLE jobs ADD COLUMN {name} {column_type}")
+
+        # Jobs of a previous server (or of workers that exited meanwhile)
+        self.fail_orphaned_jobs()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        Get the process pool for a new job, creating it on first use
+
+        The pool is created lazily so that it is never started in a process
+        that is about to fork (e.g. a preloading gunicorn master). With
+        max_jobs_per_worker, the whole pool is replaced once it has been
+        given that many jobs per worker; the old pool finishes its jobs and
+        its processes exit. (ProcessPoolExecutor's own max_tasks_per_child
+        needs Python 3.11 and can deadlock there when jobs are queued.)
+
+        Returns:
+            Process pool executor
+        """
+        with self._lock:
+            if self._executor is not None and self.max_jobs_per_worker > 0 and self._executor_jobs_left == 0:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                self._executor_jobs_left = self.max_workers * self.max_jobs_per_worker
+
+            self._executor_jobs_left -= 1
+            return self._executor
+
+    def submit(self, handler: Callable[[JobContext, Dict[str, Any]], Dict[str, Any]],
+               payload: Dict[str, Any], kind: str = None) -> str:
+        """
+        Submit a job and return immediately
+
+        Args:
+            handler: Module-level function implementing the job; it receives a
+                JobContext and the payload and returns a JSON-serializable result
+            payload: Job arguments (must be picklable)
+            kind: Kind of the job (defaults to the handler name)
+
+        Returns:
+            ID of the submitted job
+        """
+        job_id = str(uuid.uuid4())
+        kind = kind or handler.__name__
+        now = time.time()
+
+        with _connect(self.db_path) as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, kind, status, created_at, updated_at, owner_pid, heartbeat_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, JOB_QUEUED, now, now, os.getpid(), now)
+            )
+
+        with self._lock:
+            self._active_jobs.add(job_id)
+        self._start_heartbeat()
+
+        JOBS_IN_PROGRESS.inc(kind=kind)
+        future = self._get_executor().submit(_run_job, self.db_path, job_id, handler, payload, kind, REGISTRY.enabled)
+        future.add_done_callback(lambda f: self._job_done(job_id, kind, f))
+
+        return job_id
+
+    def _job_done(self, job_id: str, kind: str, future: Future):
+        """
+        Collect the metrics of a finished job, or mark it as failed when its
+        worker could not run it at all
+
+        Errors raised by the handler are recorded by the worker itself; this
+        covers the rest (e.g. a worker process killed by the OOM killer).
+
+        Args:
+            job_id: ID of the job
+            kind: Kind of the job
+            future: Future of the submitted job
+        """
+        JOBS_IN_PROGRESS.dec(kind=kind)
+        with self._lock:
+            self._active_jobs.discard(job_id)
+
+        if future.cancelled():
+            return
+
+        if future.exception() is None:
+            if future.result() is not None:
+                REGISTRY.merge(future.result())
+                REGISTRY.write_snapshot(min_interval=SNAPSHOT_INTERVAL)
+            return
+
+        JOBS_TOTAL.inc(kind=kind, status=JOB_FAILED)
+
+        with _connect(self.db_path) as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (JOB_FAILED, str(future.exception()), time.time(), job_id)
+            )
+
+    def _start_heartbeat(self):
+        """
+        Start the heartbeat thread of this process, if not running yet
+
+        The thread is started on the first submission of each process, so
+        it is never lost to a fork (threads do not survive one).
+        """
+        with self._lock:
+            if self._heartbeat_pid == os.getpid():
+                return
+            self._heartbeat_pid = os.getpid()
+
+        threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+
+    def _heartbeat(self):
+        """
+        Mark the unfinished jobs of this process as alive, forever
+        """
+        while True:
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+
+            with self._lock:
+                job_ids = list(self._active_jobs)
+            if not job_ids:
+                continue
+
+            now = time.time()
+            try:
+                with _connect(self.db_path) as connection:
+                    connection.executemany(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE id = ?",
+                        [(now, job_id) for job_id in job_ids]
+                    )
+            except sqlite3.Error:
+                # Try again on the next beat
+                continue
+
+    def fail_orphaned_jobs(self, job_id: str = None) -> int:
+        """
+        Mark queued and running jobs whose owning process is gone as failed
+
+        A job is orphaned when its owner process no longer exists or has not
+        sent a heartbeat for JOB_HEARTBEAT_TIMEOUT seconds.
+
+        Args:
+            job_id: ID of the only job to check (None checks every job)
+
+        Returns:
+            Number of jobs marked as failed
+        """
+        query = "SELECT id, kind, owner_pid, heartbeat_at, updated_at FROM jobs WHERE status IN (?, ?)"
+        parameters = [JOB_QUEUED, JOB_RUNNING]
+        if job_id is not None:
+            query += " AND id = ?"
+            parameters.append(job_id)
+
+        now = time.time()
+        failed = 0
+
+        with _connect(self.db_path) as connection:
+            for row in connection.execute(query, parameters).fetchall():
+                if not _job_orphaned(row, now):
+                    continue
+
+                # Only jobs still unfinished, in case the job has just ended
+                if connection.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                    (JOB_FAILED, JOB_ORPHANED_ERROR, now, row["id"], JOB_QUEUED, JOB_RUNNING)
+                ).rowcount:
+                    failed += 1
+                    JOBS_TOTAL.inc(kind=row["kind"], status=JOB_FAILED)
+
+        return failed
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the status of a job
+
+        A job left unfinished by a process that has exited is reported (and
+        recorded) as failed.
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            Dictionary describing the job, or None if it does not exist
+        """
+        with _connect(self.db_path) as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        if row["status"] in (JOB_QUEUED, JOB_RUNNING) and _job_orphaned(row, time.time()):
+            self.fail_orphaned_jobs(job_id)
+            return self.get_job(job_id)
+
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "stage": row["stage"],
+            "progress": {
+                "current": row["progress_current"],
+                "total": row["progress_total"]
+            },
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    def shutdown(self, wait: bool = True):
+        """
+        Shut down the worker pool
+
+        Args:
+            wait: Whether to wait for running jobs to finish
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
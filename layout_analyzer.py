@@ -0,0 +1,129 @@
+import fitz  # PyMuPDF
+import numpy as np
+from typing import Dict, Any
+
+# Span flag marking bold text in page.get_text("dict") output
+BOLD_FLAG = 16
+
+
+def extract_line_features(page) -> Dict[str, Any]:
+    """
+    Collect the layout features of every text line of a PDF page
+
+    Only plain lists are returned, so the features can be sent back from
+    extraction worker processes.
+
+    Args:
+        page: PDF page object
+
+    Returns:
+        Dictionary of parallel lists: "text" (stripped line text), "size"
+        (largest font size), "bold" (all spans bold), "x0"/"x1" (horizontal
+        extent), plus the page "width"
+    """
+    features = {"text": [], "size": [], "bold": [], "x0": [], "x1": [], "width": page.rect.width}
+
+    for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+        for line in block.get("lines", []):
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if not spans:
+                continue
+
+            features["text"].append("".join(span["text"] for span in line["spans"]).strip())
+            features["size"].append(max(span["size"] for span in spans))
+            features["bold"].append(all(span["flags"] & BOLD_FLAG for span in spans))
+            features["x0"].append(line["bbox"][0])
+            features["x1"].append(line["bbox"][2])
+
+    return features
+
+
+class LayoutAnalyzer:
+    """
+    Document-wide heading detection from layout features
+
+    Line features of all pages are gathered into flat NumPy arrays and
+    classified with array operations: a line is a heading candidate when its
+    font is noticeably larger than the body text, when it is bold in a
+    document whose body is not bold, or when it is a short, centered line in
+    a slightly larger font. Heading levels follow the rank of the heading
+    font sizes in the document.
+    """
+
+    def __init__(self, min_size_ratio: float = 1.15, max_heading_length: int = 120, max_levels: int = 3):
+        """
+        Initialize the layout analyzer
+
+        Args:
+            min_size_ratio: Minimum font size, relative to the body text, of
+                headings detected by size alone
+            max_heading_length: Maximum number of characters of a heading
+            max_levels: Number of heading levels
+        """
+        self.min_size_ratio = min_size_ratio
+        self.max_heading_length = max_heading_length
+        self.max_levels = max_levels
+        self._page_numbers = []
+        self._features = []
+
+    def add_page(self, page_number: int, features: Dict[str, Any]):
+        """
+        Add the line features of a page
+
+        Args:
+            page_number: Page number (1-based)
+            features: Line features from extract_line_features
+        """
+        if features["text"]:
+            self._page_numbers.append(page_number)
+            self._features.append(features)
+
+    def heading_hints(self) -> Dict[int, Dict[str, int]]:
+        """
+        Classify every collected line at once
+
+        Returns:
+            Dictionary mapping page number to a dictionary of heading line
+            texts and their levels
+        """
+        if not self._features:
+            return {}
+
+        counts = np.array([len(features["text"]) for features in self._features])
+        texts = [text for features in self._features for text in features["text"]]
+        page_index = np.repeat(np.arange(len(self._features)), counts)
+
+        size = np.concatenate([np.asarray(features["size"], dtype=np.float32) for features in self._features])
+        bold = np.concatenate([np.asarray(features["bold"], dtype=bool) for features in self._features])
+        x0 = np.concatenate([np.asarray(features["x0"], dtype=np.float32) for features in self._features])
+        x1 = np.concatenate([np.asarray(features["x1"], dtype=np.float32) for features in self._features])
+        width = np.repeat(np.array([features["width"] for features in self._features], dtype=np.float32), counts)
+        length = np.fromiter((len(text) for text in texts), dtype=np.int32, count=len(texts))
+
+        # Body text: the font size (to half a point) carrying the most characters
+        size_bins = np.round(size * 2).astype(np.int32)
+        body_size = np.argmax(np.bincount(size_bins, weights=length)) / 2
+        size_ratio = size / max(body_size, 1.0)
+
+        # Bold is only a signal when most of the text is not bold
+        bold_signal = bold if length[bold].sum() < length.sum() / 2 else np.zeros_like(bold)
+
+        centered = np.abs((x0 + x1) / 2 - width / 2) < width * 0.05
+
+        headings = (length <= self.max_heading_length) & (
+            (size_ratio >= self.min_size_ratio)
+            | (bold_signal & (size_ratio >= 1.0))
+            | (centered & (size_ratio >= 1.05) & (length < self.max_heading_length // 2))
+        )
+
+        # Levels: largest heading font first
+        heading_sizes = size_bins[headings]
+        _, size_rank = np.unique(-heading_sizes, return_inverse=True)
+        levels = np.minimum(size_rank + 1, self.max_levels)
+
+        hints = {}
+        for index, level in zip(np.flatnonzero(headings), levels):
+            page_hints = hints.setdefault(self._page_numbers[page_index[index]], {})
+            page_hints.setdefault(texts[index], int(level))
+
+        return hints
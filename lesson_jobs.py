@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import uuid
+from typing import Dict, Any, Callable
+from src.services.job_queue import JobContext
+from src.services.extraction_cache import ExtractionCache
+from src.services.session_store import SessionStore
+from src.services.artifact_store import ArtifactStore
+
+# Job handlers run inside the job queue worker processes. They receive only
+# picklable payloads (paths and options) and build the services they need.
+# The PDF, OCR and presentation services are imported by the handlers, so
+# that importing this module (as the web app does) stays cheap.
+
+# Version of the slide plans derived from sessions; bump it whenever
+# PPTXGenerator.build_slide_plan changes
+SLIDE_PLAN_VERSION = "2"
+
+# Activity types a lesson can be generated with, each enabled by the
+# "generate_<type>" option
+ACTIVITY_TYPES = ("kahoot", "kahoot_xlsx", "nearpod", "qti")
+
+
+def _reuse_or_generate(artifact_store: ArtifactStore, artifact_name: str,
+                       generate: Callable[[str], str]) -> str:
+    """
+    Reuse a stored artifact, or generate it and store it
+
+    Args:
+        artifact_store: Store holding the generated files
+        artifact_name: Name of the artifact; it must capture every input the
+            file is generated from
+        generate: Callable receiving a private file name (without extension)
+            to generate the file under, and returning the file's path
+
+    Returns:
+        Name of the artifact
+    """
+    if artifact_store.get(artifact_name) is None:
+        artifact_store.put(artifact_name, generate(f".{uuid.uuid4().hex}"))
+
+    return artifact_name
+
+
+def extract_lesson(context: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract content from an uploaded file and store it as a lesson session
+
+    Args:
+        context: Job context used to report progress
+        payload: Dictionary with "file_path", its "content_hash" (if known),
+            "upload_folder", "sessions_folder"
+            and the parallel extraction, cache, OCR, structure and session settings
+
+    Returns:
+        Dictionary containing the session ID
+    """
+    from src.services.ocr_engine import OCREngine
+    from src.services.file_processor import FileProcessor
+
+    cache = None
+    if payload.get("cache_folder"):
+        cache = ExtractionCache(payload["cache_folder"], max_bytes=payload["cache_max_bytes"])
+
+    file_processor = FileProcessor(
+        payload["upload_folder"],
+        parallel_workers=payload.get("parallel_workers", 0),
+        parallel_min_pages=payload.get("parallel_min_pages", 50),
+        cache=cache,
+        ocr_engine=OCREngine(max_workers=payload.get("ocr_max_workers", 2), **payload.get("ocr_options", {})),
+        language=payload.get("structure_language", "default"),
+        layout_analysis=payload.get("layout_analysis", False)
+    )
+    session_store = SessionStore(payload["sessions_folder"], ttl=payload.get("session_ttl", 7 * 24 * 3600))
+
+    # Pages are written into the session while they are read, so memory
+    # use does not grow with the page count
+    page_writer = session_store.page_writer()
+    try:
+        content = file_processor.process_file(
+            payload["file_path"],
+            progress_callback=context.progress_callback("extract"),
+            content_hash=payload.get("content_hash"),
+            page_writer=page_writer
+        )
+
+        # Store content in session for later use; the uploaded file is kept as
+        # long as the session
+        content["source_path"] = payload["file_path"]
+        session_id = session_store.save(content, pages=page_writer)
+    finally:
+        page_writer.discard()
+
+    return {"session_id": session_id}
+
+
+def generate_lesson(context: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generate the presentation and requested activities for a lesson session
+
+    Args:
+        context: Job context used to report progress
+        payload: Dictionary with "session_id", "sessions_folder", the service
+            folders (including the optional "thumbnails_folder"), the
+            "artifacts_folder" and its "artifacts_max_bytes", and the
+            customization options
+
+    Returns:
+        Dictionary containing the presentation and activity artifact names
+        and the output file name chosen for the downloads
+    """
+    from src.services.pptx_generator import PPTXGenerator
+    from src.services.thumbnail_cache import ThumbnailCache
+    from src.services.activity_generator import ActivityGenerator
+    from src.services.activity_compiler import activity_extension
+
+    session_id = payload["session_id"]
+    session_store = SessionStore(payload["sessions_folder"], ttl=0)
+    content = session_store.load(session_id)
+    if content is None:
+        raise ValueError(f"Session not found: {session_id}")
+
+    output_filename = payload["output_filename"]
+    template_name = payload["template_name"]
+    color_scheme = payload["color_scheme"]
+
+    # The slide plan depends only on the session, so it is built once
+    pptx_generator = PPTXGenerator(
+        payload["templates_folder"],
+        payload["output_folder"],
+        thumbnail_cache=ThumbnailCache(payload.get("thumbnails_folder"))
+    )
+    plan_name = f"slide_plan.v{SLIDE_PLAN_VERSION}.json"
+    plan_data = session_store.get_derived(session_id, plan_name)
+
+    if plan_data is not None:
+        slide_plan = json.loads(plan_data)
+    else:
+        slide_plan = pptx_generator.build_slide_plan(content)
+        session_store.put_derived(session_id, plan_name, json.dumps(slide_plan, ensure_ascii=False).encode('utf-8'))
+
+    # Only the styling pass depends on the options; a presentation already
+    # rendered from the same plan, template and color scheme is reused as is
+    artifact_store = ArtifactStore(payload["artifacts_folder"], max_bytes=payload["artifacts_max_bytes"])
+    slides_progress = context.progress_callback("slides")
+    pptx_file = _reuse_or_generate(
+        artifact_store,
+        f"{pptx_generator.render_key(slide_plan, template_name, color_scheme)}.pptx",
+        lambda private_name: pptx_generator.render_slide_plan(
+            slide_plan,
+            template_name=template_name,
+            color_scheme=color_scheme,
+            output_filename=private_name,
+            progress_callback=slides_progress
+        )
+    )
+    # Reused presentations report no slides of their own
+    slides_progress(len(slide_plan), len(slide_plan))
+
+    # Generate activities if requested (they depend only on the session);
+    # missing ones are compiled together from a single pass over the content
+    activity_generator = ActivityGenerator(payload["activities_folder"])
+    activity_names = {
+        activity_type: f"{activity_type}_{activity_generator.activity_key(content, activity_type)}"
+                       f".{activity_extension(activity_type)}"
+        for activity_type in ACTIVITY_TYPES
+        if payload.get(f"generate_{activity_type}")
+    }
+
+    missing = {}
+    for activity_type, artifact_name in activity_names.items():
+        context.report(activity_type, 0, 1)
+        if artifact_store.get(artifact_name) is None:
+            missing[activity_type] = f".{uuid.uuid4().hex}"
+
+    if missing:
+        generated = activity_generator.generate_activities(content, missing)
+        for activity_type, activity_path in generated.items():
+            artifact_store.put(activity_names[activity_type], activity_path)
+
+    activities = [
+        {'type': activity_type, 'path': artifact_name}
+        for activity_type, artifact_name in activity_names.items()
+    ]
+
+    return {
+        "pptx_file": pptx_file,
+        "activities": activities,
+        "output_filename": output_filename
+    }
+
+
+def run_batch(context: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a folder or manifest of lesson files
+
+    Args:
+        context: Job context used to report progress
+        payload: Dictionary with "batch_id", "sources", "output_folder",
+            "templates_folder" and the batch options
+
+    Returns:
+        Dictionary containing the batch ID and the summary counters
+    """
+    from src.services.batch_generator import BatchGenerator
+
+    batch_generator = BatchGenerator(
+        payload["output_folder"],
+        payload["templates_folder"],
+        max_workers=payload.get("workers"),
+        template_name=payload.get("template_name", "default"),
+        color_scheme=payload.get("color_scheme", "default"),
+        generate_kahoot=payload.get("generate_kahoot", True),
+        generate_nearpod=payload.get("generate_nearpod", True),
+        cache_folder=payload.get("cache_folder"),
+        cache_max_bytes=payload.get("cache_max_bytes", 512 * 1024 * 1024),
+        ocr_options=payload.get("ocr_options")
+    )
+
+    summary = batch_generator.run(payload["sources"], progress_callback=context.progress_callback("batch"))
+
+    return {
+        "batch_id": payload["batch_id"],
+        "total": summary["total"],
+        "succeeded": summary["succeeded"],
+        "failed": summary["failed"]
+    }
+
+
+def _remove_unreferenced(folder: str, referenced, older_than: float, recursive: bool = True) -> int:
+    """
+    Remove the files of a folder that are neither referenced nor recent
+
+    Args:
+        folder: Folder to sweep
+        referenced: Callable telling whether a file (given its path and
+            name) is still used
+        older_than: Files changed at or after this time are kept, as they
+            may belong to a session still being extracted
+        recursive: Whether subfolders are swept too
+
+    Returns:
+        Number of removed files
+    """
+    removed = 0
+
+    for root, folders, files in os.walk(folder):
+        if not recursive:
+            folders.clear()
+
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                status = os.stat(path)
+                # A hard link made by a cache hit only updates the change time
+                if max(status.st_mtime, status.st_ctime) >= older_than or referenced(path, name):
+                    continue
+                os.remove(path)
+                removed += 1
+            except OSError:
+                # Removed concurrently
+                continue
+
+    return removed
+
+
+def cleanup_storage(context: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Delete expired sessions and the files that only they used
+
+    Uploaded files, extracted images and image thumbnails are removed once
+    no stored session refers to them and they have not been written or
+    reused within the session TTL.
+
+    Args:
+        context: Job context used to report progress
+        payload: Dictionary with the "sessions_folder", its "session_ttl",
+            the "upload_folder", "images_folder" and "thumbnails_folder"
+
+    Returns:
+        Dictionary with the numbers of deleted sessions and removed files
+    """
+    ttl = payload["session_ttl"]
+    session_store = SessionStore(payload["sessions_folder"], ttl=ttl)
+
+    context.report("sessions", 0, 2)
+    deleted_sessions = session_store.cleanup()
+
+    context.report("files", 1, 2)
+    paths, hashes = session_store.referenced_files()
+    older_than = time.time() - ttl
+
+    removed_files = _remove_unreferenced(
+        payload["upload_folder"],
+        lambda path, name: os.path.abspath(path) in paths or name.startswith("."),
+        older_than,
+        recursive=False
+    )
+    removed_files += _remove_unreferenced(
+        payload["images_folder"],
+        lambda path, name: os.path.abspath(path) in paths,
+        older_than
+    )
+    # Thumbnails are named after the content hash of their image
+    removed_files += _remove_unreferenced(
+        payload["thumbnails_folder"],
+        lambda path, name: name.split("-", 1)[0] in hashes,
+        older_than
+    )
+
+    context.report("files", 2, 2)
+    return {"deleted_sessions": deleted_sessions, "removed_files": removed_files}
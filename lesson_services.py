@@ -0,0 +1,320 @@
+import os
+import threading
+from typing import Dict, Any
+from flask import Flask, current_app
+
+# Key of the lesson services in app.extensions
+EXTENSION_NAME = "lesson_services"
+
+# Modules imported by warm_up: PDF, image, OCR and presentation libraries
+# that every worker would otherwise import on its first job or request
+HEAVY_MODULES = (
+    "src.services.file_processor",
+    "src.services.ocr_engine",
+    "src.services.pptx_generator",
+    "src.services.thumbnail_cache",
+    "src.services.activity_compiler",
+    "src.services.batch_generator"
+)
+
+
+class LessonServices:
+    """
+    Settings and services of the lessons blueprint, attached to an app
+
+    Settings are read from the app config when the services are registered.
+    Services are created on first use, and the modules they need (PyMuPDF,
+    Pillow, pytesseract, python-pptx) are imported at that point, so
+    importing the blueprint and starting a worker stay cheap. Job handlers
+    build their own services from the payloads returned by the *_payload
+    methods.
+    """
+
+    def __init__(self, app: Flask):
+        """
+        Read the lesson settings from an app's config
+
+        Args:
+            app: Flask application
+        """
+        config = app.config
+        static_folder = os.path.join(app.root_path, 'static')
+
+        # Folders
+        self.upload_folder = config.get('UPLOAD_FOLDER', os.path.join(static_folder, 'uploads'))
+        self.templates_folder = config.get('TEMPLATES_FOLDER', os.path.join(static_folder, 'templates'))
+        self.output_folder = config.get('OUTPUT_FOLDER', os.path.join(static_folder, 'output'))
+        self.activities_folder = config.get('ACTIVITIES_FOLDER', os.path.join(static_folder, 'activities'))
+
+        # Extracted images, and their slide-sized thumbnails reused across
+        # presentations
+        self.images_folder = os.path.join(self.upload_folder, 'images')
+        self.thumbnails_folder = os.path.join(self.upload_folder, 'thumbnails')
+
+        # Background jobs
+        self.jobs_database = os.path.join(self.output_folder, 'jobs.sqlite3')
+        self.job_workers = config.get('JOB_WORKERS', 2)
+        self.job_max_jobs_per_worker = config.get('JOB_MAX_JOBS_PER_WORKER', 0)
+
+        # Parallel PDF extraction
+        self.pdf_parallel_workers = config.get('PDF_PARALLEL_WORKERS', 0)
+        self.pdf_parallel_min_pages = config.get('PDF_PARALLEL_MIN_PAGES', 50)
+
+        # OCR
+        self.ocr_max_workers = config.get('OCR_MAX_WORKERS', 2)
+        self.ocr_options = {
+            'lang': config.get('OCR_LANG', 'ara+eng'),
+            'dpi': config.get('OCR_DPI', 200),
+            'max_dimension': config.get('OCR_MAX_DIMENSION', 2500),
+            'binarize': config.get('OCR_BINARIZE', True)
+        }
+
+        # Structure extraction
+        self.structure_language = config.get('STRUCTURE_LANGUAGE', 'default')
+        self.layout_analysis = config.get('LAYOUT_ANALYSIS', False)
+
+        # Batch generation
+        self.batch_input_folder = config.get('BATCH_INPUT_FOLDER', os.path.join(static_folder, 'curricula'))
+        self.batch_output_folder = os.path.join(self.output_folder, 'batches')
+        self.batch_workers = config.get('BATCH_WORKERS', os.cpu_count() or 1)
+
+        # Extraction cache
+        self.extraction_cache_folder = config.get(
+            'EXTRACTION_CACHE_FOLDER',
+            os.path.join(static_folder, 'cache', 'extraction')
+        )
+        self.extraction_cache_max_bytes = config.get('EXTRACTION_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+
+        # Lesson sessions
+        self.sessions_folder = os.path.join(self.output_folder, 'sessions')
+        self.session_ttl = config.get('SESSION_TTL', 7 * 24 * 3600)
+        self.session_cache_size = config.get('SESSION_CACHE_SIZE', 32)
+        self.session_cleanup_interval = config.get('SESSION_CLEANUP_INTERVAL', 3600)
+
+        # Generated files (presentations and activities)
+        self.artifacts_folder = os.path.join(self.output_folder, 'artifacts')
+        self.artifacts_max_bytes = config.get('ARTIFACTS_MAX_BYTES', 1024 * 1024 * 1024)
+
+        self._services = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, create):
+        """
+        Get a service, creating it on first use
+
+        Args:
+            name: Service name
+            create: Callable creating the service
+
+        Returns:
+            Service
+        """
+        with self._lock:
+            if name not in self._services:
+                self._services[name] = create()
+            return self._services[name]
+
+    @property
+    def job_queue(self):
+        """Queue of the extraction, generation and batch jobs"""
+        def create():
+            from src.services.job_queue import JobQueue
+            return JobQueue(
+                self.jobs_database,
+                max_workers=self.job_workers,
+                max_jobs_per_worker=self.job_max_jobs_per_worker
+            )
+
+        return self._get('job_queue', create)
+
+    @property
+    def session_store(self):
+        """Store of the extracted lesson sessions"""
+        def create():
+            from src.services.session_store import SessionStore
+            return SessionStore(
+                self.sessions_folder,
+                max_cached=self.session_cache_size,
+                ttl=self.session_ttl,
+                cleanup_interval=self.session_cleanup_interval
+            )
+
+        return self._get('session_store', create)
+
+    @property
+    def artifact_store(self):
+        """Store of the generated presentations and activities"""
+        def create():
+            from src.services.artifact_store import ArtifactStore
+            return ArtifactStore(self.artifacts_folder, max_bytes=self.artifacts_max_bytes)
+
+        return self._get('artifact_store', create)
+
+    @property
+    def extraction_cache(self):
+        """Cache of the content extracted from uploaded files"""
+        def create():
+            from src.services.extraction_cache import ExtractionCache
+            return ExtractionCache(self.extraction_cache_folder, max_bytes=self.extraction_cache_max_bytes)
+
+        return self._get('extraction_cache', create)
+
+    @property
+    def thumbnail_cache(self):
+        """Cache of the image thumbnails shown on slides and previews"""
+        def create():
+            from src.services.thumbnail_cache import ThumbnailCache
+            return ThumbnailCache(self.thumbnails_folder)
+
+        return self._get('thumbnail_cache', create)
+
+    def extract_payload(self, file_path: str, content_hash: str = None) -> Dict[str, Any]:
+        """
+        Build the payload of an extraction job
+
+        Args:
+            file_path: Path to the uploaded file
+            content_hash: SHA-256 hash of the file, if known
+
+        Returns:
+            Payload of lesson_jobs.extract_lesson
+        """
+        return {
+            'file_path': file_path,
+            'content_hash': content_hash,
+            'upload_folder': self.upload_folder,
+            'sessions_folder': self.sessions_folder,
+            'session_ttl': self.session_ttl,
+            'parallel_workers': self.pdf_parallel_workers,
+            'parallel_min_pages': self.pdf_parallel_min_pages,
+            'cache_folder': self.extraction_cache_folder,
+            'cache_max_bytes': self.extraction_cache_max_bytes,
+            'ocr_max_workers': self.ocr_max_workers,
+            'ocr_options': self.ocr_options,
+            'structure_language': self.structure_language,
+            'layout_analysis': self.layout_analysis
+        }
+
+    def generate_payload(self, session_id: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the payload of a generation job
+
+        Args:
+            session_id: ID of the lesson session
+            options: Customization options (template, color scheme, output
+                file name and requested activities)
+
+        Returns:
+            Payload of lesson_jobs.generate_lesson
+        """
+        return {
+            'session_id': session_id,
+            'sessions_folder': self.sessions_folder,
+            'templates_folder': self.templates_folder,
+            'output_folder': self.output_folder,
+            'activities_folder': self.activities_folder,
+            'thumbnails_folder': self.thumbnails_folder,
+            'artifacts_folder': self.artifacts_folder,
+            'artifacts_max_bytes': self.artifacts_max_bytes,
+            **options
+        }
+
+    def batch_payload(self, batch_id: str, sources, output_folder: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the payload of a batch job
+
+        Args:
+            batch_id: ID of the batch
+            sources: Paths of the lesson files
+            output_folder: Folder of the batch outputs
+            options: Batch options (template, color scheme and activities)
+
+        Returns:
+            Payload of lesson_jobs.run_batch
+        """
+        return {
+            'batch_id': batch_id,
+            'sources': sources,
+            'output_folder': output_folder,
+            'templates_folder': self.templates_folder,
+            'workers': self.batch_workers,
+            'cache_folder': self.extraction_cache_folder,
+            'cache_max_bytes': self.extraction_cache_max_bytes,
+            'ocr_options': self.ocr_options,
+            **options
+        }
+
+    def cleanup_payload(self) -> Dict[str, Any]:
+        """
+        Build the payload of a storage cleanup job
+
+        Returns:
+            Payload of lesson_jobs.cleanup_storage
+        """
+        return {
+            'sessions_folder': self.sessions_folder,
+            'session_ttl': self.session_ttl,
+            'upload_folder': self.upload_folder,
+            'images_folder': self.images_folder,
+            'thumbnails_folder': self.thumbnails_folder
+        }
+
+    def maybe_schedule_cleanup(self):
+        """
+        Submit a storage cleanup job unless one ran within the cleanup
+        interval (in any process sharing the sessions folder)
+        """
+        if self.session_store.claim_cleanup():
+            from src.services.lesson_jobs import cleanup_storage
+            self.job_queue.submit(cleanup_storage, self.cleanup_payload(), kind='cleanup')
+
+    def warm_up(self):
+        """
+        Import the heavy modules and parse the presentation templates
+
+        Meant for a process that forks its workers afterwards (e.g. a
+        gunicorn master started with --preload): the modules, the parsed
+        templates and the stores are then shared copy-on-write by every
+        worker instead of being loaded by each of them. No process or
+        thread pool is started here.
+        """
+        import importlib
+        for module in HEAVY_MODULES:
+            importlib.import_module(module)
+
+        from src.services.template_registry import TemplateRegistry
+        TemplateRegistry.for_folder(self.templates_folder).preload()
+
+        # Open the stores (and create their indexes) once
+        for name in ('job_queue', 'session_store', 'artifact_store', 'extraction_cache', 'thumbnail_cache'):
+            getattr(self, name)
+
+
+def init_lesson_services(app: Flask) -> LessonServices:
+    """
+    Register the lesson services on an app and create their folders
+
+    Args:
+        app: Flask application
+
+    Returns:
+        Lesson services of the app
+    """
+    services = LessonServices(app)
+
+    for folder in (services.upload_folder, services.templates_folder, services.output_folder,
+                   services.activities_folder):
+        os.makedirs(folder, exist_ok=True)
+
+    app.extensions[EXTENSION_NAME] = services
+    return services
+
+
+def get_services() -> LessonServices:
+    """
+    Get the lesson services of the current app
+
+    Returns:
+        Lesson services
+    """
+    return current_app.extensions[EXTENSION_NAME]
@@ -1,35 +1,45 @@
-from flask import Blueprint, render_template, request, jsonify, current_app, flash, redirect, url_for, send_from_directory
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, send_from_directory, send_file, g
 import os
+import time
+import json
 import uuid
 from werkzeug.utils import secure_filename
-from src.services.file_processor import FileProcessor
-from src.services.pptx_generator import PPTXGenerator
-from src.services.activity_generator import ActivityGenerator
+from src.services.job_queue import JOB_FINISHED, JOB_FAILED
+from src.services.lesson_jobs import extract_lesson, generate_lesson, run_batch
+from src.services.lesson_services import get_services
+from src.services.metrics import REGISTRY, SNAPSHOT_INTERVAL, STAGE_SECONDS, REQUEST_SECONDS, REQUESTS_IN_PROGRESS
+from src.services.upload_ingest import IngestedUpload, UploadRejected
+from werkzeug.exceptions import RequestEntityTooLarge
 
-# Create blueprint
+# Create blueprint (settings and services live on the app, see lesson_services)
 lessons_bp = Blueprint('lessons', __name__)
 
-# Configure upload folder
-UPLOAD_FOLDER = os.path.join(current_app.root_path, 'static', 'uploads')
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
 
-# Ensure upload folder exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Configure the session content API behind the customize page
+CONTENT_PAGE_SIZE = 20
+CONTENT_MAX_PAGE_SIZE = 100
+STRUCTURE_SECTIONS = ('headings', 'paragraphs', 'bullet_points')
+PREVIEW_THUMBNAIL_SIZE = (1.6, 1.2)  # Inches, at the thumbnail cache resolution
 
-# Configure output folders
-TEMPLATES_FOLDER = os.path.join(current_app.root_path, 'static', 'templates')
-OUTPUT_FOLDER = os.path.join(current_app.root_path, 'static', 'output')
-ACTIVITIES_FOLDER = os.path.join(current_app.root_path, 'static', 'activities')
+@lessons_bp.before_request
+def start_request_metrics():
+    """Record the start of a lessons request"""
+    if REGISTRY.enabled:
+        g.request_started = time.perf_counter()
+        REQUESTS_IN_PROGRESS.inc(endpoint=request.endpoint)
 
-# Ensure output folders exist
-os.makedirs(TEMPLATES_FOLDER, exist_ok=True)
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-os.makedirs(ACTIVITIES_FOLDER, exist_ok=True)
-
-# Initialize services
-file_processor = FileProcessor(UPLOAD_FOLDER)
-pptx_generator = PPTXGenerator(TEMPLATES_FOLDER, OUTPUT_FOLDER)
-activity_generator = ActivityGenerator(ACTIVITIES_FOLDER)
+@lessons_bp.teardown_request
+def finish_request_metrics(exception=None):
+    """Record the duration of a lessons request"""
+    if REGISTRY.enabled and 'request_started' in g:
+        REQUESTS_IN_PROGRESS.dec(endpoint=request.endpoint)
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - g.request_started,
+            endpoint=request.endpoint,
+            method=request.method
+        )
+        REGISTRY.write_snapshot(min_interval=SNAPSHOT_INTERVAL)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -43,12 +53,22 @@ def index():
 def create_lesson():
     """Create a new lesson"""
     if request.method == 'POST':
+        # Parsing the form streams the upload into the upload folder
+        try:
+            files = request.files
+        except UploadRejected as e:
+            flash(e.description)
+            return redirect(request.url)
+        except RequestEntityTooLarge:
+            flash('File is too large')
+            return redirect(request.url)
+        
         # Check if a file was uploaded
-        if 'file' not in request.files:
+        if 'file' not in files:
             flash('No file part')
             return redirect(request.url)
         
-        file = request.files['file']
+        file = files['file']
         
         # If user does not select file, browser also
         # submit an empty part without filename
@@ -57,30 +77,41 @@ def create_lesson():
             return redirect(request.url)
         
         if file and allowed_file(file.filename):
-            # Generate a unique filename
+            # Generate a unique filename; secure_filename drops non-ASCII
+            # names (e.g. Arabic) entirely, so the already validated
+            # extension is taken from the original name
+            extension = file.filename.rsplit('.', 1)[1].lower()
             filename = secure_filename(file.filename)
+            if not filename.lower().endswith(f".{extension}"):
+                filename = f"upload.{extension}"
             unique_filename = f"{uuid.uuid4()}_{filename}"
-            file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
+            services = get_services()
+            file_path = os.path.join(services.upload_folder, unique_filename)
             
-            # Save the file
-            file.save(file_path)
+            # Save the file (an already streamed upload is only moved into place)
+            content_hash = None
+            with STAGE_SECONDS.time(stage="upload_save"):
+                if isinstance(file.stream, IngestedUpload):
+                    try:
+                        content_hash = file.stream.finalize(file_path, extension)["content_hash"]
+                    except UploadRejected as e:
+                        flash(e.description)
+                        return redirect(request.url)
+                else:
+                    file.save(file_path)
             
-            # Process the file
-            try:
-                content = file_processor.process_file(file_path)
-                
-                # Store content in session for later use
-                session_id = str(uuid.uuid4())
-                session_file = os.path.join(OUTPUT_FOLDER, f"{session_id}.json")
-                with open(session_file, 'w', encoding='utf-8') as f:
-                    json.dump(content, f, ensure_ascii=False, indent=2)
-                
-                # Redirect to customize page
-                return redirect(url_for('lessons.customize_lesson', session_id=session_id))
+            # Process the file in the background
+            job_id = services.job_queue.submit(
+                extract_lesson,
+                services.extract_payload(file_path, content_hash),
+                kind='extract'
+            )
+            
+            # Uploads are what storage grows with: reclaim expired sessions
+            services.maybe_schedule_cleanup()
             
-            except Exception as e:
-                flash(f'Error processing file: {str(e)}')
-                return redirect(request.url)
+            # Redirect to progress page
+            return redirect(url_for('lessons.job_progress', job_id=job_id))
         
         else:
             flash('File type not allowed')
@@ -92,76 +123,248 @@ def create_lesson():
 @lessons_bp.route('/customize/<session_id>', methods=['GET', 'POST'])
 def customize_lesson(session_id):
     """Customize a lesson"""
-    # Load content from session file
-    session_file = os.path.join(OUTPUT_FOLDER, f"{session_id}.json")
+    # Load content from session store (sections are read on first use)
+    services = get_services()
+    content = services.session_store.load(session_id)
     
-    if not os.path.exists(session_file):
+    if content is None:
         flash('Session not found')
         return redirect(url_for('lessons.create_lesson'))
     
-    with open(session_file, 'r', encoding='utf-8') as f:
-        content = json.load(f)
-    
     if request.method == 'POST':
         # Get customization options
         template_name = request.form.get('template', 'default')
         color_scheme = request.form.get('color_scheme', 'default')
         output_filename = request.form.get('output_filename', 'presentation')
         
-        # Generate presentation
-        try:
-            pptx_path = pptx_generator.generate_presentation(
-                content, 
-                template_name=template_name,
-                color_scheme=color_scheme,
-                output_filename=output_filename
-            )
-            
-            # Generate activities if requested
-            activities = []
-            
-            if 'generate_kahoot' in request.form:
-                kahoot_path = activity_generator.generate_kahoot_activities(
-                    content,
-                    activity_name=f"kahoot_{output_filename}"
-                )
-                activities.append({
-                    'type': 'kahoot',
-                    'path': os.path.basename(kahoot_path)
-                })
-            
-            if 'generate_nearpod' in request.form:
-                nearpod_path = activity_generator.generate_nearpod_activities(
-                    content,
-                    activity_name=f"nearpod_{output_filename}"
-                )
-                activities.append({
-                    'type': 'nearpod',
-                    'path': os.path.basename(nearpod_path)
-                })
-            
-            # Redirect to download page
-            return redirect(url_for(
-                'lessons.download_lesson',
-                pptx_file=os.path.basename(pptx_path),
-                activities=','.join([a['type'] + ':' + a['path'] for a in activities])
-            ))
+        # Generate presentation and activities in the background
+        job_id = services.job_queue.submit(generate_lesson, services.generate_payload(session_id, {
+            'template_name': template_name,
+            'color_scheme': color_scheme,
+            'output_filename': output_filename,
+            'generate_kahoot': 'generate_kahoot' in request.form,
+            'generate_kahoot_xlsx': 'generate_kahoot_xlsx' in request.form,
+            'generate_nearpod': 'generate_nearpod' in request.form,
+            'generate_qti': 'generate_qti' in request.form
+        }), kind='generate')
         
-        except Exception as e:
-            flash(f'Error generating presentation: {str(e)}')
-            return redirect(request.url)
+        # Redirect to progress page
+        return redirect(url_for('lessons.job_progress', job_id=job_id))
     
-    # GET request - render the customize form
+    # GET request - render the customize form with the first screen of
+    # content only; the rest is fetched page by page from the content API
     return render_template(
         'lessons/customize.html',
-        content=content,
+        title=content.get('title'),
+        summary=content.summary(),
         session_id=session_id
     )
 
+def _paginate(items):
+    """Get the page of a list requested by the offset and limit arguments"""
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', CONTENT_PAGE_SIZE, type=int), 1), CONTENT_MAX_PAGE_SIZE)
+    
+    return {
+        'items': items[offset:offset + limit],
+        'offset': offset,
+        'limit': limit,
+        'total': len(items),
+        'next_offset': offset + limit if offset + limit < len(items) else None
+    }
+
+@lessons_bp.route('/sessions/<session_id>/structure/<section>')
+def session_structure(session_id, section):
+    """Get a page of headings, paragraphs or bullet lists of a session"""
+    content = get_services().session_store.load(session_id)
+    
+    if content is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    if section not in STRUCTURE_SECTIONS:
+        return jsonify({'error': f'Unknown structure section: {section}'}), 404
+    
+    return jsonify(_paginate(content.get('structure', {}).get(section, [])))
+
+@lessons_bp.route('/sessions/<session_id>/pages')
+def session_pages(session_id):
+    """Get a page of the extracted pages of a session"""
+    content = get_services().session_store.load(session_id)
+    
+    if content is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    return jsonify(_paginate(content.get('pages', [])))
+
+@lessons_bp.route('/sessions/<session_id>/images')
+def session_images(session_id):
+    """Get a page of the extracted images of a session, with thumbnail URLs"""
+    content = get_services().session_store.load(session_id)
+    
+    if content is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    page = _paginate(content.get('images', []))
+    page['items'] = [
+        {
+            'image_id': image['image_id'],
+            'page_number': image.get('page_number'),
+            'format': image.get('format'),
+            'thumbnail_url': url_for('lessons.session_image_thumbnail', session_id=session_id, image_id=image['image_id'])
+        }
+        for image in page['items']
+    ]
+    
+    return jsonify(page)
+
+@lessons_bp.route('/sessions/<session_id>/images/<image_id>/thumbnail')
+def session_image_thumbnail(session_id, image_id):
+    """Get the preview thumbnail of an extracted image"""
+    content = get_services().session_store.load(session_id)
+    
+    if content is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    image = next((image for image in content.get('images', []) if image['image_id'] == image_id), None)
+    thumbnail = None
+    if image is not None and image.get('path'):
+        thumbnail = get_services().thumbnail_cache.get(image['path'], image.get('hash'), *PREVIEW_THUMBNAIL_SIZE)
+    
+    if thumbnail is None:
+        return jsonify({'error': 'Image not found'}), 404
+    
+    return send_file(thumbnail['image'], conditional=True, max_age=24 * 3600)
+
+def _job_redirect_url(job):
+    """Build the URL to continue to once a job has finished"""
+    result = job["result"] or {}
+    
+    if job["kind"] == 'extract':
+        return url_for('lessons.customize_lesson', session_id=result["session_id"])
+    
+    if job["kind"] == 'batch':
+        return url_for('lessons.batch_summary', batch_id=result["batch_id"])
+    
+    if job["kind"] == 'generate':
+        return url_for(
+            'lessons.download_lesson',
+            pptx_file=result["pptx_file"],
+            activities=','.join([a['type'] + ':' + a['path'] for a in result["activities"]]),
+            name=result.get("output_filename")
+        )
+    
+    return None
+
+@lessons_bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Get the status of a background job"""
+    job = get_services().job_queue.get_job(job_id)
+    
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if job["status"] == JOB_FINISHED:
+        job["redirect_url"] = _job_redirect_url(job)
+    
+    return jsonify(job)
+
+@lessons_bp.route('/jobs/<job_id>/progress')
+def job_progress(job_id):
+    """Render the progress page of a background job"""
+    job = get_services().job_queue.get_job(job_id)
+    
+    if job is None:
+        flash('Job not found')
+        return redirect(url_for('lessons.create_lesson'))
+    
+    if job["status"] == JOB_FINISHED:
+        return redirect(_job_redirect_url(job))
+    
+    if job["status"] == JOB_FAILED:
+        flash(f'Error processing lesson: {job["error"]}')
+        return redirect(url_for('lessons.create_lesson'))
+    
+    return render_template('lessons/progress.html', job=job)
+
+def _resolve_batch_path(path):
+    """Resolve a batch source path, refusing anything outside BATCH_INPUT_FOLDER"""
+    root = os.path.realpath(get_services().batch_input_folder)
+    resolved = os.path.realpath(os.path.join(root, path))
+    
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f'Path outside the batch input folder: {path}')
+    
+    return resolved
+
+@lessons_bp.route('/batch', methods=['POST'])
+def create_batch():
+    """Start (or resume) converting a folder or manifest of lesson files"""
+    from src.services.batch_generator import BatchGenerator
+    
+    services = get_services()
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    
+    # Passing the ID of an earlier batch resumes it
+    batch_id = secure_filename(data.get('batch_id', '')) or str(uuid.uuid4())
+    output_folder = os.path.join(services.batch_output_folder, batch_id)
+    
+    try:
+        batch_generator = BatchGenerator(output_folder, services.templates_folder)
+        
+        if 'files' in data:
+            files = data['files']
+            if not isinstance(files, list) or not files or not all(isinstance(path, str) and path for path in files):
+                return jsonify({'error': '"files" must be a non-empty list of file paths'}), 400
+            sources = sorted(_resolve_batch_path(path) for path in files)
+        elif 'source' in data:
+            if not isinstance(data['source'], str):
+                return jsonify({'error': '"source" must be a folder or manifest path'}), 400
+            sources = batch_generator.collect_sources(_resolve_batch_path(data['source']))
+            sources = [_resolve_batch_path(path) for path in sources]
+        else:
+            return jsonify({'error': 'Either "source" or "files" is required'}), 400
+    except (ValueError, OSError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    job_id = services.job_queue.submit(run_batch, services.batch_payload(batch_id, sources, output_folder, {
+        'template_name': data.get('template', 'default'),
+        'color_scheme': data.get('color_scheme', 'default'),
+        'generate_kahoot': data.get('generate_kahoot', True),
+        'generate_nearpod': data.get('generate_nearpod', True)
+    }), kind='batch')
+    
+    return jsonify({
+        'batch_id': batch_id,
+        'job_id': job_id,
+        'files': len(sources),
+        'status_url': url_for('lessons.job_status', job_id=job_id)
+    }), 202
+
+@lessons_bp.route('/batch/<batch_id>')
+def batch_summary(batch_id):
+    """Get the summary report of a batch"""
+    from src.services.batch_generator import SUMMARY_FILENAME
+    
+    summary_file = os.path.join(get_services().batch_output_folder, secure_filename(batch_id), SUMMARY_FILENAME)
+    
+    if not os.path.exists(summary_file):
+        return jsonify({'error': 'Batch summary not found'}), 404
+    
+    with open(summary_file, 'r', encoding='utf-8') as f:
+        return jsonify(json.load(f))
+
+@lessons_bp.route('/cache/stats')
+def cache_stats():
+    """Get extraction cache statistics"""
+    return jsonify(get_services().extraction_cache.stats())
+
 @lessons_bp.route('/download')
 def download_lesson():
     """Download generated files"""
     pptx_file = request.args.get('pptx_file')
+    name = request.args.get('name')
     activities_param = request.args.get('activities', '')
     
     activities = []
@@ -177,16 +380,38 @@ def download_lesson():
     return render_template(
         'lessons/download.html',
         pptx_file=pptx_file,
-        activities=activities
+        activities=activities,
+        name=name
     )
 
 @lessons_bp.route('/download/<path:filename>')
 def download_file(filename):
     """Download a file"""
-    directory = OUTPUT_FOLDER
+    # Generated artifacts never change under their name, so clients can
+    # revalidate them by ETag (the artifact key) and cache them for long
+    services = get_services()
+    artifact_path = services.artifact_store.get(filename)
+    if artifact_path is not None:
+        download_name = filename
+        name = os.path.basename(request.args.get('name', ''))
+        if name:
+            prefix, _, _ = filename.rpartition('_')
+            download_name = f"{prefix}_{name}" if prefix else name
+            download_name += os.path.splitext(filename)[1]
+        
+        return send_file(
+            artifact_path,
+            as_attachment=True,
+            download_name=download_name,
+            etag=os.path.splitext(filename)[0],
+            conditional=True,
+            max_age=365 * 24 * 3600
+        )
+    
+    directory = services.output_folder
     
     # Check if file is an activity
-    if filename.startswith('kahoot_') or filename.startswith('nearpod_'):
-        directory = ACTIVITIES_FOLDER
+    if filename.startswith(('kahoot_', 'nearpod_', 'qti_')):
+        directory = services.activities_folder
     
     return send_from_directory(directory, filename, as_attachment=True)
@@ -0,0 +1,120 @@
+import re
+import threading
+from typing import Dict, Any, Tuple
+
+# Kinds of lines returned by LineClassifier.classify
+LINE_HEADING = "heading"
+LINE_BULLET = "bullet"
+LINE_TEXT = "text"
+
+# Classification rules per language. "numbered_heading" must define a group
+# named "number" holding the section number; "bullet" matches the start of
+# a bullet point (markers and enumerations). The length limits apply to
+# headings ending with a colon, all-uppercase headings, and to the level
+# of unnumbered headings.
+LINE_RULES: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "numbered_heading": r"(?P<number>\d+)[\.\)]",
+        "bullet": r"[•\-*]|[a-zA-Z0-9][\.\)]",
+        "colon_heading_max_length": 100,
+        "upper_heading_max_length": 50,
+        "short_heading_max_length": 30
+    }
+}
+
+# Arabic: adds the bullet markers common in Arabic textbooks, Arabic letter
+# enumerations ("أ)", "ب-") and dash-terminated numbers ("١- ...", "1- ...")
+LINE_RULES["ar"] = dict(
+    LINE_RULES["default"],
+    bullet=r"[•\-*▪◦●○■□◆➢–]|[a-zA-Z0-9][\.\)]|[ء-ي][\.\)\-]|\d+\s*-"
+)
+
+
+def register_line_rules(language: str, base: str = "default", **rules):
+    """
+    Add or replace the classification rules of a language
+
+    Args:
+        language: Language code the rules apply to
+        base: Language whose rules are used for the settings not given
+        **rules: Rule settings overriding the base rules
+    """
+    LINE_RULES[language] = dict(LINE_RULES[base], **rules)
+
+    with LineClassifier._classifiers_lock:
+        LineClassifier._classifiers.pop(language, None)
+
+
+class LineClassifier:
+    """
+    Single-pass classifier of text lines into headings, bullet points and text
+
+    The numbered-heading and bullet rules of a language are compiled into
+    one anchored pattern, so each line is matched once; the remaining
+    heading rules only look at the line's length, last character and case.
+    """
+
+    # Shared classifiers, one per language
+    _classifiers = {}
+    _classifiers_lock = threading.Lock()
+
+    def __init__(self, language: str = "default"):
+        """
+        Initialize the line classifier
+
+        Args:
+            language: Language whose rules are used (see LINE_RULES)
+        """
+        rules = LINE_RULES[language]
+
+        self.language = language
+        self.colon_heading_max_length = rules["colon_heading_max_length"]
+        self.upper_heading_max_length = rules["upper_heading_max_length"]
+        self.short_heading_max_length = rules["short_heading_max_length"]
+        self._pattern = re.compile(
+            f"(?:{rules['numbered_heading']})|(?P<bullet>{rules['bullet']})"
+        )
+
+    @classmethod
+    def for_language(cls, language: str = "default") -> "LineClassifier":
+        """
+        Get the shared classifier of a language
+
+        Args:
+            language: Language whose rules are used (see LINE_RULES)
+
+        Returns:
+            Line classifier
+        """
+        with cls._classifiers_lock:
+            if language not in cls._classifiers:
+                cls._classifiers[language] = cls(language)
+            return cls._classifiers[language]
+
+    def classify(self, line: str) -> Tuple[str, int]:
+        """
+        Classify a stripped, non-empty line
+
+        Args:
+            line: Line of text
+
+        Returns:
+            Tuple of the line kind (LINE_HEADING, LINE_BULLET or LINE_TEXT)
+            and the heading level (0 for other kinds)
+        """
+        match = self._pattern.match(line)
+
+        # Numbered headings: level based on the section number
+        if match is not None and match.group("number") is not None:
+            return LINE_HEADING, 2 if int(match.group("number")) < 10 else 3
+
+        # Short lines ending with a colon, and short all-uppercase lines
+        length = len(line)
+        if (length < self.colon_heading_max_length and line[-1] == ':') or \
+                (length < self.upper_heading_max_length and line.isupper()):
+            return LINE_HEADING, 1 if length < self.short_heading_max_length else 2
+
+        if match is not None:
+            return LINE_BULLET, 0
+
+        return LINE_TEXT, 0
@@ -1,10 +1,18 @@
 import os
 import json
-from flask import Flask, session, redirect, url_for
+from flask import Flask, Response, session, redirect, url_for, abort
+from src.services.metrics import REGISTRY
+from src.services.upload_ingest import StreamingUploadRequest
+from src.services.lesson_services import init_lesson_services
 
 def create_app():
     app = Flask(__name__)
-    app.secret_key = os.urandom(24)
+    # A fixed key keeps flash messages and sessions valid across workers and
+    # restarts; the random fallback only suits a single process
+    app.secret_key = os.environ.get('SECRET_KEY') or os.urandom(24)
+    
+    # Stream uploads straight into the upload folder
+    app.request_class = StreamingUploadRequest
     
     # Configure upload folder
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
@@ -12,11 +20,64 @@ def create_app():
     app.config['OUTPUT_FOLDER'] = os.path.join(app.root_path, 'static', 'output')
     app.config['ACTIVITIES_FOLDER'] = os.path.join(app.root_path, 'static', 'activities')
     
-    # Ensure folders exist
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-    os.makedirs(app.config['TEMPLATES_FOLDER'], exist_ok=True)
-    os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
-    os.makedirs(app.config['ACTIVITIES_FOLDER'], exist_ok=True)
+    # Upload limits: whole request, and each uploaded file
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 100 * 1024 * 1024))
+    app.config['UPLOAD_MAX_FILE_BYTES'] = int(os.environ.get('UPLOAD_MAX_FILE_BYTES', 100 * 1024 * 1024))
+    
+    # Configure background jobs
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+    app.config['JOB_MAX_JOBS_PER_WORKER'] = int(os.environ.get('JOB_MAX_JOBS_PER_WORKER', 0))
+    
+    # Configure parallel PDF extraction (0 or 1 worker extracts sequentially)
+    app.config['PDF_PARALLEL_WORKERS'] = int(os.environ.get('PDF_PARALLEL_WORKERS', 0))
+    app.config['PDF_PARALLEL_MIN_PAGES'] = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 50))
+    
+    # Configure OCR for image uploads and scanned PDF pages
+    app.config['OCR_MAX_WORKERS'] = int(os.environ.get('OCR_MAX_WORKERS', 2))
+    app.config['OCR_LANG'] = os.environ.get('OCR_LANG', 'ara+eng')
+    app.config['OCR_DPI'] = int(os.environ.get('OCR_DPI', 200))
+    app.config['OCR_MAX_DIMENSION'] = int(os.environ.get('OCR_MAX_DIMENSION', 2500))
+    app.config['OCR_BINARIZE'] = os.environ.get('OCR_BINARIZE', '1') == '1'
+    
+    # Language of the heading/bullet detection rules ("default" or "ar")
+    app.config['STRUCTURE_LANGUAGE'] = os.environ.get('STRUCTURE_LANGUAGE', 'default')
+    
+    # Detect PDF headings from font sizes, bold text and position as well
+    app.config['LAYOUT_ANALYSIS'] = os.environ.get('LAYOUT_ANALYSIS', '0') == '1'
+    
+    # Configure batch generation (server-side folders the batch API may read)
+    app.config['BATCH_INPUT_FOLDER'] = os.environ.get('BATCH_INPUT_FOLDER', os.path.join(app.root_path, 'static', 'curricula'))
+    app.config['BATCH_WORKERS'] = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+    
+    # Configure extraction cache
+    app.config['EXTRACTION_CACHE_FOLDER'] = os.path.join(app.root_path, 'static', 'cache', 'extraction')
+    app.config['EXTRACTION_CACHE_MAX_BYTES'] = int(os.environ.get('EXTRACTION_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    
+    # Prometheus-style metrics on /metrics (recording is off by default).
+    # With several web workers, /metrics only reports the worker serving it
+    # unless they share a directory to add up their values
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '0') == '1'
+    app.config['METRICS_MULTIPROCESS_DIR'] = os.environ.get('METRICS_MULTIPROCESS_DIR') or None
+    REGISTRY.enable(app.config['METRICS_ENABLED'], app.config['METRICS_MULTIPROCESS_DIR'])
+    
+    # Lesson sessions: seconds before an unused session (and the files only
+    # it uses) is deleted, number of sessions kept in memory, and minimum
+    # seconds between two cleanups
+    app.config['SESSION_TTL'] = int(os.environ.get('SESSION_TTL', 7 * 24 * 3600))
+    app.config['SESSION_CACHE_SIZE'] = int(os.environ.get('SESSION_CACHE_SIZE', 32))
+    app.config['SESSION_CLEANUP_INTERVAL'] = int(os.environ.get('SESSION_CLEANUP_INTERVAL', 3600))
+    
+    # Maximum total size of the stored presentations and activities
+    app.config['ARTIFACTS_MAX_BYTES'] = int(os.environ.get('ARTIFACTS_MAX_BYTES', 1024 * 1024 * 1024))
+    
+    # Import the PDF, OCR and presentation libraries and parse templates
+    # before serving (for servers forking workers from a preloaded app)
+    app.config['PRELOAD_SERVICES'] = os.environ.get('PRELOAD_SERVICES', '0') == '1'
+    
+    # Register the lesson services (created on first use) and their folders
+    services = init_lesson_services(app)
+    if app.config['PRELOAD_SERVICES']:
+        services.warm_up()
     
     # Import blueprints
     from src.routes.lessons import lessons_bp
@@ -29,8 +90,21 @@ def create_app():
     def index():
         return redirect(url_for('lessons.index'))
     
+    # Metrics of this process (or of every worker sharing
+    # METRICS_MULTIPROCESS_DIR), including the jobs run in the background
+    @app.route('/metrics')
+    def metrics():
+        if not app.config['METRICS_ENABLED']:
+            abort(404)
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+    
     return app
 
 if __name__ == '__main__':
+    # Development server only; production runs wsgi.py under gunicorn
     app = create_app()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(
+        debug=os.environ.get('FLASK_DEBUG', '0') == '1',
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', 5000))
+    )
@@ -0,0 +1,675 @@
+import os
+import copy
+import json
+import time
+import uuid
+import fcntl
+import atexit
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Any, Tuple, Iterator, Optional
+
+# Default histogram buckets (seconds), from per-page work up to whole jobs
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Returned by timers while metrics are disabled
+_NULL_CONTEXT = nullcontext()
+
+# Minimum seconds between two snapshots written by a web worker to the
+# multiprocess directory outside of a scrape
+SNAPSHOT_INTERVAL = 5.0
+
+# Files of the multiprocess directory holding the totals of exited workers,
+# and locking the directory while snapshots are combined
+MERGED_SNAPSHOT = "merged.json"
+SNAPSHOT_LOCK = ".lock"
+
+
+class _Metric:
+    """
+    Base class of the metrics kept by a MetricsRegistry
+
+    Every recording method returns right away while the registry is
+    disabled, so instrumented code costs one attribute check per call.
+    """
+
+    kind = None
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Tuple[str, ...]):
+        """
+        Initialize the metric
+
+        Args:
+            registry: Registry the metric belongs to
+            name: Metric name
+            documentation: Help text of the metric
+            labelnames: Names of the labels of the metric
+        """
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        """
+        Get the series key of a set of label values
+
+        Args:
+            labels: Label values by label name
+
+        Returns:
+            Tuple of label values in label order
+        """
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def snapshot(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        """
+        Get the current values of every series
+
+        Returns:
+            List of (label values, value) tuples
+        """
+        with self._lock:
+            return [(key, self._copy(value)) for key, value in self._values.items()]
+
+    def _copy(self, value: Any) -> Any:
+        return value
+
+    def _empty_copy(self, registry: "MetricsRegistry") -> "_Metric":
+        """
+        Get a metric with the same definition and no values
+
+        Args:
+            registry: Registry of the copy
+
+        Returns:
+            Empty metric
+        """
+        metric = copy.copy(self)
+        metric.registry = registry
+        metric._values = {}
+        metric._lock = threading.Lock()
+        return metric
+
+    def reset(self):
+        """
+        Forget every recorded value
+        """
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count (pages, images, cache hits, ...)
+    """
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        Increase the counter
+
+        Args:
+            amount: Amount to add
+            **labels: Label values
+        """
+        if not self.registry.enabled:
+            return
+
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, key: Tuple[str, ...], value: float):
+        """
+        Add a value recorded by another process
+
+        Args:
+            key: Label values
+            value: Counter value
+        """
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down (requests and jobs in flight)
+
+    Gauges describe the current process only; they are not merged from
+    job worker processes. With a multiprocess directory, the gauges of the
+    live web workers are added up when rendering.
+    """
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        Increase the gauge
+
+        Args:
+            amount: Amount to add
+            **labels: Label values
+        """
+        if not self.registry.enabled:
+            return
+
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        """
+        Decrease the gauge
+
+        Args:
+            amount: Amount to subtract
+            **labels: Label values
+        """
+        self.inc(-amount, **labels)
+
+    def track_in_progress(self, **labels):
+        """
+        Count a block of code as in progress while it runs
+
+        Args:
+            **labels: Label values
+
+        Returns:
+            Context manager
+        """
+        if not self.registry.enabled:
+            return _NULL_CONTEXT
+        return self._track(labels)
+
+    @contextmanager
+    def _track(self, labels: Dict[str, Any]) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def merge(self, key: Tuple[str, ...], value: float):
+        """
+        Ignore values recorded by another process
+
+        Args:
+            key: Label values
+            value: Gauge value
+        """
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values (stage durations)
+    """
+
+    kind = "histogram"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize the histogram
+
+        Args:
+            registry: Registry the metric belongs to
+            name: Metric name
+            documentation: Help text of the metric
+            labelnames: Names of the labels of the metric
+            buckets: Upper bounds of the buckets, in increasing order
+        """
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        """
+        Record an observation
+
+        Args:
+            value: Observed value
+            **labels: Label values
+        """
+        if not self.registry.enabled:
+            return
+
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, the last one being +Inf
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def time(self, **labels):
+        """
+        Observe the duration of a block of code
+
+        Args:
+            **labels: Label values
+
+        Returns:
+            Context manager
+        """
+        if not self.registry.enabled:
+            return _NULL_CONTEXT
+        return self._time(labels)
+
+    @contextmanager
+    def _time(self, labels: Dict[str, Any]) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _copy(self, value: Any) -> Any:
+        return [list(value[0]), value[1]]
+
+    def merge(self, key: Tuple[str, ...], value: Any):
+        """
+        Add observations recorded by another process
+
+        Args:
+            key: Label values
+            value: Bucket counts and sum
+        """
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                self._values[key] = self._copy(value)
+                return
+            series[0] = [count + other for count, other in zip(series[0], value[0])]
+            series[1] += value[1]
+
+
+class MetricsRegistry:
+    """
+    Registry of Prometheus-style metrics
+
+    Disabled by default; enable() turns recording on. Job worker processes
+    record into their own copy of the registry and send a snapshot back,
+    which the web process merges (see JobQueue).
+
+    Each web worker of a multi-worker server (gunicorn) has its own
+    registry. Without a multiprocess directory, render() only reports the
+    worker that serves the scrape. With one, every worker writes its
+    snapshot there (at most every SNAPSHOT_INTERVAL seconds, on every
+    scrape and at exit) and render() adds up the snapshots of all workers,
+    including workers that have been recycled since the directory was
+    cleared.
+    """
+
+    def __init__(self):
+        """
+        Initialize the registry
+        """
+        self.enabled = False
+        self.multiprocess_dir = None
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._snapshot_path = None
+        self._snapshot_pid = None
+        self._snapshot_written_at = 0.0
+
+    def enable(self, enabled: bool = True, multiprocess_dir: str = None):
+        """
+        Turn recording on or off
+
+        Args:
+            enabled: Whether metrics are recorded
+            multiprocess_dir: Directory shared by the web workers of the
+                server, to report their totals instead of one worker's
+        """
+        self.enabled = enabled
+        self.multiprocess_dir = multiprocess_dir if enabled else None
+
+        if self.multiprocess_dir:
+            os.makedirs(self.multiprocess_dir, exist_ok=True)
+            atexit.register(self.write_snapshot)
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        """
+        Get or create a counter
+
+        Args:
+            name: Metric name
+            documentation: Help text of the metric
+            labelnames: Names of the labels of the metric
+
+        Returns:
+            Counter
+        """
+        return self._register(Counter(self, name, documentation, tuple(labelnames)))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        """
+        Get or create a gauge
+
+        Args:
+            name: Metric name
+            documentation: Help text of the metric
+            labelnames: Names of the labels of the metric
+
+        Returns:
+            Gauge
+        """
+        return self._register(Gauge(self, name, documentation, tuple(labelnames)))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Get or create a histogram
+
+        Args:
+            name: Metric name
+            documentation: Help text of the metric
+            labelnames: Names of the labels of the metric
+            buckets: Upper bounds of the buckets, in increasing order
+
+        Returns:
+            Histogram
+        """
+        return self._register(Histogram(self, name, documentation, tuple(labelnames), buckets))
+
+    def snapshot(self) -> Dict[str, List[Tuple[Tuple[str, ...], Any]]]:
+        """
+        Get the values of every metric in a picklable form
+
+        Returns:
+            Dictionary mapping metric name to its series
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics if metric.kind != "gauge"}
+
+    def merge(self, snapshot: Dict[str, List[Tuple[Tuple[str, ...], Any]]]):
+        """
+        Add the values recorded by another process
+
+        Args:
+            snapshot: Snapshot taken in the other process
+        """
+        for name, series in snapshot.items():
+            metric = self._metrics.get(name)
+            if metric is None:
+                continue
+            for key, value in series:
+                metric.merge(tuple(key), value)
+
+    def reset(self):
+        """
+        Forget every recorded value (e.g. values inherited by a forked worker)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def write_snapshot(self, min_interval: float = 0.0):
+        """
+        Write the values of this process to the multiprocess directory
+
+        Does nothing without a multiprocess directory.
+
+        Args:
+            min_interval: Seconds to wait after the previous snapshot before
+                writing a new one
+        """
+        if not (self.enabled and self.multiprocess_dir):
+            return
+
+        now = time.monotonic()
+        pid = os.getpid()
+        if pid == self._snapshot_pid and now - self._snapshot_written_at < min_interval:
+            return
+
+        if pid != self._snapshot_pid:
+            # One file per process; the random suffix keeps a recycled
+            # worker's totals when its pid is reused
+            self._snapshot_pid = pid
+            self._snapshot_path = os.path.join(self.multiprocess_dir, f"{pid}-{uuid.uuid4().hex[:8]}.json")
+        self._snapshot_written_at = now
+
+        with self._lock:
+            gauges = [metric for metric in self._metrics.values() if metric.kind == "gauge"]
+        document = {
+            "pid": pid,
+            "metrics": self.snapshot(),
+            "gauges": {gauge.name: gauge.snapshot() for gauge in gauges}
+        }
+
+        _write_snapshot(self._snapshot_path, document)
+
+    def _empty_copy(self) -> "MetricsRegistry":
+        """
+        Get a registry with the same metrics and no values
+
+        Returns:
+            Empty registry
+        """
+        registry = MetricsRegistry()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            registry._register(metric._empty_copy(registry))
+        return registry
+
+    def _combine(self) -> "MetricsRegistry":
+        """
+        Add up the snapshots of the multiprocess directory
+
+        The snapshots of exited workers are folded into a single merged
+        snapshot and deleted, so the directory does not grow as workers are
+        recycled. The directory is locked meanwhile, so concurrent scrapes
+        never count an exited worker twice.
+
+        Returns:
+            Registry holding the totals of every web worker
+        """
+        combined = self._empty_copy()
+        merged = self._empty_copy()
+        merged_path = os.path.join(self.multiprocess_dir, MERGED_SNAPSHOT)
+        exited_paths = []
+
+        with open(os.path.join(self.multiprocess_dir, SNAPSHOT_LOCK), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            for filename in os.listdir(self.multiprocess_dir):
+                path = os.path.join(self.multiprocess_dir, filename)
+
+                if filename.endswith(".tmp"):
+                    # Left behind by a worker killed while writing
+                    try:
+                        if os.stat(path).st_mtime < time.time() - 60:
+                            os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+
+                if not filename.endswith(".json"):
+                    continue
+                document = _read_snapshot(path)
+                if document is None:
+                    continue
+
+                if filename == MERGED_SNAPSHOT:
+                    merged.merge(document["metrics"])
+                    continue
+
+                if not process_alive(document["pid"]):
+                    merged.merge(document["metrics"])
+                    exited_paths.append(path)
+                    continue
+
+                combined.merge(document["metrics"])
+
+                # Requests and jobs in flight only exist in live workers
+                for name, series in document["gauges"].items():
+                    gauge = combined._metrics.get(name)
+                    if gauge is None:
+                        continue
+                    for key, value in series:
+                        key = tuple(key)
+                        gauge._values[key] = gauge._values.get(key, 0) + value
+
+            if exited_paths:
+                _write_snapshot(merged_path, {"pid": None, "metrics": merged.snapshot(), "gauges": {}})
+                for path in exited_paths:
+                    os.remove(path)
+
+        combined.merge(merged.snapshot())
+        return combined
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format
+
+        With a multiprocess directory, the totals of every web worker are
+        rendered; otherwise only the values of this process.
+
+        Returns:
+            Exposition text
+        """
+        if self.multiprocess_dir:
+            self.write_snapshot()
+            return self._combine()._render()
+        return self._render()
+
+    def _render(self) -> str:
+        lines = []
+
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+            for key, value in sorted(metric.snapshot()):
+                labels = [f'{name}="{_escape(label)}"' for name, label in zip(metric.labelnames, key)]
+
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), value[0]):
+                    cumulative += count
+                    bucket_labels = labels + [f'le="{"+Inf" if bound == float("inf") else _format_value(bound)}"']
+                    lines.append(f"{metric.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(value[1])}")
+                lines.append(f"{metric.name}_count{_format_labels(labels)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(path: str, document: Dict[str, Any]):
+    # Write to a private file first so readers never see a partial snapshot
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as snapshot_file:
+        json.dump(document, snapshot_file)
+    os.replace(tmp_path, path)
+
+
+def process_alive(pid: int) -> bool:
+    """
+    Check whether a process of this host is still running
+
+    Args:
+        pid: Process ID
+
+    Returns:
+        False if no process has that ID
+    """
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: List[str]) -> str:
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Process-wide registry and the metrics recorded by the services
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "lesson_stage_seconds",
+    "Time spent in each processing stage",
+    ("stage",)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "lesson_request_seconds",
+    "Time spent handling lessons requests",
+    ("endpoint", "method")
+)
+PAGES_TOTAL = REGISTRY.counter(
+    "lesson_pages_total",
+    "PDF pages extracted",
+    ("source",)
+)
+IMAGES_TOTAL = REGISTRY.counter(
+    "lesson_images_total",
+    "Unique images extracted from documents"
+)
+SLIDES_TOTAL = REGISTRY.counter(
+    "lesson_slides_total",
+    "Slides generated"
+)
+ACTIVITIES_TOTAL = REGISTRY.counter(
+    "lesson_activities_total",
+    "Activity files generated",
+    ("type",)
+)
+CACHE_REQUESTS_TOTAL = REGISTRY.counter(
+    "lesson_extraction_cache_requests_total",
+    "Extraction cache lookups",
+    ("result",)
+)
+JOBS_TOTAL = REGISTRY.counter(
+    "lesson_jobs_total",
+    "Background jobs run",
+    ("kind", "status")
+)
+REQUESTS_IN_PROGRESS = REGISTRY.gauge(
+    "lesson_requests_in_progress",
+    "Lessons requests being handled",
+    ("endpoint",)
+)
+JOBS_IN_PROGRESS = REGISTRY.gauge(
+    "lesson_jobs_in_progress",
+    "Background jobs submitted and not finished yet",
+    ("kind",)
+)
@@ -1,25 +1,84 @@
 import os
+import json
+import math
+import hashlib
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
-from typing import Dict, List, Any, Optional
+from functools import partial
+from typing import Dict, List, Any, Optional, Callable, Tuple
+from src.services.template_registry import TemplateRegistry
+from src.services.thumbnail_cache import ThumbnailCache
+from src.services.metrics import STAGE_SECONDS, SLIDES_TOTAL
+
+# Version of the slide rendering; bump it whenever rendering a slide plan
+# produces different presentations so that stored renderings are rebuilt
+GENERATOR_VERSION = "1"
+
+# Image slides: number of images laid out in a grid on one slide, and
+# maximum number of image slides in a presentation
+IMAGES_PER_SLIDE = 4
+MAX_IMAGE_SLIDES = 6
+
+# Area below the title of an image slide (left, top, width, height) and the
+# gap between grid cells, in inches
+IMAGE_AREA = (0.5, 1.75, 9.0, 5.25)
+IMAGE_GAP = 0.2
+
+# Default colors for different templates (built once per process, so a
+# preloaded app shares them with its forked workers)
+COLOR_SCHEMES = {
+    "default": {
+        "title": RGBColor(89, 49, 150),  # Purple
+        "heading": RGBColor(0, 112, 192),  # Blue
+        "subheading": RGBColor(0, 176, 80),  # Green
+        "text": RGBColor(0, 0, 0),  # Black
+        "background": RGBColor(255, 255, 255),  # White
+        "accent": RGBColor(255, 192, 0)  # Yellow
+    },
+    "colorful": {
+        "title": RGBColor(192, 0, 0),  # Red
+        "heading": RGBColor(0, 112, 192),  # Blue
+        "subheading": RGBColor(112, 48, 160),  # Purple
+        "text": RGBColor(0, 0, 0),  # Black
+        "background": RGBColor(255, 255, 255),  # White
+        "accent": RGBColor(255, 192, 0)  # Yellow
+    },
+    "minimal": {
+        "title": RGBColor(0, 0, 0),  # Black
+        "heading": RGBColor(68, 68, 68),  # Dark Gray
+        "subheading": RGBColor(102, 102, 102),  # Gray
+        "text": RGBColor(0, 0, 0),  # Black
+        "background": RGBColor(255, 255, 255),  # White
+        "accent": RGBColor(0, 112, 192)  # Blue
+    }
+}
+
 
 class PPTXGenerator:
     """
     Service for generating PowerPoint presentations from extracted content
     """
     
-    def __init__(self, templates_folder: str, output_folder: str):
+    def __init__(self, templates_folder: str, output_folder: str,
+                 template_registry: Optional[TemplateRegistry] = None,
+                 thumbnail_cache: Optional[ThumbnailCache] = None):
         """
         Initialize the PPTX generator
         
         Args:
             templates_folder: Path to the folder containing presentation templates
             output_folder: Path to the folder where generated presentations will be saved
+            template_registry: Registry providing parsed templates (defaults to
+                the shared registry of the templates folder)
+            thumbnail_cache: Cache of the image thumbnails placed on slides
+                (defaults to in-memory thumbnails)
         """
         self.templates_folder = templates_folder
         self.output_folder = output_folder
+        self.template_registry = template_registry or TemplateRegistry.for_folder(templates_folder)
+        self.thumbnail_cache = thumbnail_cache or ThumbnailCache()
         
         # Ensure folders exist
         if not os.path.exists(templates_folder):
@@ -28,35 +87,11 @@ class PPTXGenerator:
             os.makedirs(output_folder)
         
         # Default colors for different templates
-        self.color_schemes = {
-            "default": {
-                "title": RGBColor(89, 49, 150),  # Purple
-                "heading": RGBColor(0, 112, 192),  # Blue
-                "subheading": RGBColor(0, 176, 80),  # Green
-                "text": RGBColor(0, 0, 0),  # Black
-                "background": RGBColor(255, 255, 255),  # White
-                "accent": RGBColor(255, 192, 0)  # Yellow
-            },
-            "colorful": {
-                "title": RGBColor(192, 0, 0),  # Red
-                "heading": RGBColor(0, 112, 192),  # Blue
-                "subheading": RGBColor(112, 48, 160),  # Purple
-                "text": RGBColor(0, 0, 0),  # Black
-                "background": RGBColor(255, 255, 255),  # White
-                "accent": RGBColor(255, 192, 0)  # Yellow
-            },
-            "minimal": {
-                "title": RGBColor(0, 0, 0),  # Black
-                "heading": RGBColor(68, 68, 68),  # Dark Gray
-                "subheading": RGBColor(102, 102, 102),  # Gray
-                "text": RGBColor(0, 0, 0),  # Black
-                "background": RGBColor(255, 255, 255),  # White
-                "accent": RGBColor(0, 112, 192)  # Blue
-            }
-        }
+        self.color_schemes = dict(COLOR_SCHEMES)
     
     def generate_presentation(self, content: Dict[str, Any], template_name: str = "default", 
-                             color_scheme: str = "default", output_filename: str = None) -> str:
+                             color_scheme: str = "default", output_filename: str = None,
+                             progress_callback: Optional[Callable[[int, int], None]] = None) -> str:
         """
         Generate a PowerPoint presentation from extracted content
         
@@ -65,18 +100,176 @@ class PPTXGenerator:
             template_name: Name of the template to use
             color_scheme: Name of the color scheme to use
             output_filename: Name of the output file (without extension)
+            progress_callback: Optional callable receiving (slides done, total slides)
             
         Returns:
             Path to the generated presentation
         """
-        # Determine template path
-        template_path = os.path.join(self.templates_folder, f"{template_name}.pptx")
+        # Determine output filename
+        if output_filename is None:
+            output_filename = f"presentation_{os.path.basename(content.get('title', 'untitled'))}"
         
-        # If template doesn't exist, use a blank presentation
-        if not os.path.exists(template_path):
-            prs = Presentation()
-        else:
-            prs = Presentation(template_path)
+        # Images extracted without an image store are handed over in memory
+        image_data = {
+            image["image_id"]: image["data"]
+            for image in content.get("images", [])
+            if image.get("data") is not None
+        }
+        
+        return self.render_slide_plan(
+            self.build_slide_plan(content),
+            template_name=template_name,
+            color_scheme=color_scheme,
+            output_filename=output_filename,
+            progress_callback=progress_callback,
+            image_data=image_data
+        )
+    
+    def build_slide_plan(self, content: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Decide the slides and their texts from the content
+        
+        The plan depends only on the content, so it can be computed once per
+        session and rendered again with any template and color scheme.
+        
+        Args:
+            content: Dictionary containing extracted content
+            
+        Returns:
+            List of JSON-serializable slide descriptions, in slide order
+        """
+        plan = []
+        structure = content.get("structure", {})
+        
+        # Title slide
+        title = content.get("title", "Untitled Presentation")
+        if structure.get("title"):
+            title = structure["title"]
+        
+        plan.append({
+            "layout": "title",
+            "title": title,
+            "subtitle": "Interactive Lesson"
+        })
+        
+        # Slides for headings
+        if "headings" in structure:
+            paragraphs_by_section = self._group_paragraphs_by_section(content)
+            
+            for section_id, heading in enumerate(structure["headings"]):
+                # Find paragraphs related to this heading
+                if paragraphs_by_section is not None:
+                    # Limit to first 2 paragraphs to avoid overcrowding the slide
+                    related_paragraphs = paragraphs_by_section.get(section_id, [])[:2]
+                else:
+                    related_paragraphs = self._find_related_paragraphs(content, heading)
+                
+                plan.append({
+                    "layout": "heading",
+                    "title": heading["text"],
+                    "paragraphs": related_paragraphs
+                })
+        
+        # Slides for bullet points
+        if "bullet_points" in structure:
+            for bullet_list in structure["bullet_points"]:
+                plan.append({
+                    "layout": "bullets",
+                    "title": "النقاط الرئيسية",  # "Key Points" in Arabic
+                    "points": list(bullet_list)
+                })
+        
+        # Slides for images, several per slide; stored images are referred
+        # to by path, in-memory images by ID
+        slide_images = [
+            {
+                "source": image.get("path") or image["image_id"],
+                "hash": image.get("hash")
+            }
+            for image in content.get("images", [])
+            if image.get("path") or "data" in image
+        ][:IMAGES_PER_SLIDE * MAX_IMAGE_SLIDES]
+        
+        for start in range(0, len(slide_images), IMAGES_PER_SLIDE):
+            plan.append({
+                "layout": "images",
+                "title": "الصور التوضيحية",  # "Illustrations" in Arabic
+                "images": slide_images[start:start + IMAGES_PER_SLIDE]
+            })
+        
+        # Activity slide
+        plan.append({
+            "layout": "activity",
+            "title": "نشاط تفاعلي",  # "Interactive Activity" in Arabic
+            "instructions": "أكمل النشاط التالي:",  # "Complete the following activity:" in Arabic
+            "steps": [
+                "اقرأ النص بعناية",  # "Read the text carefully" in Arabic
+                "حدد المفاهيم الرئيسية",  # "Identify the main concepts" in Arabic
+                "أجب عن الأسئلة",  # "Answer the questions" in Arabic
+                "ناقش إجاباتك مع زملائك"  # "Discuss your answers with your classmates" in Arabic
+            ]
+        })
+        
+        # Summary slide
+        plan.append({
+            "layout": "summary",
+            "title": "ملخص الدرس",  # "Lesson Summary" in Arabic
+            "points": self._generate_summary_points(content)
+        })
+        
+        return plan
+    
+    def render_key(self, slide_plan: List[Dict[str, Any]], template_name: str, color_scheme: str) -> str:
+        """
+        Compute a key identifying the rendering of a slide plan
+        
+        Two renderings with the same key produce the same presentation, so
+        the key can be used to reuse an earlier rendering.
+        
+        Args:
+            slide_plan: Slide plan from build_slide_plan
+            template_name: Name of the template to use
+            color_scheme: Name of the color scheme to use
+            
+        Returns:
+            Hexadecimal key
+        """
+        if color_scheme not in self.color_schemes:
+            color_scheme = "default"
+        
+        digest = hashlib.sha256()
+        digest.update(json.dumps(slide_plan, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+        digest.update(json.dumps([
+            GENERATOR_VERSION,
+            template_name,
+            self.template_registry.signature(template_name),
+            color_scheme,
+            [(key, str(color)) for key, color in sorted(self.color_schemes[color_scheme].items())]
+        ]).encode("utf-8"))
+        
+        return digest.hexdigest()[:24]
+    
+    def render_slide_plan(self, slide_plan: List[Dict[str, Any]], template_name: str = "default",
+                          color_scheme: str = "default", output_filename: str = "presentation",
+                          progress_callback: Optional[Callable[[int, int], None]] = None,
+                          image_data: Optional[Dict[str, bytes]] = None) -> str:
+        """
+        Render a slide plan with a template and color scheme
+        
+        Args:
+            slide_plan: Slide plan from build_slide_plan
+            template_name: Name of the template to use
+            color_scheme: Name of the color scheme to use
+            output_filename: Name of the output file (without extension)
+            progress_callback: Optional callable receiving (slides done, total slides)
+            image_data: Optional bytes of in-memory images, by image ID
+            
+        Returns:
+            Path to the generated presentation
+        """
+        # Build the presentation from the in-memory template copy
+        # (a blank presentation if the template doesn't exist)
+        prs = self.template_registry.get_presentation(template_name)
         
         # Set slide dimensions for standard 4:3 presentation
         prs.slide_width = Inches(10)
@@ -85,36 +278,65 @@ class PPTXGenerator:
         # Get color scheme
         colors = self.color_schemes.get(color_scheme, self.color_schemes["default"])
         
-        # Generate title slide
-        self._add_title_slide(prs, content, colors)
-        
-        # Generate content slides
-        self._add_content_slides(prs, content, colors)
-        
-        # Generate activity slides
-        self._add_activity_slides(prs, content, colors)
+        # Thumbnails of every image of the plan, generated concurrently
+        with STAGE_SECONDS.time(stage="thumbnails"):
+            thumbnails = self.thumbnail_cache.get_many([
+                dict(image, width=cell[2], height=cell[3])
+                for slide_plan_entry in slide_plan if slide_plan_entry["layout"] == "images"
+                for image, cell in zip(slide_plan_entry["images"], self._image_grid(len(slide_plan_entry["images"])))
+            ], image_data)
+        
+        renderers = {
+            "title": self._add_title_slide,
+            "heading": self._add_heading_slide,
+            "bullets": self._add_bullets_slide,
+            "images": partial(self._add_images_slide, thumbnails=thumbnails),
+            "activity": self._add_activity_slide,
+            "summary": self._add_summary_slide
+        }
         
-        # Generate summary slide
-        self._add_summary_slide(prs, content, colors)
+        with STAGE_SECONDS.time(stage="slides"):
+            for slide_plan_entry in slide_plan:
+                renderers[slide_plan_entry["layout"]](prs, slide_plan_entry, colors)
+                
+                # Report progress after every added slide
+                if progress_callback:
+                    progress_callback(len(prs.slides), len(slide_plan))
         
-        # Determine output path
-        if output_filename is None:
-            output_filename = f"presentation_{os.path.basename(content.get('title', 'untitled'))}"
+        SLIDES_TOTAL.inc(len(slide_plan))
         
         output_path = os.path.join(self.output_folder, f"{output_filename}.pptx")
         
         # Save the presentation
-        prs.save(output_path)
+        with STAGE_SECONDS.time(stage="pptx_save"):
+            prs.save(output_path)
         
         return output_path
     
-    def _add_title_slide(self, prs: Presentation, content: Dict[str, Any], colors: Dict[str, RGBColor]):
+    def _add_slide_title(self, slide, text: str, colors: Dict[str, RGBColor]):
+        """
+        Set the right-aligned title of a content slide
+        
+        Args:
+            slide: Slide object
+            text: Title text
+            colors: Dictionary containing color scheme
+        """
+        title_shape = slide.shapes.title
+        title_shape.text = text
+        title_para = title_shape.text_frame.paragraphs[0]
+        title_para.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
+        title_para.font.size = Pt(40)
+        title_para.font.bold = True
+        title_para.font.color.rgb = colors["title"]
+    
+    def _add_title_slide(self, prs: Presentation, slide_plan: Dict[str, Any], colors: Dict[str, RGBColor]):
         """
         Add a title slide to the presentation
         
         Args:
             prs: Presentation object
-            content: Dictionary containing extracted content
+            slide_plan: Slide description
             colors: Dictionary containing color scheme
         """
         # Get title slide layout
@@ -122,12 +344,8 @@ class PPTXGenerator:
         slide = prs.slides.add_slide(slide_layout)
         
         # Set title
-        title = content.get("title", "Untitled Presentation")
-        if "structure" in content and "title" in content["structure"] and content["structure"]["title"]:
-            title = content["structure"]["title"]
-        
         title_shape = slide.shapes.title
-        title_shape.text = title
+        title_shape.text = slide_plan["title"]
         title_para = title_shape.text_frame.paragraphs[0]
         title_para.alignment = PP_ALIGN.CENTER
         title_para.font.size = Pt(44)
@@ -136,132 +354,159 @@ class PPTXGenerator:
         
         # Set subtitle (if available)
         if hasattr(slide, "placeholders") and len(slide.placeholders) > 1:
-            subtitle = "Interactive Lesson"
             subtitle_shape = slide.placeholders[1]
-            subtitle_shape.text = subtitle
+            subtitle_shape.text = slide_plan["subtitle"]
             subtitle_para = subtitle_shape.text_frame.paragraphs[0]
             subtitle_para.alignment = PP_ALIGN.CENTER
             subtitle_para.font.size = Pt(28)
             subtitle_para.font.color.rgb = colors["heading"]
     
-    def _add_content_slides(self, prs: Presentation, content: Dict[str, Any], colors: Dict[str, RGBColor]):
+    def _add_heading_slide(self, prs: Presentation, slide_plan: Dict[str, Any], colors: Dict[str, RGBColor]):
         """
-        Add content slides to the presentation
+        Add a slide for a heading and its paragraphs
         
         Args:
             prs: Presentation object
-            content: Dictionary containing extracted content
+            slide_plan: Slide description
             colors: Dictionary containing color scheme
         """
         # Get content slide layout
         slide_layout = prs.slide_layouts[1]  # Title and content layout
+        slide = prs.slides.add_slide(slide_layout)
         
-        # Add slides for headings
-        if "structure" in content and "headings" in content["structure"]:
-            for heading in content["structure"]["headings"]:
-                slide = prs.slides.add_slide(slide_layout)
-                
-                # Set heading as slide title
-                title_shape = slide.shapes.title
-                title_shape.text = heading["text"]
-                title_para = title_shape.text_frame.paragraphs[0]
-                title_para.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
-                title_para.font.size = Pt(40)
-                title_para.font.bold = True
-                title_para.font.color.rgb = colors["title"]
-                
-                # Find paragraphs related to this heading
-                related_paragraphs = self._find_related_paragraphs(content, heading)
-                
-                # Add paragraphs to slide
-                if related_paragraphs and hasattr(slide, "placeholders") and len(slide.placeholders) > 1:
-                    content_shape = slide.placeholders[1]
-                    text_frame = content_shape.text_frame
-                    text_frame.clear()  # Clear default text
-                    
-                    for paragraph in related_paragraphs:
-                        p = text_frame.add_paragraph()
-                        p.text = paragraph
-                        p.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
-                        p.font.size = Pt(24)
-                        p.font.color.rgb = colors["text"]
-        
-        # Add slides for bullet points
-        if "structure" in content and "bullet_points" in content["structure"]:
-            for bullet_list in content["structure"]["bullet_points"]:
-                slide = prs.slides.add_slide(slide_layout)
-                
-                # Set title
-                title_shape = slide.shapes.title
-                title_shape.text = "النقاط الرئيسية"  # "Key Points" in Arabic
-                title_para = title_shape.text_frame.paragraphs[0]
-                title_para.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
-                title_para.font.size = Pt(40)
-                title_para.font.bold = True
-                title_para.font.color.rgb = colors["title"]
-                
-                # Add bullet points to slide
-                if hasattr(slide, "placeholders") and len(slide.placeholders) > 1:
-                    content_shape = slide.placeholders[1]
-                    text_frame = content_shape.text_frame
-                    text_frame.clear()  # Clear default text
-                    
-                    for bullet_point in bullet_list:
-                        p = text_frame.add_paragraph()
-                        p.text = bullet_point
-                        p.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
-                        p.font.size = Pt(24)
-                        p.level = 0
-                        p.font.color.rgb = colors["text"]
-        
-        # Add slides for images
-        if "images" in content and content["images"]:
-            slide = prs.slides.add_slide(slide_layout)
+        # Set heading as slide title
+        self._add_slide_title(slide, slide_plan["title"], colors)
+        
+        # Add paragraphs to slide
+        if slide_plan["paragraphs"] and hasattr(slide, "placeholders") and len(slide.placeholders) > 1:
+            content_shape = slide.placeholders[1]
+            text_frame = content_shape.text_frame
+            text_frame.clear()  # Clear default text
+            
+            for paragraph in slide_plan["paragraphs"]:
+                p = text_frame.add_paragraph()
+                p.text = paragraph
+                p.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
+                p.font.size = Pt(24)
+                p.font.color.rgb = colors["text"]
+    
+    def _add_bullets_slide(self, prs: Presentation, slide_plan: Dict[str, Any], colors: Dict[str, RGBColor]):
+        """
+        Add a slide for a bullet list
+        
+        Args:
+            prs: Presentation object
+            slide_plan: Slide description
+            colors: Dictionary containing color scheme
+        """
+        # Get content slide layout
+        slide_layout = prs.slide_layouts[1]  # Title and content layout
+        slide = prs.slides.add_slide(slide_layout)
+        
+        # Set title
+        self._add_slide_title(slide, slide_plan["title"], colors)
+        
+        # Add bullet points to slide
+        if hasattr(slide, "placeholders") and len(slide.placeholders) > 1:
+            content_shape = slide.placeholders[1]
+            text_frame = content_shape.text_frame
+            text_frame.clear()  # Clear default text
             
-            # Set title
-            title_shape = slide.shapes.title
-            title_shape.text = "الصور التوضيحية"  # "Illustrations" in Arabic
-            title_para = title_shape.text_frame.paragraphs[0]
-            title_para.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
-            title_para.font.size = Pt(40)
-            title_para.font.bold = True
-            title_para.font.color.rgb = colors["title"]
+            for bullet_point in slide_plan["points"]:
+                p = text_frame.add_paragraph()
+                p.text = bullet_point
+                p.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
+                p.font.size = Pt(24)
+                p.level = 0
+                p.font.color.rgb = colors["text"]
+    
+    def _image_grid(self, count: int) -> List[Tuple[float, float, float, float]]:
+        """
+        Lay out the grid cells of an image slide
+        
+        Args:
+            count: Number of images on the slide
             
-            # Add images to slide
-            # For simplicity, we'll just add the first image
-            if content["images"] and "path" in content["images"][0]:
-                image_path = content["images"][0]["path"]
-                if os.path.exists(image_path):
-                    left = Inches(2)
-                    top = Inches(2)
-                    width = Inches(6)
-                    height = Inches(4)
-                    
-                    slide.shapes.add_picture(image_path, left, top, width, height)
+        Returns:
+            List of (left, top, width, height) cells in inches, right to left
+            and top to bottom (Arabic reading order)
+        """
+        if count == 0:
+            return []
+        
+        area_left, area_top, area_width, area_height = IMAGE_AREA
+        columns = math.ceil(math.sqrt(count))
+        rows = math.ceil(count / columns)
+        cell_width = (area_width - IMAGE_GAP * (columns - 1)) / columns
+        cell_height = (area_height - IMAGE_GAP * (rows - 1)) / rows
+        
+        cells = []
+        for index in range(count):
+            row, column = divmod(index, columns)
+            # The last row is centered when it is not full
+            row_count = min(columns, count - row * columns)
+            row_offset = (columns - row_count) * (cell_width + IMAGE_GAP) / 2
+            cells.append((
+                area_left + row_offset + (row_count - 1 - column) * (cell_width + IMAGE_GAP),
+                area_top + row * (cell_height + IMAGE_GAP),
+                cell_width,
+                cell_height
+            ))
+        
+        return cells
     
-    def _add_activity_slides(self, prs: Presentation, content: Dict[str, Any], colors: Dict[str, RGBColor]):
+    def _add_images_slide(self, prs: Presentation, slide_plan: Dict[str, Any], colors: Dict[str, RGBColor],
+                          thumbnails: Optional[Dict[Tuple[str, float, float], Optional[Dict[str, Any]]]] = None):
         """
-        Add activity slides to the presentation
+        Add a slide showing extracted images in a grid
         
         Args:
             prs: Presentation object
-            content: Dictionary containing extracted content
+            slide_plan: Slide description
             colors: Dictionary containing color scheme
+            thumbnails: Thumbnails from ThumbnailCache.get_many, by (source,
+                cell width, cell height)
         """
-        # Get activity slide layout
+        # Get content slide layout
         slide_layout = prs.slide_layouts[1]  # Title and content layout
+        slide = prs.slides.add_slide(slide_layout)
         
-        # Add a sample activity slide
+        # Set title
+        self._add_slide_title(slide, slide_plan["title"], colors)
+        
+        # Add images to slide, each fitted into its cell
+        for image, (left, top, width, height) in zip(slide_plan["images"], self._image_grid(len(slide_plan["images"]))):
+            thumbnail = (thumbnails or {}).get((image["source"], width, height))
+            if thumbnail is None:
+                continue
+            
+            scale = min(width / thumbnail["width"], height / thumbnail["height"])
+            picture_width = thumbnail["width"] * scale
+            picture_height = thumbnail["height"] * scale
+            
+            slide.shapes.add_picture(
+                thumbnail["image"],
+                Inches(left + (width - picture_width) / 2),
+                Inches(top + (height - picture_height) / 2),
+                Inches(picture_width),
+                Inches(picture_height)
+            )
+    
+    def _add_activity_slide(self, prs: Presentation, slide_plan: Dict[str, Any], colors: Dict[str, RGBColor]):
+        """
+        Add an activity slide to the presentation
+        
+        Args:
+            prs: Presentation object
+            slide_plan: Slide description
+            colors: Dictionary containing color scheme
+        """
+        # Get activity slide layout
+        slide_layout = prs.slide_layouts[1]  # Title and content layout
         slide = prs.slides.add_slide(slide_layout)
         
         # Set title
-        title_shape = slide.shapes.title
-        title_shape.text = "نشاط تفاعلي"  # "Interactive Activity" in Arabic
-        title_para = title_shape.text_frame.paragraphs[0]
-        title_para.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
-        title_para.font.size = Pt(40)
-        title_para.font.bold = True
-        title_para.font.color.rgb = colors["title"]
+        self._add_slide_title(slide, slide_plan["title"], colors)
         
         # Add activity description
         if hasattr(slide, "placeholders") and len(slide.placeholders) > 1:
@@ -270,21 +515,14 @@ class PPTXGenerator:
             text_frame.clear()  # Clear default text
             
             p = text_frame.add_paragraph()
-            p.text = "أكمل النشاط التالي:"  # "Complete the following activity:" in Arabic
+            p.text = slide_plan["instructions"]
             p.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
             p.font.size = Pt(28)
             p.font.italic = True
             p.font.color.rgb = colors["heading"]
             
             # Add activity steps
-            activity_steps = [
-                "اقرأ النص بعناية",  # "Read the text carefully" in Arabic
-                "حدد المفاهيم الرئيسية",  # "Identify the main concepts" in Arabic
-                "أجب عن الأسئلة",  # "Answer the questions" in Arabic
-                "ناقش إجاباتك مع زملائك"  # "Discuss your answers with your classmates" in Arabic
-            ]
-            
-            for step in activity_steps:
+            for step in slide_plan["steps"]:
                 p = text_frame.add_paragraph()
                 p.text = step
                 p.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
@@ -292,13 +530,13 @@ class PPTXGenerator:
                 p.level = 1
                 p.font.color.rgb = colors["text"]
     
-    def _add_summary_slide(self, prs: Presentation, content: Dict[str, Any], colors: Dict[str, RGBColor]):
+    def _add_summary_slide(self, prs: Presentation, slide_plan: Dict[str, Any], colors: Dict[str, RGBColor]):
         """
         Add a summary slide to the presentation
         
         Args:
             prs: Presentation object
-            content: Dictionary containing extracted content
+            slide_plan: Slide description
             colors: Dictionary containing color scheme
         """
         # Get summary slide layout
@@ -306,13 +544,7 @@ class PPTXGenerator:
         slide = prs.slides.add_slide(slide_layout)
         
         # Set title
-        title_shape = slide.shapes.title
-        title_shape.text = "ملخص الدرس"  # "Lesson Summary" in Arabic
-        title_para = title_shape.text_frame.paragraphs[0]
-        title_para.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
-        title_para.font.size = Pt(40)
-        title_para.font.bold = True
-        title_para.font.color.rgb = colors["title"]
+        self._add_slide_title(slide, slide_plan["title"], colors)
         
         # Add summary points
         if hasattr(slide, "placeholders") and len(slide.placeholders) > 1:
@@ -320,10 +552,7 @@ class PPTXGenerator:
             text_frame = content_shape.text_frame
             text_frame.clear()  # Clear default text
             
-            # Extract key points from content
-            summary_points = self._generate_summary_points(content)
-            
-            for point in summary_points:
+            for point in slide_plan["points"]:
                 p = text_frame.add_paragraph()
                 p.text = point
                 p.alignment = PP_ALIGN.RIGHT  # Right-aligned for Arabic
@@ -331,10 +560,37 @@ class PPTXGenerator:
                 p.level = 0
                 p.font.color.rgb = colors["text"]
     
+    def _group_paragraphs_by_section(self, content: Dict[str, Any]) -> Optional[Dict[int, List[str]]]:
+        """
+        Group paragraphs under their parent heading in one pass
+        
+        Args:
+            content: Dictionary containing extracted content
+            
+        Returns:
+            Dictionary mapping heading index to its paragraphs in document
+            order, or None if the content has no section information (content
+            extracted before sections were recorded)
+        """
+        structure = content.get("structure", {})
+        
+        if "paragraph_sections" not in structure:
+            return None
+        
+        paragraphs_by_section = {}
+        
+        for paragraph, section_id in zip(structure.get("paragraphs", []), structure["paragraph_sections"]):
+            if section_id is not None:
+                paragraphs_by_section.setdefault(section_id, []).append(paragraph)
+        
+        return paragraphs_by_section
+    
     def _find_related_paragraphs(self, content: Dict[str, Any], heading: Dict[str, Any]) -> List[str]:
         """
         Find paragraphs related to a heading
         
+        Text-matching fallback for content without section information.
+        
         Args:
             content: Dictionary containing extracted content
             heading: Dictionary containing heading information
@@ -0,0 +1,573 @@
+import os
+import json
+import time
+import shutil
+import uuid
+import zlib
+import struct
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Any, Optional, Iterator, Set, Tuple
+
+# File layout: magic, section count, then for every section its name
+# length, name, offset and compressed length, followed by the section blobs.
+# Each blob is zlib-compressed compact JSON, so a section is only read and
+# decoded when it is first accessed.
+SESSION_MAGIC = b"LSES1"
+SESSION_EXTENSION = ".session"
+DERIVED_EXTENSION = ".derived"
+
+# File whose modification time records the last cleanup, shared by every
+# process using the sessions folder
+CLEANUP_MARKER = ".cleanup"
+_COUNT = struct.Struct("<H")
+_ENTRY = struct.Struct("<QQ")
+
+# Top-level content keys stored as their own sections; every other key goes
+# into the "meta" section
+LAZY_SECTIONS = ("pages", "images", "structure")
+META_SECTION = "meta"
+
+# Section holding the counts and first items of the content, so a session
+# can be previewed without decoding its large sections
+SUMMARY_SECTION = "summary"
+SUMMARY_PREVIEW_ITEMS = 3
+
+
+def summarize_content(content: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summarize extracted content for previews
+
+    Args:
+        content: Extracted content dictionary
+
+    Returns:
+        Dictionary with the "counts" of pages, images and structure items,
+        the first "headings" texts, and the first "bullet_points" of the
+        first bullet list (with "more_bullet_points" when it is longer)
+    """
+    structure = content.get("structure", {})
+    bullet_lists = structure.get("bullet_points", [])
+
+    return {
+        "counts": {
+            "pages": len(content.get("pages", [])),
+            "images": len(content.get("images", [])),
+            "headings": len(structure.get("headings", [])),
+            "paragraphs": len(structure.get("paragraphs", [])),
+            "bullet_points": len(bullet_lists)
+        },
+        "headings": [heading["text"] for heading in structure.get("headings", [])[:SUMMARY_PREVIEW_ITEMS]],
+        "bullet_points": list(bullet_lists[0][:SUMMARY_PREVIEW_ITEMS]) if bullet_lists else [],
+        "more_bullet_points": bool(bullet_lists) and len(bullet_lists[0]) > SUMMARY_PREVIEW_ITEMS
+    }
+
+
+class PageSectionWriter:
+    """
+    Writer compressing the pages section of a session while pages are extracted
+
+    Pages are serialized into a private file in the sessions folder as they
+    are added, so a document's pages are never all held in memory. The file
+    is moved into the session by write_session_file(pages=...).
+    """
+
+    def __init__(self, folder: str, compresslevel: int = 6):
+        """
+        Initialize the writer
+
+        Args:
+            folder: Folder receiving the private pages file
+            compresslevel: zlib compression level
+        """
+        self.path = os.path.join(folder, f".pages-{uuid.uuid4().hex}.tmp")
+        self.count = 0
+        self._compressor = zlib.compressobj(compresslevel)
+        self._file = open(self.path, "wb")
+        self._file.write(self._compressor.compress(b"["))
+
+    def add(self, page: Dict[str, Any]):
+        """
+        Append a page to the section
+
+        Args:
+            page: Page record
+        """
+        data = json.dumps(page, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._file.write(self._compressor.compress(b"," + data if self.count else data))
+        self.count += 1
+
+    def close(self):
+        """Finish the compressed section (further calls do nothing)"""
+        if not self._file.closed:
+            self._file.write(self._compressor.compress(b"]"))
+            self._file.write(self._compressor.flush())
+            self._file.close()
+
+    def discard(self):
+        """Close the writer and delete its private file"""
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def write_session_file(path: str, content: Dict[str, Any], compresslevel: int = 6,
+                       pages: Optional[PageSectionWriter] = None):
+    """
+    Serialize content into a session file
+
+    Args:
+        path: Path of the session file
+        content: Extracted content dictionary
+        compresslevel: zlib compression level
+        pages: Optional writer holding the pages section, used instead of
+            content["pages"]
+    """
+    sections = {META_SECTION: {key: value for key, value in content.items() if key not in LAZY_SECTIONS}}
+    for name in LAZY_SECTIONS:
+        if name in content and not (name == "pages" and pages is not None):
+            sections[name] = content[name]
+    sections[SUMMARY_SECTION] = summarize_content(content)
+
+    if pages is not None:
+        pages.close()
+        sections[SUMMARY_SECTION]["counts"]["pages"] = pages.count
+
+    blobs = [
+        (name.encode("utf-8"), zlib.compress(
+            json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+            compresslevel
+        ))
+        for name, value in sections.items()
+    ]
+    if pages is not None:
+        # Copied from the writer's file when the session is written
+        blobs.append((b"pages", None))
+    sizes = [os.path.getsize(pages.path) if blob is None else len(blob) for _, blob in blobs]
+
+    header_size = len(SESSION_MAGIC) + _COUNT.size + sum(
+        1 + len(name) + _ENTRY.size for name, _ in blobs
+    )
+
+    header = [SESSION_MAGIC, _COUNT.pack(len(blobs))]
+    offset = header_size
+    for (name, _), size in zip(blobs, sizes):
+        header.append(bytes([len(name)]) + name + _ENTRY.pack(offset, size))
+        offset += size
+
+    # Write to a private file first so readers never see a partial session
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"".join(header))
+        for _, blob in blobs:
+            if blob is None:
+                with open(pages.path, "rb") as pages_file:
+                    shutil.copyfileobj(pages_file, f)
+            else:
+                f.write(blob)
+    os.replace(tmp_path, path)
+
+
+def read_session_index(path: str) -> Dict[str, tuple]:
+    """
+    Read the section index of a session file
+
+    Args:
+        path: Path of the session file
+
+    Returns:
+        Dictionary mapping section name to (offset, length)
+    """
+    with open(path, "rb") as f:
+        if f.read(len(SESSION_MAGIC)) != SESSION_MAGIC:
+            raise ValueError(f"Not a session file: {path}")
+
+        (count,) = _COUNT.unpack(f.read(_COUNT.size))
+        index = {}
+        for _ in range(count):
+            name = f.read(f.read(1)[0]).decode("utf-8")
+            index[name] = _ENTRY.unpack(f.read(_ENTRY.size))
+
+    return index
+
+
+class LazyContent(Mapping):
+    """
+    Read-only view of a stored session
+
+    Behaves like the extracted content dictionary, but each of the pages,
+    images and structure sections is read from disk only when first used.
+    Rendering the customize page therefore never decodes the page texts.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the content view
+
+        Args:
+            path: Path of the session file
+        """
+        self.path = path
+        self._index = read_session_index(path)
+        self._sections = {}
+        self._lock = threading.Lock()
+
+    def _section(self, name: str) -> Any:
+        """
+        Get a decoded section, reading it on first use
+
+        Args:
+            name: Section name
+
+        Returns:
+            Decoded section
+        """
+        with self._lock:
+            if name not in self._sections:
+                offset, length = self._index[name]
+                with open(self.path, "rb") as f:
+                    f.seek(offset)
+                    self._sections[name] = json.loads(zlib.decompress(f.read(length)).decode("utf-8"))
+            return self._sections[name]
+
+    def __getitem__(self, key: str) -> Any:
+        if key in LAZY_SECTIONS and key in self._index:
+            return self._section(key)
+        return self._section(META_SECTION)[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._section(META_SECTION)
+        for name in LAZY_SECTIONS:
+            if name in self._index:
+                yield name
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key) -> bool:
+        if key in LAZY_SECTIONS:
+            return key in self._index
+        return key in self._section(META_SECTION)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the summary of the content (see summarize_content)
+
+        Returns:
+            Summary dictionary
+        """
+        if SUMMARY_SECTION in self._index:
+            return self._section(SUMMARY_SECTION)
+
+        # Sessions stored before summaries existed
+        return summarize_content(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Load every section into a plain dictionary
+
+        Returns:
+            Content dictionary
+        """
+        return {key: self[key] for key in self}
+
+
+class SessionStore:
+    """
+    Store for lesson sessions (the content extracted from an upload)
+
+    Sessions are written once in a compact binary format and read back
+    lazily. Recently used sessions are kept in an in-process LRU, and
+    sessions not used for longer than the TTL are deleted by cleanup(),
+    which the web app runs as a background job at most once per cleanup
+    interval (see LessonServices.maybe_schedule_cleanup).
+    """
+
+    def __init__(self, sessions_folder: str, max_cached: int = 32, ttl: int = 7 * 24 * 3600,
+                 cleanup_interval: int = 3600):
+        """
+        Initialize the session store
+
+        Args:
+            sessions_folder: Path to the folder where sessions are stored
+            max_cached: Maximum number of sessions kept in memory
+            ttl: Seconds after its last use before a session is deleted (0 keeps sessions)
+            cleanup_interval: Minimum number of seconds between two cleanups
+        """
+        self.sessions_folder = sessions_folder
+        self.max_cached = max_cached
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Ensure sessions folder exists
+        if not os.path.exists(sessions_folder):
+            os.makedirs(sessions_folder)
+
+    def _path(self, session_id: str) -> Optional[str]:
+        """
+        Get the file path of a session
+
+        Args:
+            session_id: Session ID
+
+        Returns:
+            Path of the session file, or None for an invalid ID
+        """
+        if not session_id or os.path.basename(session_id) != session_id or session_id.startswith("."):
+            return None
+        return os.path.join(self.sessions_folder, f"{session_id}{SESSION_EXTENSION}")
+
+    def page_writer(self) -> PageSectionWriter:
+        """
+        Create a writer receiving the pages of a session while they are extracted
+
+        The caller passes it to save() and then discards it.
+
+        Returns:
+            Page section writer
+        """
+        return PageSectionWriter(self.sessions_folder)
+
+    def save(self, content: Dict[str, Any], session_id: str = None,
+             pages: Optional[PageSectionWriter] = None) -> str:
+        """
+        Store content as a session
+
+        Args:
+            content: Extracted content dictionary
+            session_id: Optional session ID (a new one is generated by default)
+            pages: Optional writer holding the pages (see page_writer())
+
+        Returns:
+            Session ID
+        """
+        session_id = session_id or str(uuid.uuid4())
+        write_session_file(self._path(session_id), content, pages=pages)
+
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+        return session_id
+
+    def exists(self, session_id: str) -> bool:
+        """
+        Check whether a session exists
+
+        Args:
+            session_id: Session ID
+
+        Returns:
+            True if the session exists
+        """
+        path = self._path(session_id)
+        return path is not None and os.path.exists(path)
+
+    def load(self, session_id: str) -> Optional[LazyContent]:
+        """
+        Load a session
+
+        Args:
+            session_id: Session ID
+
+        Returns:
+            Lazy content view, or None if the session does not exist
+        """
+        path = self._path(session_id)
+        if path is None:
+            return None
+
+        with self._lock:
+            content = self._cache.get(session_id)
+            if content is not None:
+                self._cache.move_to_end(session_id)
+
+        if content is None:
+            try:
+                content = LazyContent(path)
+            except (OSError, ValueError):
+                return None
+
+            with self._lock:
+                self._cache[session_id] = content
+                while len(self._cache) > self.max_cached:
+                    self._cache.popitem(last=False)
+
+        # Using a session extends its lifetime
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._cache.pop(session_id, None)
+            return None
+
+        return content
+
+    def get_derived(self, session_id: str, name: str) -> Optional[bytes]:
+        """
+        Get data derived from a session (slide plans, rendered files, ...)
+
+        Sessions never change once saved, so derived data stays valid for
+        the lifetime of the session as long as its name captures every other
+        input it was computed from.
+
+        Args:
+            session_id: Session ID
+            name: Name of the derived data
+
+        Returns:
+            Stored data, or None if it was not stored yet
+        """
+        path = self._path(session_id)
+        if path is None:
+            return None
+
+        try:
+            with open(os.path.join(path + DERIVED_EXTENSION, name), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put_derived(self, session_id: str, name: str, data: bytes):
+        """
+        Store data derived from a session
+
+        Args:
+            session_id: Session ID
+            name: Name of the derived data (a file name)
+            data: Data to store
+        """
+        derived_folder = self._path(session_id) + DERIVED_EXTENSION
+        os.makedirs(derived_folder, exist_ok=True)
+
+        derived_path = os.path.join(derived_folder, os.path.basename(name))
+        tmp_path = f"{derived_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, derived_path)
+
+    def delete(self, session_id: str):
+        """
+        Delete a session and its derived data
+
+        Args:
+            session_id: Session ID
+        """
+        path = self._path(session_id)
+
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+        if path is None:
+            return
+
+        if os.path.exists(path):
+            os.remove(path)
+        shutil.rmtree(path + DERIVED_EXTENSION, ignore_errors=True)
+
+    def claim_cleanup(self) -> bool:
+        """
+        Check whether a cleanup is due, and if so record it as started
+
+        The time of the last cleanup is kept in a marker file, so processes
+        sharing the sessions folder clean up once per interval between them.
+
+        Returns:
+            True if the caller should run the cleanup
+        """
+        if not self.ttl:
+            return False
+
+        marker_path = os.path.join(self.sessions_folder, CLEANUP_MARKER)
+        now = time.time()
+
+        try:
+            if now - os.stat(marker_path).st_mtime < self.cleanup_interval:
+                return False
+        except FileNotFoundError:
+            pass
+
+        with open(marker_path, "a"):
+            pass
+        os.utime(marker_path, (now, now))
+        return True
+
+    def maybe_cleanup(self) -> int:
+        """
+        Run a cleanup unless one ran within the cleanup interval
+
+        Returns:
+            Number of deleted sessions
+        """
+        return self.cleanup() if self.claim_cleanup() else 0
+
+    def cleanup(self) -> int:
+        """
+        Delete sessions not used within the TTL
+
+        Returns:
+            Number of deleted sessions
+        """
+        if not self.ttl:
+            return 0
+
+        expired_before = time.time() - self.ttl
+        deleted = 0
+
+        for entry in os.scandir(self.sessions_folder):
+            if entry.name.endswith(".tmp"):
+                # Left behind by a job that did not finish writing its session
+                try:
+                    if entry.stat().st_mtime < expired_before:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+                continue
+
+            if not entry.name.endswith(SESSION_EXTENSION):
+                continue
+
+            try:
+                if entry.stat().st_mtime < expired_before:
+                    self.delete(entry.name[:-len(SESSION_EXTENSION)])
+                    deleted += 1
+            except OSError:
+                # Removed concurrently
+                continue
+
+        return deleted
+
+    def referenced_files(self) -> Tuple[Set[str], Set[str]]:
+        """
+        Collect the files that the stored sessions still use
+
+        Only the meta and images sections of each session are decoded.
+
+        Returns:
+            Tuple of the paths (uploaded source files and image files) and
+            the content hashes of the images
+        """
+        paths, hashes = set(), set()
+
+        for entry in os.scandir(self.sessions_folder):
+            if not entry.name.endswith(SESSION_EXTENSION):
+                continue
+
+            try:
+                content = LazyContent(entry.path)
+                if content.get("source_path"):
+                    paths.add(os.path.abspath(content["source_path"]))
+                for image in content.get("images", []):
+                    if image.get("path"):
+                        paths.add(os.path.abspath(image["path"]))
+                    if image.get("hash"):
+                        hashes.add(image["hash"])
+            except (OSError, ValueError, KeyError):
+                # Removed concurrently
+                continue
+
+        return paths, hashes
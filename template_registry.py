@@ -0,0 +1,148 @@
+import io
+import os
+import threading
+from pptx import Presentation
+
+# Name used for the blank presentation built when a template file is missing
+BLANK_TEMPLATE = ""
+
+
+class TemplateRegistry:
+    """
+    In-memory registry of presentation templates
+
+    Each template in the templates folder is parsed once and kept as a
+    pristine serialized copy; presentations are built from that copy instead
+    of re-reading the template from disk. A template is reloaded when its
+    file's modification time or size changes.
+    """
+
+    # Shared registries, one per templates folder, so that every generator
+    # in a process (e.g. a job worker running many jobs) reuses the same copies
+    _registries = {}
+    _registries_lock = threading.Lock()
+
+    def __init__(self, templates_folder: str):
+        """
+        Initialize the template registry
+
+        Args:
+            templates_folder: Path to the folder containing presentation templates
+        """
+        self.templates_folder = templates_folder
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_folder(cls, templates_folder: str) -> "TemplateRegistry":
+        """
+        Get the shared registry of a templates folder
+
+        Args:
+            templates_folder: Path to the folder containing presentation templates
+
+        Returns:
+            Template registry
+        """
+        templates_folder = os.path.abspath(templates_folder)
+
+        with cls._registries_lock:
+            if templates_folder not in cls._registries:
+                cls._registries[templates_folder] = cls(templates_folder)
+            return cls._registries[templates_folder]
+
+    def preload(self):
+        """
+        Parse every template in the templates folder (and the blank presentation)
+        """
+        self._get_template_data(BLANK_TEMPLATE)
+
+        if not os.path.isdir(self.templates_folder):
+            return
+
+        for filename in sorted(os.listdir(self.templates_folder)):
+            name, extension = os.path.splitext(filename)
+            if extension.lower() == ".pptx":
+                self._get_template_data(name)
+
+    def get_presentation(self, template_name: str) -> Presentation:
+        """
+        Build a fresh presentation from a template
+
+        Args:
+            template_name: Name of the template (without extension); if the
+                template file does not exist a blank presentation is returned
+
+        Returns:
+            Presentation object
+        """
+        return Presentation(io.BytesIO(self._get_template_data(template_name)))
+
+    def signature(self, template_name: str):
+        """
+        Get the version of a template file as seen by the registry
+
+        Args:
+            template_name: Name of the template (without extension)
+
+        Returns:
+            Tuple of (modification time in ns, size), or None when the blank
+            presentation is used
+        """
+        template_path = os.path.join(self.templates_folder, f"{template_name}.pptx")
+
+        if template_name == BLANK_TEMPLATE or not os.path.exists(template_path):
+            return None
+
+        stat = os.stat(template_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _get_template_data(self, template_name: str) -> bytes:
+        """
+        Get the serialized copy of a template, loading it if needed
+
+        Args:
+            template_name: Name of the template (without extension)
+
+        Returns:
+            Serialized presentation
+        """
+        template_path = os.path.join(self.templates_folder, f"{template_name}.pptx")
+        signature = self.signature(template_name)
+
+        if signature is None:
+            template_name = BLANK_TEMPLATE
+
+        with self._lock:
+            cached = self._templates.get(template_name)
+            if cached is not None and cached["signature"] == signature:
+                return cached["data"]
+
+        data = self._load(template_path if signature is not None else None)
+
+        with self._lock:
+            self._templates[template_name] = {
+                "signature": signature,
+                "data": data
+            }
+
+        return data
+
+    def _load(self, template_path: str = None) -> bytes:
+        """
+        Parse a template and serialize it
+
+        Round-tripping through python-pptx makes sure only templates that
+        parse are cached.
+
+        Args:
+            template_path: Path to the template file, or None for a blank presentation
+
+        Returns:
+            Serialized presentation
+        """
+        prs = Presentation(template_path) if template_path else Presentation()
+
+        buffer = io.BytesIO()
+        prs.save(buffer)
+        return buffer.getvalue()
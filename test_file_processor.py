@@ -0,0 +1,72 @@
+import os
+import shutil
+from PIL import Image
+from src.services.extraction_cache import ExtractionCache
+from src.services.file_processor import FileProcessor
+from src.services.session_store import SessionStore
+
+
+class FakeOCREngine:
+    """OCR engine returning a fixed text, so the tests do not need tesseract"""
+
+    max_workers = 0
+
+    def ocr_image_file(self, image_path):
+        return "Lesson heading\nSome text of the lesson."
+
+
+def _upload(source, upload_folder, name):
+    path = os.path.join(upload_folder, name)
+    shutil.copyfile(source, path)
+    return path
+
+
+def test_same_image_uploaded_twice(tmp_path):
+    upload_folder = tmp_path / "uploads"
+    upload_folder.mkdir()
+    source = tmp_path / "lesson.png"
+    Image.new("RGB", (40, 30), "white").save(source)
+
+    processor = FileProcessor(
+        str(upload_folder),
+        cache=ExtractionCache(str(tmp_path / "cache")),
+        ocr_engine=FakeOCREngine()
+    )
+
+    first_path = _upload(source, upload_folder, "first_lesson.png")
+    first = processor.process_file(first_path)
+    second = processor.process_file(_upload(source, upload_folder, "second_lesson.png"))
+
+    assert first["images"][0]["hash"] == second["images"][0]["hash"]
+    assert second["pages"] == first["pages"]
+
+    # The cached image is stored with the uploads, so it survives the
+    # eviction of the cache entry and the removal of the first upload
+    os.remove(first_path)
+    stored_path = second["images"][0]["path"]
+    assert stored_path != first_path
+    assert os.path.exists(stored_path)
+
+
+def test_pages_streamed_into_session(tmp_path):
+    upload_folder = tmp_path / "uploads"
+    upload_folder.mkdir()
+    source = tmp_path / "lesson.png"
+    Image.new("RGB", (40, 30), "white").save(source)
+
+    processor = FileProcessor(str(upload_folder), ocr_engine=FakeOCREngine())
+    store = SessionStore(str(tmp_path / "sessions"))
+    expected = processor.process_file(_upload(source, upload_folder, "lesson.png"))
+
+    page_writer = store.page_writer()
+    try:
+        content = processor.process_file(_upload(source, upload_folder, "lesson.png"), page_writer=page_writer)
+        session_id = store.save(content, pages=page_writer)
+    finally:
+        page_writer.discard()
+
+    assert "pages" not in content
+    session = store.load(session_id)
+    assert session["pages"] == expected["pages"]
+    assert session.summary()["counts"]["pages"] == 1
+    assert not [name for name in os.listdir(store.sessions_folder) if name.endswith(".tmp")]
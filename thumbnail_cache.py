@@ -0,0 +1,206 @@
+import io
+import os
+import uuid
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+from PIL import Image, ImageOps
+
+# Version of the thumbnail encoding; bump it whenever thumbnails change so
+# that stale cached thumbnails are not reused
+THUMBNAIL_VERSION = "1"
+
+
+class ThumbnailCache:
+    """
+    Cache of slide-sized image thumbnails
+
+    Extracted images are often scans or photos of several megapixels, while
+    a slide shows them a few inches wide. Thumbnails are downscaled to the
+    box they are placed in (at the given resolution) and recompressed: JPEG
+    for opaque images, optimized PNG for images with transparency. They are
+    stored under the image's content hash and box size, so later renderings
+    of the same images reuse them. Without a cache folder thumbnails are
+    kept in memory only.
+    """
+
+    def __init__(self, cache_folder: Optional[str] = None, max_workers: int = 4, dpi: int = 150,
+                 jpeg_quality: int = 80):
+        """
+        Initialize the thumbnail cache
+
+        Args:
+            cache_folder: Optional folder where thumbnails are stored
+            max_workers: Number of threads generating thumbnails
+            dpi: Resolution of the thumbnails on the slide
+            jpeg_quality: JPEG quality of opaque thumbnails
+        """
+        self.cache_folder = cache_folder
+        self.max_workers = max_workers
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+
+        # Ensure cache folder exists
+        if cache_folder and not os.path.exists(cache_folder):
+            os.makedirs(cache_folder)
+
+    def get_many(self, requests: List[Dict[str, Any]],
+                 image_data: Optional[Dict[str, bytes]] = None) -> Dict[Tuple[str, float, float], Optional[Dict[str, Any]]]:
+        """
+        Get the thumbnails of several images, generating missing ones in parallel
+
+        Pillow releases the GIL while decoding, resizing and encoding, so the
+        thumbnails are generated concurrently in a thread pool.
+
+        Args:
+            requests: List of dictionaries with the image "source" (a path,
+                or an ID of image_data), its content "hash" (None to hash the
+                source) and the "width" and "height" of its box in inches
+            image_data: Optional bytes of in-memory images, by image ID
+
+        Returns:
+            Dictionary mapping (source, width, height) to the thumbnail (see
+            get), or None for images that cannot be read
+        """
+        keys = list(dict.fromkeys((request["source"], request["width"], request["height"]) for request in requests))
+        hashes = {request["source"]: request.get("hash") for request in requests}
+
+        def get(key):
+            source, width, height = key
+            return self.get(source, hashes[source], width, height, image_data)
+
+        if self.max_workers > 1 and len(keys) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(keys))) as executor:
+                return dict(zip(keys, executor.map(get, keys)))
+
+        return {key: get(key) for key in keys}
+
+    def get(self, source: str, content_hash: Optional[str], width: float, height: float,
+            image_data: Optional[Dict[str, bytes]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the thumbnail of an image, generating it on first use
+
+        Args:
+            source: Path to the image, or ID of an in-memory image
+            content_hash: SHA-256 hash of the image (None to hash the source)
+            width: Width of the box in inches
+            height: Height of the box in inches
+            image_data: Optional bytes of in-memory images, by image ID
+
+        Returns:
+            Dictionary with the thumbnail "image" (a path or a binary stream)
+            and its "width" and "height" in pixels, or None if the image
+            cannot be read
+        """
+        try:
+            if image_data and source in image_data:
+                data = image_data[source]
+            else:
+                data = None
+                if content_hash is None:
+                    with open(source, "rb") as f:
+                        data = f.read()
+
+            if content_hash is None:
+                content_hash = hashlib.sha256(data).hexdigest()
+
+            max_size = (max(1, round(width * self.dpi)), max(1, round(height * self.dpi)))
+            thumbnail_name = f"{content_hash}-{max_size[0]}x{max_size[1]}-q{self.jpeg_quality}.v{THUMBNAIL_VERSION}"
+            cached = self._get_cached(content_hash, thumbnail_name)
+            if cached is not None:
+                return cached
+
+            if data is None:
+                with open(source, "rb") as f:
+                    data = f.read()
+
+            return self._store(content_hash, thumbnail_name, *self._make_thumbnail(data, max_size))
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Missing file, or a format Pillow cannot decode
+            return None
+
+    def _make_thumbnail(self, data: bytes, max_size: Tuple[int, int]) -> Tuple[bytes, str, Tuple[int, int]]:
+        """
+        Downscale and recompress an image
+
+        Args:
+            data: Encoded image data
+            max_size: Maximum (width, height) of the thumbnail in pixels
+
+        Returns:
+            Tuple of the encoded thumbnail, its extension and its size
+        """
+        with Image.open(io.BytesIO(data)) as image:
+            # Decode JPEGs directly at a reduced scale when possible
+            image.draft("RGB", max_size)
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(max_size, Image.LANCZOS)
+
+            transparent = image.mode in ("RGBA", "LA", "PA") or \
+                (image.mode == "P" and "transparency" in image.info)
+
+            output = io.BytesIO()
+            if transparent:
+                image.convert("RGBA").save(output, "PNG", optimize=True)
+                extension = "png"
+            else:
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                image.save(output, "JPEG", quality=self.jpeg_quality, optimize=True)
+                extension = "jpg"
+
+            return output.getvalue(), extension, image.size
+
+    def _get_cached(self, content_hash: str, thumbnail_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a stored thumbnail
+
+        Args:
+            content_hash: SHA-256 hash of the image
+            thumbnail_name: Name of the thumbnail (without extension)
+
+        Returns:
+            Thumbnail dictionary, or None if it is not stored
+        """
+        if not self.cache_folder:
+            return None
+
+        for extension in ("jpg", "png"):
+            thumbnail_path = os.path.join(self.cache_folder, content_hash[:2], f"{thumbnail_name}.{extension}")
+            if os.path.exists(thumbnail_path):
+                # Opening only reads the header
+                with Image.open(thumbnail_path) as image:
+                    width, height = image.size
+                return {"image": thumbnail_path, "width": width, "height": height}
+
+        return None
+
+    def _store(self, content_hash: str, thumbnail_name: str, data: bytes, extension: str,
+               size: Tuple[int, int]) -> Dict[str, Any]:
+        """
+        Store a generated thumbnail
+
+        Args:
+            content_hash: SHA-256 hash of the image
+            thumbnail_name: Name of the thumbnail (without extension)
+            data: Encoded thumbnail
+            extension: Thumbnail file extension
+            size: Thumbnail size in pixels
+
+        Returns:
+            Thumbnail dictionary
+        """
+        if not self.cache_folder:
+            return {"image": io.BytesIO(data), "width": size[0], "height": size[1]}
+
+        thumbnail_folder = os.path.join(self.cache_folder, content_hash[:2])
+        thumbnail_path = os.path.join(thumbnail_folder, f"{thumbnail_name}.{extension}")
+        os.makedirs(thumbnail_folder, exist_ok=True)
+
+        # Write to a private file first so readers never see a partial thumbnail
+        tmp_path = f"{thumbnail_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, thumbnail_path)
+
+        return {"image": thumbnail_path, "width": size[0], "height": size[1]}
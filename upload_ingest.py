@@ -0,0 +1,187 @@
+import os
+import uuid
+import hashlib
+from typing import Dict, Any, Optional
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+# Leading bytes identifying the accepted upload types. PDF files may carry
+# a few bytes of junk before their header, so "%PDF-" is searched in the
+# whole sniffed prefix.
+SNIFF_LENGTH = 1024
+IMAGE_SIGNATURES = {
+    "png": b"\x89PNG\r\n\x1a\n",
+    "jpeg": b"\xff\xd8\xff"
+}
+PDF_SIGNATURE = b"%PDF-"
+
+# File type expected for each allowed extension
+EXTENSION_TYPES = {
+    "pdf": "pdf",
+    "png": "png",
+    "jpg": "jpeg",
+    "jpeg": "jpeg"
+}
+
+
+class UploadRejected(UnsupportedMediaType):
+    """
+    Raised when an uploaded file is not of an accepted type
+
+    Not a ValueError: Werkzeug's form parser silently drops the form on
+    ValueErrors, while HTTP exceptions propagate to the view.
+    """
+
+
+def detect_file_type(header: bytes) -> Optional[str]:
+    """
+    Detect the type of a file from its first bytes
+
+    Args:
+        header: First bytes of the file (up to SNIFF_LENGTH)
+
+    Returns:
+        "pdf", "png" or "jpeg", or None for any other content
+    """
+    for file_type, signature in IMAGE_SIGNATURES.items():
+        if header.startswith(signature):
+            return file_type
+
+    if PDF_SIGNATURE in header[:SNIFF_LENGTH]:
+        return "pdf"
+
+    return None
+
+
+class IngestedUpload:
+    """
+    Upload stream writing the file straight into the upload folder
+
+    Werkzeug's form parser writes the uploaded chunks into this object as they
+    arrive, so the file is hashed, type-checked and size-checked in the same
+    pass that stores it. A rejected upload stops the parsing right away. Once
+    the request accepts the file it is renamed into place, without copying.
+    """
+
+    def __init__(self, upload_folder: str, max_bytes: int = None):
+        """
+        Initialize the upload stream
+
+        Args:
+            upload_folder: Folder receiving the uploaded file
+            max_bytes: Maximum size of the file (None for no limit)
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.file_type = None
+        self.path = None
+        self._header = b""
+        self._digest = hashlib.sha256()
+
+        # Hidden, unique name until the upload is accepted
+        self._tmp_path = os.path.join(upload_folder, f".{uuid.uuid4().hex}.part")
+        self._file = open(self._tmp_path, "w+b")
+
+    def write(self, data: bytes) -> int:
+        """
+        Store a chunk of the upload
+
+        Args:
+            data: Chunk of the file
+
+        Returns:
+            Number of bytes written
+        """
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            self.close()
+            raise RequestEntityTooLarge()
+
+        if len(self._header) < SNIFF_LENGTH:
+            self._header += data[:SNIFF_LENGTH - len(self._header)]
+            if len(self._header) >= SNIFF_LENGTH:
+                self._check_type()
+
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def _check_type(self):
+        """
+        Detect the file type, rejecting files of any other type
+        """
+        self.file_type = detect_file_type(self._header)
+
+        if self.file_type is None:
+            self.close()
+            raise UploadRejected("File content is not a PDF, PNG or JPEG file")
+
+    def __getattr__(self, name: str) -> Any:
+        # Reading, seeking, etc. go to the underlying file
+        if name == "_file":
+            raise AttributeError(name)
+        return getattr(self._file, name)
+
+    def finalize(self, file_path: str, extension: str = None) -> Dict[str, Any]:
+        """
+        Accept the upload and move it to its final path
+
+        Args:
+            file_path: Final path of the file
+            extension: Extension of the uploaded file name; the file content
+                must match it
+
+        Returns:
+            Dictionary with the "path", "content_hash", "size" and "file_type"
+            of the file
+        """
+        if self.file_type is None:
+            self._check_type()
+
+        expected_type = EXTENSION_TYPES.get((extension or "").lower())
+        if expected_type is not None and expected_type != self.file_type:
+            self.close()
+            raise UploadRejected(f"File content does not match its .{extension} extension")
+
+        self._file.close()
+        os.replace(self._tmp_path, file_path)
+        self.path = file_path
+
+        return {
+            "path": file_path,
+            "content_hash": self._digest.hexdigest(),
+            "size": self.size,
+            "file_type": self.file_type
+        }
+
+    def close(self):
+        """
+        Close the stream, deleting the file unless it was accepted
+        """
+        self._file.close()
+
+        if self.path is None and os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class StreamingUploadRequest(Request):
+    """
+    Request class streaming uploaded files into the upload folder
+
+    Every uploaded file is written to an IngestedUpload instead of Werkzeug's
+    in-memory or temporary-file buffer. UPLOAD_MAX_FILE_BYTES limits each
+    file, on top of MAX_CONTENT_LENGTH for the whole request.
+    """
+
+    def _get_file_stream(self, total_content_length: Optional[int], content_type: Optional[str],
+                         filename: Optional[str] = None, content_length: Optional[int] = None):
+        upload_folder = current_app.config.get("UPLOAD_FOLDER")
+        if not upload_folder:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+        max_bytes = current_app.config.get("UPLOAD_MAX_FILE_BYTES") or current_app.config.get("MAX_CONTENT_LENGTH")
+
+        # Reject up front when the part announces its size
+        if max_bytes is not None and content_length is not None and content_length > max_bytes:
+            raise RequestEntityTooLarge()
+
+        return IngestedUpload(upload_folder, max_bytes=max_bytes)
@@ -0,0 +1,8 @@
+from src.main import create_app
+
+# Application served by WSGI servers:
+#     gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()
+
+if __name__ == "__main__":
+    app.run()
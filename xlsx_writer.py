@@ -0,0 +1,137 @@
+import os
+import re
+import uuid
+import zipfile
+from typing import Iterable, List, Any, Optional
+from xml.sax.saxutils import escape
+
+# Characters not allowed in XML 1.0 documents
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+)
+
+
+def column_name(index: int) -> str:
+    """
+    Get the spreadsheet name of a column
+
+    Args:
+        index: Zero-based column index
+
+    Returns:
+        Column name ("A", "B", ..., "Z", "AA", ...)
+    """
+    name = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(ord("A") + remainder) + name
+    return name
+
+
+def _cell_xml(reference: str, value: Any) -> str:
+    """
+    Encode one cell
+
+    Args:
+        reference: Cell reference ("B9")
+        value: Cell value (text or number)
+
+    Returns:
+        XML of the cell
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+
+    text = escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def write_xlsx(output_path: str, rows: Iterable[List[Any]], sheet_name: str = "Sheet1",
+               column_widths: Optional[List[float]] = None):
+    """
+    Stream rows into a single-sheet XLSX workbook
+
+    The workbook is written directly in the Office Open XML layout, with
+    inline strings instead of a shared string table, so every row goes
+    straight to the compressed worksheet stream: memory use does not grow
+    with the number of rows.
+
+    Args:
+        output_path: Path of the written workbook
+        rows: Rows of cell values (text, numbers, or None for empty cells);
+            an empty row leaves a blank line
+        sheet_name: Name of the worksheet
+        column_widths: Optional widths of the first columns, in characters
+    """
+    # Write to a private file first so readers never see a partial workbook
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        workbook.writestr("_rels/.rels", _ROOT_RELS)
+        workbook.writestr("xl/workbook.xml", _WORKBOOK.format(sheet_name=escape(sheet_name, {'"': "&quot;"})))
+        workbook.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+
+        with workbook.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(_SHEET_START.encode("utf-8"))
+
+            if column_widths:
+                sheet.write(("<cols>" + "".join(
+                    f'<col min="{index}" max="{index}" width="{width}" customWidth="1"/>'
+                    for index, width in enumerate(column_widths, start=1)
+                ) + "</cols>").encode("utf-8"))
+
+            sheet.write(b"<sheetData>")
+            for row_number, row in enumerate(rows, start=1):
+                cells = "".join(
+                    _cell_xml(f"{column_name(index)}{row_number}", value)
+                    for index, value in enumerate(row)
+                    if value is not None
+                )
+                if cells:
+                    sheet.write(f'<row r="{row_number}">{cells}</row>'.encode("utf-8"))
+            sheet.write(b"</sheetData></worksheet>")
+
+    os.replace(tmp_path, output_path)